@@ -2,12 +2,13 @@
 from augmentation import getDeco
 
 
-def deco(profiler=None):
+def deco(profiler=None, sampler=None):
     """
     Used as a @decorator
 
     Args:
         profiler: optional; if not given, a DefaultProfiler is created
+        sampler: optional; a sampling.SamplingPolicy; if given, only the calls it accepts are profiled
 
     Returns:
         an anonymous decorator object
@@ -16,20 +17,17 @@ def deco(profiler=None):
     import augmentation
     import profilers
 
-    class _d(object):
+    class _d(_Hook):
         """
         Anonymous class
 
         The only entry points to the instance of this class is the
         public attribute :p:, which is a profiler object that implements
-        context manager interface
+        context manager interface, and :sampler:, the sampling policy
 
         One should use frep.getDeco(str) to retrieve this instance
         """
 
-        def __init__(self, p):
-            self.p = p
-
         def __call__(self, f):
             """
             Decorate a function object (a free function or a method);
@@ -42,23 +40,32 @@ def deco(profiler=None):
             Returns:
                 callable: anonymous function wrapper
             """
-            def _(*args, **kwargs):
-                with self.p:
-                    return f(*args, **kwargs)
+            name = '{}.{}'.format(getattr(f, '__module__', None), getattr(f, '__name__', repr(f)))
             augmentation.setDeco(f, self)
-            return _
+            return _wrap(name, f, self)
 
     if profiler is None:
         profiler = profilers.DefaultProfiler()
 
-    return _d(profiler)
+    return _d(profiler, sampler)
 
 
 _patchedFuncs = list()
 _patchedMethods = list()
+_lazyPatches = list()
 
 
-def patch(moduleDotPath, freeFuncs=None, methods=None, profiler=None):
+class _Hook(object):
+    """
+    The profiler (p) and the sampling policy (sampler) of the wrappers built by _wrap()
+    """
+
+    def __init__(self, p, sampler):
+        self.p = p
+        self.sampler = sampler
+
+
+def patch(moduleDotPath, freeFuncs=None, methods=None, profiler=None, sampler=None, lazy=False):
     """
     Use this function to monkey-patch a free-function or method, adding
     a profiler hook to it.
@@ -71,56 +78,59 @@ def patch(moduleDotPath, freeFuncs=None, methods=None, profiler=None):
     free function examples:
     ['exists', 'send_all', 'publish']
 
-    method examples (using class.method format):
-    ['Factory.create', 'Graph.addNode']
+    method examples (using class.method format; nested classes are separated by dots):
+    ['Factory.create', 'Graph.addNode', 'Graph.Node.connect']
 
     Args:
         moduleDotPath (str):
         freeFuncs (list):
         methods (list):
         profiler (object): a profiler that implements context manager interface
+        sampler (object): optional; a sampling.SamplingPolicy; if given, only the calls it accepts are profiled
+        lazy (bool): optional; if True and the module is not imported yet, the patches are applied when the module is
+            first imported instead of importing it now (see augmentation.LazyMonkey)
 
     """
     import profilers
 
     if profiler is None:
         profiler = profilers.DefaultProfiler()
+    hook = _Hook(profiler, sampler)
 
     def _patchFreeFunc(m, fF):
         fFBackUp = '{}__orig__'.format(fF)
         fOriginal = getattr(m, fF)
         if hasattr(m, fFBackUp):
             return
-
-        def _w(*args, **kwargs):
-            with profiler:
-                _f = getattr(m, fFBackUp)
-                return _f(*args, **kwargs)
-
+        _w = _wrap('{}.{}'.format(m.__name__, fF), fOriginal, hook)
         setattr(m, fFBackUp, fOriginal)
         setattr(m, fF, _w)
         _patchedFuncs.append((m, fF, fOriginal, fFBackUp))
 
     def _patchMethod(m, meth):
-        kls, fName = meth.split('.')
+        kls, fName = meth.rsplit('.', 1)
         fNameBackUp = '{}__orig__'.format(fName)
-        c = getattr(m, kls)
+        c = m
+        for _ in kls.split('.'):
+            c = getattr(c, _)
         if hasattr(c, fNameBackUp):
             return
 
         fOriginal = getattr(c, fName)
-
-        def _w(*args, **kwargs):
-            with profiler:
-                _f = getattr(c, fNameBackUp)
-                return _f(*args, **kwargs)
-
+        _w = _wrap('{}.{}'.format(m.__name__, meth), fOriginal, hook)
         setattr(c, fNameBackUp, fOriginal)
         setattr(c, fName, _w)
         _patchedMethods.append((c, fName, fOriginal, fNameBackUp))
 
     import sys
     m = sys.modules.get(moduleDotPath)
+    if m is None and lazy:
+        import augmentation
+        for symbolDotPath in (freeFuncs or list()) + (methods or list()):
+            lazyMonkey = augmentation.LazyMonkey(moduleDotPath, symbolDotPath, profiler=profiler, sampler=sampler)
+            lazyMonkey.patch()
+            _lazyPatches.append(lazyMonkey)
+        return
     if m is None:
         m = __import__(moduleDotPath, fromlist=[''])
     if freeFuncs:
@@ -131,10 +141,131 @@ def patch(moduleDotPath, freeFuncs=None, methods=None, profiler=None):
             _patchMethod(m, meth)
 
 
+def patchMatching(moduleDotPath, patterns, profiler=None, sampler=None):
+    """
+    Monkey-patches every free function and method of a module whose name matches any of the patterns
+
+    The names are relative to the module, e.g. 'publish', 'Graph.addNode' or 'Graph.Node.connect' for a nested class;
+    a pattern is either a glob (see fnmatch) or a compiled regular expression (matched from the beginning of the name):
+
+    ['*'], ['publish_*', 'Graph.add*'], [re.compile(r'Graph\.(add|remove)')]
+
+    Only the functions and classes defined in the module itself are visited; dunder methods, properties and builtins
+    are left alone, static and class methods stay static and class methods.
+
+    Args:
+        moduleDotPath (str):
+        patterns (list):
+        profiler (object): a profiler that implements context manager interface
+        sampler (object): optional; a sampling.SamplingPolicy; if given, only the calls it accepts are profiled
+
+    Returns:
+        augmentation.Patches: restores these patches only; unpatchAll() also restores them
+    """
+    import fnmatch
+    import sys
+    import types
+    import augmentation
+    import profilers
+
+    if profiler is None:
+        profiler = profilers.DefaultProfiler()
+    hook = _Hook(profiler, sampler)
+
+    def _match(name):
+        for pattern in patterns:
+            if isinstance(pattern, basestring):
+                if fnmatch.fnmatchcase(name, pattern):
+                    return True
+            elif pattern.match(name):
+                return True
+        return False
+
+    def _patch(owner, fName, fOriginal, f, qualName, wrapType, patched):
+        fNameBackUp = '{}__orig__'.format(fName)
+        if fNameBackUp in vars(owner):
+            return
+        name = '{}.{}'.format(m.__name__, qualName)
+        _w = _wrap(name, f, hook)
+        setattr(owner, fNameBackUp, fOriginal)
+        setattr(owner, fName, wrapType(_w) if wrapType is not None else _w)
+        entry = (owner, fName, fOriginal, fNameBackUp)
+        patched.append(entry)
+        entries.append(entry)
+        names.append(name)
+
+    def _walkClass(c, prefix, seen):
+        if c in seen:
+            return
+        seen.add(c)
+        for fName, o in vars(c).items():
+            if fName.startswith('__') and fName.endswith('__') or fName.endswith('__orig__'):
+                continue
+            qualName = '{}.{}'.format(prefix, fName)
+            if isinstance(o, (type, types.ClassType)):
+                if o.__module__ == m.__name__:
+                    _walkClass(o, qualName, seen)
+            elif not _match(qualName):
+                continue
+            elif isinstance(o, types.FunctionType):
+                _patch(c, fName, o, o, qualName, None, _patchedMethods)
+            elif isinstance(o, (staticmethod, classmethod)) and isinstance(o.__func__, types.FunctionType):
+                _patch(c, fName, o, o.__func__, qualName, type(o), _patchedMethods)
+
+    m = sys.modules.get(moduleDotPath)
+    if m is None:
+        m = __import__(moduleDotPath, fromlist=[''])
+    entries = list()
+    names = list()
+    seen = set()
+    for fName, o in vars(m).items():
+        if fName.startswith('__') and fName.endswith('__') or fName.endswith('__orig__'):
+            continue
+        if getattr(o, '__module__', None) != m.__name__:
+            continue
+        if isinstance(o, (type, types.ClassType)):
+            _walkClass(o, fName, seen)
+        elif isinstance(o, types.FunctionType) and _match(fName):
+            _patch(m, fName, o, o, fName, None, _patchedFuncs)
+    return augmentation.Patches(entries, names)
+
+
+def _wrap(name, f, hook):
+    """
+    Builds the wrappers of deco(), patch() and patchMatching()
+
+    Args:
+        name (str): the span name
+        f (callable):
+        hook (_Hook): its profiler is looked up at every call, so that it can be replaced, see getDeco()
+
+    Returns:
+        callable: a wrapper that calls f within the profiler and the span of the given name
+    """
+    import sampling
+    import spans
+
+    if hook.sampler is None:
+        def _w(*args, **kwargs):
+            with hook.p:
+                return spans.call(name, f, args, kwargs)
+    else:
+        def _w(*args, **kwargs):
+            if not hook.sampler.accept():
+                return spans.call(name, f, args, kwargs)
+            return sampling.call(hook.p, hook.sampler, spans.call, (name, f, args, kwargs), dict())
+    _w.__name__ = getattr(f, '__name__', _w.__name__)
+    _w.__doc__ = getattr(f, '__doc__', None)
+    return _w
+
+
 def unpatchAll():
     """
-    Completely restores the patched free functions and methods, leaving no traces
+    Completely restores the patched free functions and methods, leaving no traces; the lazy patches that are still
+    pending are cancelled
     """
+    while _lazyPatches:
+        _lazyPatches.pop().unpatch()
     while _patchedFuncs:
         m, fF, fOriginal, fFBackUp = _patchedFuncs.pop()
         setattr(m, fF, fOriginal)
@@ -143,3 +274,24 @@ def unpatchAll():
         c, fName, fOriginal, fNameBackUp = _patchedMethods.pop()
         setattr(c, fName, fOriginal)
         delattr(c, fNameBackUp)
+
+
+def _restore(owner, name):
+    """
+    Restores one patched free function (owner is the module) or method (owner is the class)
+    """
+    entries = [_ for patched in (_patchedFuncs, _patchedMethods) for _ in patched if _[0] is owner and _[1] == name]
+    _restoreEntries(entries)
+
+
+def _restoreEntries(entries):
+    """
+    Restores the patches recorded by patchMatching(), in one pass over the patched lists
+    """
+    ids = set(id(_) for _ in entries)
+    for patched in (_patchedFuncs, _patchedMethods):
+        patched[:] = [_ for _ in patched if id(_) not in ids]
+    for owner, fName, fOriginal, fNameBackUp in reversed(entries):
+        if fNameBackUp in vars(owner):
+            setattr(owner, fName, fOriginal)
+            delattr(owner, fNameBackUp)
@@ -0,0 +1,145 @@
+"""
+python -m frep run --patch corelib.publish:publish,Graph.addNode [--patch ...] [--profiler timer,pidstat] [--every N]
+    [--output run.jsonl] [--report report.txt] [--store frep.db] [-m] -- script.py args
+
+python -m frep compare baseline.jsonl candidate.jsonl [--method bootstrap] [--alpha 0.01] [--min-change 0.02] [--all]
+
+python -m frep store ingest frep.db /data/pidstat [--pattern '*.txt'] [--function name] [--processes N]
+python -m frep store percentile frep.db corelib.publish.publish [--q 99] [--days 30] [--host name]
+python -m frep store max frep.db [--column rss] [--days 30]
+python -m frep store functions frep.db
+
+run exits with the exit status of the program, see frep.runner; compare exits with 1 if the candidate has a
+significant regression, see frep.compare; store writes to or queries a profile store, see frep.store
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from frep import compare
+from frep import runner
+from frep import store
+
+
+def _run(args):
+    command = args.command[1:] if args.command[:1] == ['--'] else args.command
+    if not command:
+        raise SystemExit('run: expected the script (or the module with -m) to run')
+    try:
+        r = runner.Runner(args.patch, [p.strip() for p in args.profiler.split(',') if p.strip()], every=args.every,
+                          outputPath=args.output, reportPath=args.report, storePath=args.store)
+    except ValueError, e:
+        raise SystemExit('run: {}'.format(e))
+    r.install()
+    return r.run(command[0], command[1:], module=args.module)
+
+
+def _compare(args):
+    results = compare.compareRuns(compare.load(args.baseline), compare.load(args.candidate), method=args.method,
+                                  alpha=args.alpha, minChange=args.minChange, numResamples=args.resamples)
+    for line in compare.report(results, showAll=args.all):
+        print line
+    return 1 if any(r['verdict'] == 'regression' for r in results) else 0
+
+
+def _storeIngest(args):
+    with store.Store(args.db, host=args.host) as s:
+        numLoaded, failed = s.ingest(args.dirPath, pattern=args.pattern, function=args.function,
+                                     processes=args.processes)
+    print 'loaded {} dump(s)'.format(numLoaded)
+    for filePath in failed:
+        print 'failed to parse {}'.format(filePath)
+    return 1 if failed else 0
+
+
+def _openStore(args):
+    # Store() would create an empty store at a mistyped path
+    if not os.path.isfile(args.db):
+        raise SystemExit('store: no profile store at {}'.format(args.db))
+    return store.Store(args.db)
+
+
+def _storePercentile(args):
+    with _openStore(args) as s:
+        rows = s.percentilePerDay(args.function, args.q, days=args.days, host=args.host)
+    print '{:<12} {:>10} {:>14}'.format('day', 'calls', 'p{:g} (s)'.format(args.q))
+    for day, count, value in rows:
+        print '{:<12} {:>10} {:>14.6g}'.format(day, count, value)
+    return 0
+
+
+def _storeMax(args):
+    with _openStore(args) as s:
+        rows = s.maxPerFunction(column=args.column, since=time.time() - args.days * 86400.0 if args.days else None)
+    print '{:<48} {:>14} {:>10}'.format('function', 'max ' + args.column, 'samples')
+    for function, value, count in rows:
+        print '{:<48} {:>14} {:>10}'.format(function, value, count)
+    return 0
+
+
+def _storeFunctions(args):
+    with _openStore(args) as s:
+        for function in s.functions():
+            print function
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m frep')
+    subParsers = parser.add_subparsers()
+
+    p = subParsers.add_parser('run', help='profiles the patched functions of a program')
+    p.add_argument('--patch', action='append', required=True, help='module.path:symbol[,Class.method...]')
+    p.add_argument('--profiler', default='timer', help='comma-separated names, see frep.runner.PROFILERS')
+    p.add_argument('--every', type=int, help='profile one call in N of each function')
+    p.add_argument('--output', help='also write the messages to this run file, see frep.compare')
+    p.add_argument('--report', help='write the report to this file instead of stderr')
+    p.add_argument('--store', help='also write the messages to this profile store, see frep.store')
+    p.add_argument('-m', dest='module', action='store_true', help='run a module instead of a script')
+    p.add_argument('command', nargs=argparse.REMAINDER, help='-- script args')
+    p.set_defaults(func=_run)
+
+    p = subParsers.add_parser('compare', help='compares two run files function by function')
+    p.add_argument('baseline')
+    p.add_argument('candidate')
+    p.add_argument('--method', choices=(compare.MANN_WHITNEY, compare.BOOTSTRAP), default=compare.MANN_WHITNEY)
+    p.add_argument('--alpha', type=float, default=0.01, help='the family-wise significance level')
+    p.add_argument('--min-change', dest='minChange', type=float, default=0.02,
+                   help='the minimum relative change of the median to report')
+    p.add_argument('--resamples', type=int, default=1000, help='the number of bootstrap resamples')
+    p.add_argument('--all', action='store_true', help='also list the metrics with no significant change')
+    p.set_defaults(func=_compare)
+
+    storeParsers = subParsers.add_parser('store', help='writes to or queries a profile store').add_subparsers()
+    p = storeParsers.add_parser('ingest', help='loads a directory of pidstat dumps in parallel')
+    p.add_argument('db')
+    p.add_argument('dirPath')
+    p.add_argument('--pattern', default='*', help='a glob pattern of the file names')
+    p.add_argument('--function', help='by default the name of each file without its extension')
+    p.add_argument('--processes', type=int, help='by default the number of CPUs')
+    p.add_argument('--host', help='by default this host name')
+    p.set_defaults(func=_storeIngest)
+    p = storeParsers.add_parser('percentile', help='a percentile of the durations of a function per day')
+    p.add_argument('db')
+    p.add_argument('function')
+    p.add_argument('--q', type=float, default=99.0)
+    p.add_argument('--days', type=int, default=30)
+    p.add_argument('--host')
+    p.set_defaults(func=_storePercentile)
+    p = storeParsers.add_parser('max', help='the maximum of a pidstat column per function')
+    p.add_argument('db')
+    p.add_argument('--column', default='rss', choices=[k for k, c in store.SAMPLE_COLUMNS])
+    p.add_argument('--days', type=int, help='by default all the samples')
+    p.set_defaults(func=_storeMax)
+    p = storeParsers.add_parser('functions', help='the names of the stored functions')
+    p.add_argument('db')
+    p.set_defaults(func=_storeFunctions)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,6 @@
+import sys
+import traceback
+
 
 _decoRegistrey = dict()
 
@@ -26,3 +29,149 @@ def setDeco(f, w):
         _decoRegistrey[f.__name__] = w
     except AttributeError, e:
         pass
+
+
+class _LazyPatchFinder(object):
+    """
+    A sys.meta_path finder that holds the LazyMonkeys of the modules not imported yet
+
+    It only claims the import of a module that has pending patches, lets the other finders import it (by importing it
+    again while the module is marked as loading), then applies the patches.
+    """
+
+    def __init__(self):
+        self.pending = dict()
+        self._loading = set()
+
+    def add(self, lazyMonkey):
+        self.pending.setdefault(lazyMonkey.moduleDotPath, list()).append(lazyMonkey)
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def remove(self, lazyMonkey):
+        monkeys = self.pending.get(lazyMonkey.moduleDotPath, list())
+        if lazyMonkey in monkeys:
+            monkeys.remove(lazyMonkey)
+        if not monkeys:
+            self.pending.pop(lazyMonkey.moduleDotPath, None)
+        if not self.pending and self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_module(self, fullname, path=None):
+        if fullname in self.pending and fullname not in self._loading:
+            return self
+        return None
+
+    def load_module(self, fullname):
+        self._loading.add(fullname)
+        try:
+            __import__(fullname)
+        finally:
+            self._loading.discard(fullname)
+        m = sys.modules[fullname]
+        for lazyMonkey in list(self.pending.get(fullname, list())):
+            self.remove(lazyMonkey)
+            try:
+                lazyMonkey.apply(m)
+            except Exception:
+                # the import is done by the host application; do not fail it
+                traceback.print_exc()
+        return m
+
+
+_finder = _LazyPatchFinder()
+
+
+class LazyMonkey(object):
+    """
+    Patches a free function or a method (class.method format) of a module when the module is first imported, so that
+    patching a module does not import it, e.g.
+
+        lm = LazyMonkey('corelib.publish', 'Graph.addNode', profiler=p)
+        lm.patch()  # corelib.publish is patched the moment some code imports it
+
+    If the module is already imported, patch() applies the patch immediately.
+    """
+
+    def __init__(self, moduleDotPath, symbolDotPath, profiler=None, sampler=None):
+        """
+
+        Args:
+            moduleDotPath (str):
+            symbolDotPath (str): a free function name or a class.method name
+            profiler (object): optional; see frep.patch()
+            sampler (object): optional; see frep.patch()
+        """
+        self.moduleDotPath = moduleDotPath
+        self.symbolDotPath = symbolDotPath
+        self.profiler = profiler
+        self.sampler = sampler
+        self.applied = False
+
+    def patch(self):
+        m = sys.modules.get(self.moduleDotPath)
+        if m is not None:
+            self.apply(m)
+        else:
+            _finder.add(self)
+
+    def apply(self, m):
+        """
+        Args:
+            m (module): the imported module
+        """
+        import frep
+        if '.' in self.symbolDotPath:
+            frep.patch(m.__name__, methods=[self.symbolDotPath], profiler=self.profiler, sampler=self.sampler)
+        else:
+            frep.patch(m.__name__, freeFuncs=[self.symbolDotPath], profiler=self.profiler, sampler=self.sampler)
+        self.applied = True
+
+    def unpatch(self):
+        """
+        Cancels the pending patch or restores the applied one
+        """
+        import frep
+        _finder.remove(self)
+        if self.applied:
+            owner = sys.modules[self.moduleDotPath]
+            names = self.symbolDotPath.split('.')
+            for name in names[:-1]:
+                owner = getattr(owner, name)
+            frep._restore(owner, names[-1])
+            self.applied = False
+
+
+class Patches(object):
+    """
+    The patches applied by one frep.patchMatching() call
+
+    Attributes:
+        entries (list): (owner, name, original, backup name) tuples
+    """
+
+    def __init__(self, entries, names):
+        """
+
+        Args:
+            entries (list):
+            names (list): the qualified name (module.function, module.Class.method) of each entry
+        """
+        self.entries = entries
+        self._names = names
+
+    def __len__(self):
+        return len(self.entries)
+
+    def names(self):
+        """
+        Returns:
+            list: the qualified names of the patched callables, module included
+        """
+        return list(self._names)
+
+    def restore(self):
+        import frep
+        frep._restoreEntries(self.entries)
+        self.entries = list()
+        self._names = list()
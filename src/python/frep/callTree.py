@@ -0,0 +1,191 @@
+"""
+A call tree of the instrumented functions, built from their spans (see frep.spans)
+
+Each node is a distinct path of span names from a thread's outermost span, e.g. main > load > parse. The nodes are
+kept in parallel arrays indexed by node id rather than as objects, so a tree of a deep pipeline stays compact:
+
+    parents[i]     the id of the parent node (-1 for the root)
+    nameIds[i]     the index of the node's name in names
+    counts[i]      the number of calls
+    inclusive[i]   the total time of the calls, in seconds
+    childTime[i]   the part of inclusive[i] spent in the instrumented callees
+
+The self time of a node is inclusive[i] - childTime[i]; the threads share the tree.
+"""
+
+import array
+import threading
+
+from frep import spans
+
+
+class CallTree(spans.SpanListener):
+    """
+    Records the spans while it is registered as a span listener, e.g.
+
+        with CallTree() as tree:
+            pipeline()
+        for d in tree.report(limit=10):
+            print d
+    """
+
+    ROOT = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.names = list()
+            self._nameIds = dict()
+            self._children = dict()  # (parent id, name id): node id
+            self.parents = array.array('l', [-1])
+            self.nameIds = array.array('l', [-1])
+            self.counts = array.array('L', [0])
+            self.inclusive = array.array('d', [0.0])
+            self.childTime = array.array('d', [0.0])
+
+    def __enter__(self):
+        spans.addListener(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        spans.removeListener(self)
+
+    def __len__(self):
+        """
+        Returns:
+            int: the number of nodes excluding the root
+        """
+        return len(self.parents) - 1
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = list()
+        return stack
+
+    def _child(self, parent, name):
+        nameId = self._nameIds.get(name)
+        if nameId is None:
+            nameId = self._nameIds[name] = len(self.names)
+            self.names.append(name)
+        key = (parent, nameId)
+        node = self._children.get(key)
+        if node is None:
+            node = self._children[key] = len(self.parents)
+            self.parents.append(parent)
+            self.nameIds.append(nameId)
+            self.counts.append(0)
+            self.inclusive.append(0.0)
+            self.childTime.append(0.0)
+        return node
+
+    def onEnter(self, span):
+        stack = self._stack()
+        parent = stack[-1][1] if stack else self.ROOT
+        with self._lock:
+            node = self._child(parent, span.name)
+        stack.append((span, node))
+
+    def onExit(self, span):
+        stack = self._stack()
+        # a span opened before this tree was registered is not recorded
+        if not stack or stack[-1][0] is not span:
+            return
+        node = stack.pop()[1]
+        duration = span.end - span.begin
+        with self._lock:
+            self.counts[node] += 1
+            self.inclusive[node] += duration
+            self.childTime[self.parents[node]] += duration
+
+    def nameOf(self, node):
+        return self.names[self.nameIds[node]]
+
+    def pathOf(self, node):
+        """
+        Returns:
+            list: the names from the outermost span to the node
+        """
+        names = list()
+        while node != self.ROOT:
+            names.append(self.nameOf(node))
+            node = self.parents[node]
+        names.reverse()
+        return names
+
+    def selfTime(self, node):
+        return self.inclusive[node] - self.childTime[node]
+
+    def find(self, path):
+        """
+        Args:
+            path (list): the names from the outermost span
+
+        Returns:
+            int: the node id, None if the path has not been recorded
+        """
+        node = self.ROOT
+        for name in path:
+            nameId = self._nameIds.get(name)
+            node = self._children.get((node, nameId))
+            if node is None:
+                return None
+        return node
+
+    def report(self, limit=None, sortBy='self'):
+        """
+        Args:
+            limit (int): optional; the number of nodes to return
+            sortBy (str): optional; one of 'self', 'inclusive' and 'count'
+
+        Returns:
+            list: a dict per node, key: path (a list of names), count, inclusive, self; in descending order of sortBy
+        """
+        rows = [dict(path=self.pathOf(i), count=self.counts[i], inclusive=self.inclusive[i], self=self.selfTime(i))
+                for i in xrange(1, len(self.parents))]
+        rows.sort(key=lambda d: d[sortBy], reverse=True)
+        return rows[:limit] if limit is not None else rows
+
+    def byName(self):
+        """
+        Aggregates the nodes of the same function; the inclusive time of a recursive call is only counted at the
+        outermost occurrence of the function on the path
+
+        Returns:
+            dict: key: name, value: dict of count, inclusive, self
+        """
+        result = dict()
+        for i in xrange(1, len(self.parents)):
+            name = self.nameOf(i)
+            d = result.get(name)
+            if d is None:
+                d = result[name] = dict(count=0, inclusive=0.0, self=0.0)
+            d['count'] += self.counts[i]
+            d['self'] += self.selfTime(i)
+            if name not in self.pathOf(self.parents[i]):
+                d['inclusive'] += self.inclusive[i]
+        return result
+
+    def folded(self, unit=1e6):
+        """
+        Renders the tree in the folded-stack format that flame graph tools take, one line per node:
+
+            main;load;parse 1234
+
+        Args:
+            unit (float): optional; the weight of a line is the self time multiplied by unit, i.e. microseconds by
+                default
+
+        Returns:
+            list: the lines
+        """
+        lines = list()
+        for i in xrange(1, len(self.parents)):
+            weight = int(round(self.selfTime(i) * unit))
+            if weight > 0:
+                lines.append('{} {}'.format(';'.join(self.pathOf(i)), weight))
+        return lines
@@ -0,0 +1,59 @@
+"""
+High-resolution clocks that the standard library of Python 2 does not offer, read with clock_gettime(2) through ctypes
+
+monotonic():
+    seconds (float) of CLOCK_MONOTONIC; it is not affected by the changes of the system time, use it for durations
+
+threadTime():
+    seconds (float) of CLOCK_THREAD_CPUTIME_ID; the CPU time consumed by the calling thread
+"""
+
+import ctypes
+import os
+import time
+
+
+CLOCK_MONOTONIC = 1
+CLOCK_THREAD_CPUTIME_ID = 3
+
+
+class _TimeSpec(ctypes.Structure):
+    _fields_ = [
+        ('tv_sec', ctypes.c_long),
+        ('tv_nsec', ctypes.c_long),
+    ]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_clockGetTime = _libc.clock_gettime
+_clockGetTime.argtypes = [ctypes.c_int, ctypes.POINTER(_TimeSpec)]
+
+
+def clockGetTime(clockId):
+    """
+    Args:
+        clockId (int): CLOCK_*
+
+    Returns:
+        float: seconds
+    """
+    ts = _TimeSpec()
+    if _clockGetTime(clockId, ctypes.byref(ts)) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return ts.tv_sec + ts.tv_nsec * 1e-9
+
+
+if hasattr(time, 'monotonic'):
+    monotonic = time.monotonic
+else:
+    def monotonic():
+        return clockGetTime(CLOCK_MONOTONIC)
+
+
+if hasattr(time, 'clock_gettime') and hasattr(time, 'CLOCK_THREAD_CPUTIME_ID'):
+    def threadTime():
+        return time.clock_gettime(time.CLOCK_THREAD_CPUTIME_ID)
+else:
+    def threadTime():
+        return clockGetTime(CLOCK_THREAD_CPUTIME_ID)
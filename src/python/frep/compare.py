@@ -0,0 +1,379 @@
+"""
+Compares two runs of the same workload (e.g. the builds before and after a change) function by function
+
+A run file holds the messages of the profilers, each tagged with the name of the function it measures; RunWriter
+writes it as JSON lines:
+
+    w = compare.RunWriter('/tmp/candidate.jsonl')
+    frep.patch('render', freeFuncs=['bake'], profiler=profilers.SimpleTimerProfiler.create(
+        messenger=w.messenger('render.bake')))
+
+A JSON document is also accepted: a list of tagged messages or a dict of function name to a list of messages.
+
+The metrics of a function are the distributions of:
+
+time:
+    the latency of each call (SimpleTimerProfiler and any profiler that reports time)
+
+the other per-call measurements, see SCALAR_KEYS:
+    e.g. the CPU time and page faults of ResourceDeltaProfiler, the GC time of GcProfiler, the traced memory of
+    TraceMallocProfiler
+
+the pidstat columns (RSS, VSZ, kB_rd/s, ...):
+    the process record (TID 0) of each pidstat sample (PidStatParser.parse()), or the per-call mean of the process
+    (PidStatParser.reduce())
+
+The metrics of a message tagged with a profiler name (key profiler) are prefixed with it, e.g. timer.time, so that the
+profilers that report the same metric stay apart. The calls that raise are left out. For each metric found in both runs,
+the two distributions are compared with the Mann-Whitney U test (normal approximation with tie correction) or a
+bootstrap confidence interval of the relative change of the median; the p-values are Bonferroni-corrected for the number
+of metrics compared. Since every metric is "lower is better", a significant increase is a regression and a significant
+decrease an improvement. With hundreds of thousands of calls even a negligible shift is significant, hence the minChange
+threshold on the relative change of the median.
+
+The effect size is Cliff's delta, P(candidate > baseline) - P(candidate < baseline), in [-1, 1]; the results are
+ranked by its magnitude. NumPy does the ranking and the resampling when installed; the bootstrap requires it.
+"""
+
+import json
+import math
+import threading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from frep import exitHooks
+
+
+MANN_WHITNEY = 'mannwhitney'
+BOOTSTRAP = 'bootstrap'
+
+# the per-call measurements of the profilers (resourceUsage.delta(), gcMonitor.parse(), parsers.traceMalloc.parse())
+SCALAR_KEYS = ('time', 'cpu', 'offCpu', 'user', 'sys', 'voluntarySwitches', 'involuntarySwitches', 'minorFaults',
+               'majorFaults', 'rchar', 'wchar', 'read_bytes', 'write_bytes', 'gcTime', 'net', 'peak')
+
+# the pidstat columns that are not measurements
+PIDSTAT_KEYS = ('Time', 'UID', 'TGID', 'TID', 'Command')
+
+
+class RunWriter(object):
+    """
+    Writes the messages of the profilers as JSON lines, see the module docstring; the file is closed at interpreter
+    exit at the latest
+    """
+
+    def __init__(self, filePath):
+        self.filePath = filePath
+        self.numMessages = 0
+        self._fp = open(filePath, 'w')
+        self._lock = threading.Lock()
+        exitHooks.register(self)
+
+    def messenger(self, name):
+        """
+        Args:
+            name (str): the name of the function the profiler measures
+
+        Returns:
+            callable: a messenger that tags each message with the name
+        """
+        def _(d):
+            self.write(name, d)
+        return _
+
+    def write(self, name, d):
+        if not d:
+            return
+        d = dict(d)
+        d['name'] = name
+        text = json.dumps(d, separators=(',', ':'))
+        with self._lock:
+            if self._fp.closed:
+                return
+            self._fp.write(text + '\n')
+            self.numMessages += 1
+
+    def close(self):
+        with self._lock:
+            self._fp.close()
+
+
+def _messages(filePath):
+    with open(filePath, 'r') as fp:
+        text = fp.read()
+    try:
+        doc = json.loads(text)
+    except ValueError, e:
+        # JSON lines
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    if isinstance(doc, list):
+        return doc
+    if 'name' in doc:
+        return [doc]
+    messages = list()
+    for name, ds in doc.iteritems():
+        for d in ds:
+            d = dict(d)
+            d['name'] = name
+            messages.append(d)
+    return messages
+
+
+def _array(values):
+    if numpy is not None:
+        return numpy.asarray(values, dtype=numpy.float64)
+    return [float(v) for v in values]
+
+
+def values(d):
+    """
+    Extracts the metrics of one message, see the module docstring
+
+    Args:
+        d (dict): the message of a profiler
+
+    Returns:
+        list: (metric name, value) pairs; a metric can appear several times (one per pidstat sample)
+    """
+    prefix = '{}.'.format(d['profiler']) if d.get('profiler') else ''
+    pairs = list()
+    for k in SCALAR_KEYS:
+        if isinstance(d.get(k), (int, long, float)):
+            pairs.append((prefix + k, d[k]))
+    for sample in d.get('samples') or list():
+        for record in sample[1:]:
+            if record.get('TID', 0) == 0:
+                break
+        else:
+            continue
+        for k, v in record.iteritems():
+            if k not in PIDSTAT_KEYS and isinstance(v, (int, long, float)):
+                pairs.append((prefix + k, v))
+    reduced = d.get('reduced') or dict()
+    # the TIDs are strings once written as JSON
+    process = reduced.get(0) or reduced.get('0')
+    if process:
+        for k, s in process.iteritems():
+            pairs.append((prefix + k, s['mean']))
+    return pairs
+
+
+def load(filePath):
+    """
+    Args:
+        filePath (str): a run file, see the module docstring
+
+    Returns:
+        dict: key: function name, value: dict of metric name to the values (a NumPy array if NumPy is installed,
+            otherwise a list), plus numErrors, the number of calls left out
+    """
+    metrics = dict()
+    for d in _messages(filePath):
+        if not d:
+            continue
+        m = metrics.setdefault(d.get('name', ''), dict(numErrors=0))
+        if d.get('error'):
+            m['numErrors'] += 1
+            continue
+        for k, v in values(d):
+            m.setdefault(k, list()).append(v)
+    for m in metrics.itervalues():
+        for k, vs in m.items():
+            if k != 'numErrors':
+                m[k] = _array(vs)
+    return metrics
+
+
+def _ranks(x):
+    """
+    Returns:
+        tuple: the 1-based ranks of x (the ties get their average rank), the sizes of the groups of ties
+    """
+    if numpy is not None:
+        x = numpy.asarray(x)
+        order = numpy.argsort(x, kind='mergesort')
+        xs = x[order]
+        bounds = numpy.flatnonzero(numpy.concatenate(([True], xs[1:] != xs[:-1], [True])))
+        sizes = numpy.diff(bounds)
+        ranks = numpy.empty(len(x), dtype=numpy.float64)
+        ranks[order] = numpy.repeat((bounds[:-1] + bounds[1:] + 1) / 2.0, sizes)
+        return ranks, sizes
+    order = sorted(xrange(len(x)), key=x.__getitem__)
+    ranks = [0.0] * len(x)
+    sizes = list()
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and x[order[j + 1]] == x[order[i]]:
+            j += 1
+        for k in xrange(i, j + 1):
+            ranks[order[k]] = (i + j + 2) / 2.0
+        sizes.append(j - i + 1)
+        i = j + 1
+    return ranks, sizes
+
+
+def mannWhitney(a, b):
+    """
+    The two-sided Mann-Whitney U test
+
+    Args:
+        a (sequence): the baseline values
+        b (sequence): the candidate values
+
+    Returns:
+        tuple: U (the number of pairs in which b is greater, the ties counting half), the two-sided p-value, Cliff's
+            delta
+    """
+    n0 = len(a)
+    n1 = len(b)
+    if not n0 or not n1:
+        return 0.0, 1.0, 0.0
+    if numpy is not None:
+        ranks, sizes = _ranks(numpy.concatenate((a, b)))
+        rankSum = float(ranks[n0:].sum())
+        ties = float((sizes.astype(numpy.float64) ** 3 - sizes).sum())
+    else:
+        ranks, sizes = _ranks(list(a) + list(b))
+        rankSum = sum(ranks[n0:])
+        ties = float(sum(s ** 3 - s for s in sizes))
+    u = rankSum - n1 * (n1 + 1) / 2.0
+    n = n0 + n1
+    mean = n0 * n1 / 2.0
+    variance = n0 * n1 / 12.0 * ((n + 1) - ties / (n * (n - 1))) if n > 1 else 0.0
+    if variance <= 0.0:
+        # all the values are equal
+        return u, 1.0, 0.0
+    z = max(abs(u - mean) - 0.5, 0.0) / math.sqrt(variance)
+    return u, math.erfc(z / math.sqrt(2.0)), 2.0 * u / (n0 * n1) - 1.0
+
+
+def median(values):
+    if numpy is not None:
+        return float(numpy.median(values)) if len(values) else float('nan')
+    values = sorted(values)
+    n = len(values)
+    if not n:
+        return float('nan')
+    return values[n // 2] if n % 2 else (values[n // 2 - 1] + values[n // 2]) / 2.0
+
+
+def _relativeChange(m0, m1):
+    if m0 == 0:
+        return 0.0 if m1 == 0 else float('inf') * (1 if m1 > 0 else -1)
+    return m1 / m0 - 1.0
+
+
+def bootstrap(a, b, numResamples=1000, confidence=0.95, maxSamples=20000, seed=0):
+    """
+    A percentile bootstrap confidence interval of the relative change of the median, median(b) / median(a) - 1
+
+    Args:
+        a (sequence): the baseline values
+        b (sequence): the candidate values
+        numResamples (int): optional
+        confidence (float): optional
+        maxSamples (int): optional; the larger runs are subsampled (without replacement) to this size first
+        seed (int): optional; the resampling is reproducible
+
+    Returns:
+        tuple: the lower and upper bounds
+    """
+    if numpy is None:
+        raise ImportError('The bootstrap requires NumPy')
+    rng = numpy.random.RandomState(seed)
+    medians = list()
+    for x in (a, b):
+        x = numpy.asarray(x, dtype=numpy.float64)
+        if len(x) > maxSamples:
+            x = rng.choice(x, maxSamples, replace=False)
+        m = numpy.empty(numResamples)
+        # about 4M values per batch
+        batchSize = max(1, 4000000 // max(len(x), 1))
+        for i in xrange(0, numResamples, batchSize):
+            n = min(batchSize, numResamples - i)
+            m[i:i + n] = numpy.median(x[rng.randint(0, len(x), size=(n, len(x)))], axis=1)
+        medians.append(m)
+    m0, m1 = medians
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        changes = numpy.where(m0 != 0, m1 / m0 - 1.0, numpy.where(m1 == m0, 0.0, numpy.inf * numpy.sign(m1)))
+    tail = (1.0 - confidence) / 2.0 * 100.0
+    low, high = numpy.percentile(changes, [tail, 100.0 - tail])
+    return float(low), float(high)
+
+
+def compareRuns(baseline, candidate, method=MANN_WHITNEY, alpha=0.01, minChange=0.02, numResamples=1000):
+    """
+    Args:
+        baseline (dict): see load()
+        candidate (dict): see load()
+        method (str): optional; MANN_WHITNEY or BOOTSTRAP
+        alpha (float): optional; the family-wise significance level
+        minChange (float): optional; the minimum relative change of the median to report a difference
+        numResamples (int): optional; see bootstrap()
+
+    Returns:
+        list: one dict per function and metric found in both runs: name, metric, baselineCount, candidateCount,
+            baselineMedian, candidateMedian, change (the relative change of the median), effect (Cliff's delta), p
+            (Bonferroni-corrected; None for the bootstrap), low and high (the bootstrap interval; None for
+            Mann-Whitney), verdict ('regression', 'improvement' or ''); ranked by the verdict then the magnitude of the
+            effect
+    """
+    if method not in (MANN_WHITNEY, BOOTSTRAP):
+        raise ValueError('Unknown method {}'.format(method))
+    pairs = list()
+    for name in sorted(set(baseline) & set(candidate)):
+        for metric in sorted(set(baseline[name]) & set(candidate[name])):
+            if metric == 'numErrors':
+                continue
+            a = baseline[name][metric]
+            b = candidate[name][metric]
+            if len(a) and len(b):
+                pairs.append((name, metric, a, b))
+    confidence = 1.0 - alpha / max(len(pairs), 1)
+    results = list()
+    for name, metric, a, b in pairs:
+        u, p, effect = mannWhitney(a, b)
+        m0 = median(a)
+        m1 = median(b)
+        r = dict(name=name, metric=metric, baselineCount=len(a), candidateCount=len(b), baselineMedian=m0,
+                 candidateMedian=m1, change=_relativeChange(m0, m1), effect=effect, p=None, low=None, high=None)
+        if method == MANN_WHITNEY:
+            r['p'] = min(p * len(pairs), 1.0)
+            significant = r['p'] < alpha
+        else:
+            r['low'], r['high'] = bootstrap(a, b, numResamples=numResamples, confidence=confidence)
+            significant = r['low'] > 0.0 or r['high'] < 0.0
+        r['verdict'] = ''
+        if significant and abs(r['change']) >= minChange:
+            r['verdict'] = 'regression' if r['change'] > 0 else 'improvement'
+        results.append(r)
+    order = {'regression': 0, 'improvement': 1, '': 2}
+    results.sort(key=lambda r: (order[r['verdict']], -abs(r['effect'])))
+    return results
+
+
+def report(results, showAll=False):
+    """
+    Args:
+        results (list): see compareRuns()
+        showAll (bool): optional; whether to include the results with no verdict
+
+    Returns:
+        list: the lines of a table
+    """
+    lines = ['{:<12} {:<48} {:<12} {:>14} {:>14} {:>9} {:>7} {:>10}'.format(
+        'verdict', 'function', 'metric', 'baseline', 'candidate', 'change', 'effect', 'p / CI')]
+    for r in results:
+        if not showAll and not r['verdict']:
+            continue
+        if r['p'] is not None:
+            test = '{:.2g}'.format(r['p'])
+        else:
+            test = '[{:+.1%}, {:+.1%}]'.format(r['low'], r['high'])
+        lines.append('{:<12} {:<48} {:<12} {:>14.6g} {:>14.6g} {:>+9.1%} {:>+7.2f} {:>10}'.format(
+            r['verdict'] or '-', r['name'], r['metric'], r['baselineMedian'], r['candidateMedian'], r['change'],
+            r['effect'], test))
+    return lines
@@ -0,0 +1,47 @@
+"""
+Closes (or flushes) the registered objects at interpreter exit, the most recently registered first as atexit does, e.g.
+an AsyncMessenger before the RunWriter it delivers to
+
+Unlike atexit.register(obj.close), the registry only holds weak references: registering does not keep the object
+alive, and an object that is garbage collected is simply forgotten.
+"""
+
+import atexit
+import itertools
+import traceback
+import weakref
+
+
+# registration number: (weak reference, method name)
+_entries = dict()
+_numbers = itertools.count()
+
+
+def register(obj, methodName='close'):
+    """
+    Args:
+        obj (object):
+        methodName (str): optional; the method to call at exit, without arguments
+    """
+    number = next(_numbers)
+    # dict.pop() is atomic, the callback can run on any thread during a collection
+    _entries[number] = (weakref.ref(obj, lambda ref: _entries.pop(number, None)), methodName)
+
+
+def runAll():
+    """
+    Calls the method of every registered object that is still alive, the most recently registered first; it is
+    registered with atexit
+    """
+    for number in sorted(_entries.keys(), reverse=True):
+        entry = _entries.pop(number, None)
+        obj = entry[0]() if entry is not None else None
+        if obj is None:
+            continue
+        try:
+            getattr(obj, entry[1])()
+        except Exception:
+            traceback.print_exc()
+
+
+atexit.register(runAll)
@@ -0,0 +1,172 @@
+"""
+Writes the spans (see frep.spans) and the samples of the profilers to files that the visualisation tools read
+
+ChromeTraceWriter streams the trace-event JSON format of chrome://tracing and Perfetto: each span becomes a complete
+("X") event and the pidstat / proc samples become counter ("C") tracks of the process on the same timeline, e.g.
+
+    w = ChromeTraceWriter('/tmp/render.json')
+    p = profilers.PidStatProfiler.create(messenger=w)
+    with w:
+        render()
+
+FoldedStackWriter writes the call tree in the folded-stack format of flamegraph.pl; that format has no timeline, so
+the samples are only exported by ChromeTraceWriter.
+"""
+
+import json
+import os
+import threading
+
+from frep import callTree
+from frep import exitHooks
+from frep import spans
+
+
+class ChromeTraceWriter(spans.SpanListener):
+    """
+    Also a messenger: the dicts that carry samples (see PidStatParser.parse()) are written as counters, the dicts that
+    carry import records (see importTracker.parse()) as complete events, the others are ignored.
+
+    The events are written as they come; the file is a valid JSON array once the writer is closed, which happens at
+    interpreter exit at the latest (the trace viewers also load a trace that is not closed).
+    """
+
+    # counter track name: the columns of the process record plotted on it
+    COUNTERS = (
+        ('memory (kB)', ('RSS', 'VSZ')),
+        ('io (kB/s)', ('kB_rd/s', 'kB_wr/s')),
+        ('page faults (/s)', ('minflt/s', 'majflt/s')),
+    )
+
+    def __init__(self, filePath, counters=None):
+        """
+
+        Args:
+            filePath (str):
+            counters (tuple): optional; by default it uses COUNTERS
+        """
+        self.filePath = filePath
+        self.counters = counters if counters is not None else self.COUNTERS
+        self.pid = os.getpid()
+        self.numEvents = 0
+        self._fp = open(filePath, 'w')
+        self._fp.write('[\n')
+        self._lock = threading.Lock()
+        self._threadIds = set()
+        self._closed = False
+        exitHooks.register(self)
+
+    def __enter__(self):
+        spans.addListener(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        spans.removeListener(self)
+        self.close()
+
+    def __call__(self, d):
+        if not d:
+            return
+        if d.get('samples'):
+            self.addSamples(d['samples'])
+        if d.get('modules'):
+            self.addImports(d['modules'])
+
+    def write(self, event):
+        """
+        Args:
+            event (dict): a trace event
+        """
+        text = json.dumps(event, separators=(',', ':'))
+        with self._lock:
+            if self._closed:
+                return
+            if self.numEvents:
+                self._fp.write(',\n')
+            self._fp.write(text)
+            self.numEvents += 1
+
+    def onExit(self, span):
+        if span.threadId not in self._threadIds:
+            self._threadIds.add(span.threadId)
+            self.write(dict(name='thread_name', ph='M', pid=self.pid, tid=span.threadId,
+                            args=dict(name=threading.current_thread().name)))
+        self.write(dict(name=span.name, cat='frep', ph='X', pid=self.pid, tid=span.threadId,
+                        ts=span.begin * 1e6, dur=(span.end - span.begin) * 1e6))
+
+    def addSamples(self, samples):
+        """
+        Writes the process record (TID 0) of each sample as counter events
+
+        Args:
+            samples (list): see PidStatParser.parse()
+        """
+        for sample in samples:
+            for record in sample[1:]:
+                if record['TID'] == 0:
+                    break
+            else:
+                continue
+            ts = record['Time'] * 1e6
+            for name, columns in self.counters:
+                self.write(dict(name=name, ph='C', pid=record['TGID'], ts=ts,
+                                args=dict((k, record[k]) for k in columns)))
+
+    def addImports(self, records):
+        """
+        Writes each import as a complete event named import <module> on the importing thread's track
+
+        Args:
+            records (list): see importTracker
+        """
+        for record in records:
+            self.write(dict(name='import {}'.format(record['name']), cat='import', ph='X', pid=self.pid,
+                            tid=record['threadId'], ts=record['begin'] * 1e6, dur=record['cumulative'] * 1e6,
+                            args=dict(rss=record['rss'], selfRss=record['selfRss'])))
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._fp.write('\n]\n')
+            self._fp.close()
+
+
+class FoldedStackWriter(callTree.CallTree):
+    """
+    Records a call tree and writes it to filePath when closed, one line per call path weighted by its self time in
+    microseconds:
+
+        module.main;module.load;module.parse 1234
+    """
+
+    def __init__(self, filePath, unit=1e6):
+        """
+
+        Args:
+            filePath (str):
+            unit (float): optional; see CallTree.folded()
+        """
+        super(FoldedStackWriter, self).__init__()
+        self.filePath = filePath
+        self.unit = unit
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        super(FoldedStackWriter, self).__exit__(exc_type, exc_val, exc_tb)
+        self.close()
+
+    def close(self):
+        writeFolded(self, self.filePath, unit=self.unit)
+
+
+def writeFolded(tree, filePath, unit=1e6):
+    """
+    Args:
+        tree (object): implements folded(unit), e.g. callTree.CallTree or importTracker.ImportTracker
+        filePath (str):
+        unit (float): optional; see CallTree.folded()
+    """
+    with open(filePath, 'w') as fp:
+        for line in tree.folded(unit=unit):
+            fp.write(line + '\n')
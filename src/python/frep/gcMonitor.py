@@ -0,0 +1,237 @@
+"""
+Times the garbage collections through gc.callbacks (Python 3.3+) and attributes each pause to the frames that are
+open on the collecting thread
+
+A collection runs on the thread whose allocation triggers it, so the pause is charged to every frame pushed (and not
+yet popped) by that thread; the outer calls therefore include the pauses of their inner calls, like their wall time.
+The callback is only registered while at least one frame is open.
+
+Without gc.callbacks (Python 2) the collections cannot be observed. By default the collector is left alone and a
+frame only reports the number of collections per generation, inferred from gc.get_count() at push() and pop() (see
+inferCollections()); the pauses are not timed.
+
+A timed frame (push(timed=True)), an explicit opt-in on Python 2, changes the collector of the whole process while it
+is open: the automatic collections are disabled and gc.collect() is replaced by a function that times the explicit
+ones. When a frame is popped, the collection that the allocations made in the meantime would have triggered (see
+gc.get_count() and gc.get_threshold()) is run and timed: the garbage is collected in one pause instead of several
+smaller ones, at the end of the call rather than during it, and gc.isenabled() is False during the call, on every
+thread. If the program has disabled the automatic collections, only the explicit ones are timed.
+"""
+
+import gc
+import threading
+
+from frep import clocks
+
+
+GENERATIONS = 3
+
+_lock = threading.Lock()
+_local = threading.local()
+_numOpen = [0]
+# the number of open timed frames, without gc.callbacks
+_numTimed = [0]
+# whether the automatic collections were enabled when the first timed frame was pushed, without gc.callbacks
+_wasEnabled = [False]
+_gcCollect = gc.collect
+
+
+class GcFrame(object):
+    """
+    Attributes:
+        begin (float): monotonic time at push()
+        timed (bool): whether the collections are timed; if not, times, collected and uncollectable are None
+        startCounts (tuple): gc.get_count() at push()
+        times (list): the pause time per generation, in seconds
+        counts (list): the number of collections per generation
+        collected (int): the number of objects collected
+        uncollectable (int): the number of uncollectable objects found
+    """
+
+    __slots__ = ('begin', 'timed', 'startCounts', 'times', 'counts', 'collected', 'uncollectable')
+
+    def __init__(self, timed=True):
+        self.begin = clocks.monotonic()
+        self.timed = timed
+        self.startCounts = gc.get_count()
+        self.times = [0.0] * GENERATIONS if timed else None
+        self.counts = [0] * GENERATIONS
+        self.collected = 0 if timed else None
+        self.uncollectable = 0 if timed else None
+
+    @property
+    def gcTime(self):
+        return sum(self.times) if self.timed else None
+
+
+def isAvailable():
+    return hasattr(gc, 'callbacks')
+
+
+def _frames():
+    frames = getattr(_local, 'frames', None)
+    if frames is None:
+        frames = _local.frames = list()
+    return frames
+
+
+def inferCollections(begin, end, thresholds):
+    """
+    Lower bounds of the number of collections per generation between two readings of gc.get_count(): a collection of
+    a generation resets the counts up to its own and increments the count of the next one, and a generation is only
+    collected once its count exceeds its threshold (the youngest generation aside); a collection of the oldest
+    generation that leaves its count unchanged is not seen
+
+    Args:
+        begin (tuple): gc.get_count()
+        end (tuple): gc.get_count()
+        thresholds (tuple): gc.get_threshold()
+
+    Returns:
+        list: the number of collections per generation
+    """
+    n2 = 1 if end[2] < begin[2] else 0
+    n1 = end[2] + max(0, thresholds[2] + 1 - begin[2]) if n2 else end[2] - begin[2]
+    if n1 and not n2:
+        n0 = end[1] + max(0, thresholds[1] + 1 - begin[1])
+    elif n1 or n2:
+        n0 = end[1]
+    else:
+        n0 = end[1] - begin[1]
+    return [n0, n1, n2]
+
+
+def _charge(generation, pause, collected, uncollectable):
+    for frame in getattr(_local, 'frames', None) or list():
+        if not frame.timed:
+            continue
+        frame.times[generation] += pause
+        frame.counts[generation] += 1
+        frame.collected += collected
+        frame.uncollectable += uncollectable
+
+
+def _callback(phase, info):
+    if phase == 'start':
+        _local.start = clocks.monotonic()
+        return
+    start = getattr(_local, 'start', None)
+    if start is None:
+        return
+    _local.start = None
+    _charge(info['generation'], clocks.monotonic() - start, info.get('collected', 0), info.get('uncollectable', 0))
+
+
+def _timedCollect(generation=GENERATIONS - 1):
+    """
+    Replaces gc.collect() while a frame is open, without gc.callbacks
+    """
+    numGarbage = len(gc.garbage)
+    start = clocks.monotonic()
+    numUnreachable = _gcCollect(generation)
+    pause = clocks.monotonic() - start
+    uncollectable = len(gc.garbage) - numGarbage
+    _charge(generation, pause, numUnreachable - uncollectable, uncollectable)
+    return numUnreachable
+
+
+def _collectPending():
+    """
+    Runs the collection that the automatic collector would run by now, if any: that of the oldest generation whose
+    count exceeds its threshold, once the youngest one does
+    """
+    counts = gc.get_count()
+    thresholds = gc.get_threshold()
+    if not thresholds[0] or counts[0] <= thresholds[0]:
+        return
+    for generation in xrange(GENERATIONS - 1, -1, -1):
+        if generation == 0 or counts[generation] > thresholds[generation]:
+            _timedCollect(generation)
+            return
+
+
+def push(timed=False):
+    """
+    Opens a frame on the calling thread
+
+    Args:
+        timed (bool): optional; without gc.callbacks, whether to time the collections, see the module doc
+
+    Returns:
+        GcFrame:
+    """
+    timed = timed and not isAvailable()
+    with _lock:
+        if not _numOpen[0] and isAvailable():
+            gc.callbacks.append(_callback)
+        _numOpen[0] += 1
+        if timed:
+            if not _numTimed[0]:
+                _wasEnabled[0] = gc.isenabled()
+                gc.disable()
+                gc.collect = _timedCollect
+            _numTimed[0] += 1
+    frame = GcFrame(timed=timed or isAvailable())
+    _frames().append(frame)
+    return frame
+
+
+def pop():
+    """
+    Closes the innermost frame of the calling thread
+
+    Returns:
+        tuple: the frame, the elapsed wall time in seconds
+    """
+    frames = _frames()
+    timed = frames[-1].timed and not isAvailable()
+    if timed:
+        with _lock:
+            wasEnabled = _wasEnabled[0]
+        if wasEnabled:
+            # while the frame is still open, so that it is charged with the pause
+            _collectPending()
+    frame = frames.pop()
+    elapsed = clocks.monotonic() - frame.begin
+    if not frame.timed:
+        frame.counts = inferCollections(frame.startCounts, gc.get_count(), gc.get_threshold())
+    with _lock:
+        _numOpen[0] -= 1
+        if not _numOpen[0] and isAvailable():
+            if _callback in gc.callbacks:
+                gc.callbacks.remove(_callback)
+        if timed:
+            _numTimed[0] -= 1
+            if not _numTimed[0]:
+                gc.collect = _gcCollect
+                if _wasEnabled[0]:
+                    gc.enable()
+    return frame, elapsed
+
+
+def parse(frame, elapsed, ed=None):
+    """
+    Args:
+        frame (GcFrame):
+        elapsed (float): the wall time of the call, in seconds
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: time, gcTime, gcShare (gcTime / time), gcTimes and collections (per generation), collected,
+            uncollectable, error, traceback; gcTime, gcShare, gcTimes, collected and uncollectable are None if the
+            frame is not timed
+    """
+    result = dict()
+    result['time'] = elapsed
+    result['gcTime'] = frame.gcTime
+    if frame.timed:
+        result['gcShare'] = frame.gcTime / elapsed if elapsed > 0 else 0.0
+    else:
+        result['gcShare'] = None
+    result['gcTimes'] = list(frame.times) if frame.timed else None
+    result['collections'] = list(frame.counts)
+    result['collected'] = frame.collected
+    result['uncollectable'] = frame.uncollectable
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
@@ -0,0 +1,118 @@
+"""
+A log-linear (HDR-style) histogram of non-negative integers, e.g. latencies in nanoseconds
+
+The values below 2 ** SUB_BUCKET_BITS are counted exactly; above that, every power-of-two range is split into
+2 ** (SUB_BUCKET_BITS - 1) linear sub-buckets, so the relative error of a reported value is below
+1 / 2 ** (SUB_BUCKET_BITS - 1) (0.8% by default) while the memory only grows with the log of the largest value.
+"""
+
+import array
+import math
+
+
+class Histogram(object):
+    """
+    Attributes:
+        count (int): the number of recorded values
+        total (int): the sum of the recorded values
+        min (int): None if empty
+        max (int): None if empty
+    """
+
+    SUB_BUCKET_BITS = 8
+
+    def __init__(self, subBucketBits=None):
+        """
+
+        Args:
+            subBucketBits (int): optional; by default it uses SUB_BUCKET_BITS
+        """
+        self.subBucketBits = subBucketBits if subBucketBits is not None else self.SUB_BUCKET_BITS
+        self._half = 1 << (self.subBucketBits - 1)
+        self._exact = 1 << self.subBucketBits
+        self.reset()
+
+    def reset(self):
+        self.counts = array.array('L')
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def indexOf(self, value):
+        if value < self._exact:
+            return value
+        shift = value.bit_length() - self.subBucketBits
+        return (shift + 1) * self._half + (value >> shift) - self._half
+
+    def rangeOf(self, index):
+        """
+        Returns:
+            tuple: the lowest and the highest value counted by the bucket
+        """
+        if index < self._exact:
+            return index, index
+        shift = index // self._half - 1
+        sub = index % self._half + self._half
+        return sub << shift, ((sub + 1) << shift) - 1
+
+    def record(self, value, n=1):
+        """
+        Args:
+            value (int): non-negative
+            n (int): optional; the number of occurrences
+        """
+        index = self.indexOf(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += n
+        self.count += n
+        self.total += value * n
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Adds the values of another histogram of the same sub-bucket bits
+        """
+        if other.subBucketBits != self.subBucketBits:
+            raise ValueError('Can not merge histograms of different precisions')
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for i, n in enumerate(other.counts):
+            if n:
+                self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+
+    def copy(self):
+        h = type(self)(subBucketBits=self.subBucketBits)
+        h.merge(self)
+        return h
+
+    def mean(self):
+        return float(self.total) / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """
+        Args:
+            q (float): from 0 to 100
+
+        Returns:
+            int: the highest value equivalent to the q-th percentile (capped by max); 0 if empty
+        """
+        if not self.count:
+            return 0
+        target = max(1, int(math.ceil(q / 100.0 * self.count)))
+        cumulative = 0
+        for i, n in enumerate(self.counts):
+            cumulative += n
+            if cumulative >= target:
+                return min(self.rangeOf(i)[1], self.max)
+        return self.max
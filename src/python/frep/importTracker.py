@@ -0,0 +1,176 @@
+"""
+Records the imports of the process as a tree: a sys.meta_path finder claims the import of every module that the
+remaining finders can find, then lets them load it (by importing it again while the module is marked as loading, as
+augmentation's lazy patches do), timing each load; the modules imported while a module is being executed become its
+children. The other meta path finders, the path hooks (e.g. zipimport) and the lazy patches therefore keep working.
+
+Each record is a dict:
+
+    name        the full name of the module
+    parent      the index of the importing module's record, -1 for a top-level import
+    depth       0 for a top-level import
+    threadId    the ident of the importing thread
+    begin       wall time
+    cumulative  the time spent loading the module, including its imports, in seconds
+    self        cumulative minus the cumulative time of the children
+    rss         the growth of the RSS while loading the module, including its imports, in kB
+    selfRss     rss minus the rss of the children
+    failed      whether the module raised an exception while loading
+
+The reloads (see reload()) are not tracked.
+"""
+
+import imp
+import pkgutil
+import sys
+import threading
+import time
+
+from frep import procSampler
+
+
+STATM = '/proc/self/statm'
+
+
+def _rss():
+    try:
+        return procSampler.readStatm(STATM)[1]
+    except (IOError, OSError):
+        return 0
+
+
+class ImportTracker(object):
+    """
+    E.g.
+
+        tracker = ImportTracker()
+        tracker.install()
+        import heavyTool
+        tracker.uninstall()
+        print tracker.report(limit=10)
+    """
+
+    def __init__(self):
+        self.records = list()
+        self._loading = set()
+        self._local = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = list()
+        return stack
+
+    def find_module(self, fullname, path=None):
+        if fullname in self._loading or fullname in sys.modules or not self._findable(fullname, path):
+            return None
+        return self
+
+    def _findable(self, fullname, path):
+        """
+        Returns:
+            bool: whether the finders after this one in sys.meta_path, or the path based import, find the module
+        """
+        metaPath = sys.meta_path[sys.meta_path.index(self) + 1:] if self in sys.meta_path else sys.meta_path
+        for finder in metaPath:
+            if finder.find_module(fullname, path) is not None:
+                return True
+        if path is None and (imp.is_builtin(fullname) or imp.is_frozen(fullname)):
+            return True
+        for item in (path if path is not None else sys.path):
+            # the importer of the path hooks, or the default one
+            importer = pkgutil.get_importer(item)
+            if importer is not None and importer.find_module(fullname) is not None:
+                return True
+        return False
+
+    def load_module(self, fullname):
+        stack = self._stack()
+        record = dict(name=fullname, parent=stack[-1][0] if stack else -1, depth=len(stack),
+                      threadId=threading.current_thread().ident, begin=time.time(),
+                      cumulative=0.0, self=0.0, rss=0, selfRss=0, failed=True)
+        index = len(self.records)
+        self.records.append(record)
+        children = [0.0, 0]
+        stack.append((index, children))
+        rss = _rss()
+        # the imports run under the import lock
+        self._loading.add(fullname)
+        try:
+            __import__(fullname)
+            m = sys.modules[fullname]
+            record['failed'] = False
+            return m
+        finally:
+            self._loading.discard(fullname)
+            stack.pop()
+            record['cumulative'] = time.time() - record['begin']
+            record['rss'] = _rss() - rss
+            record['self'] = record['cumulative'] - children[0]
+            record['selfRss'] = record['rss'] - children[1]
+            if stack:
+                stack[-1][1][0] += record['cumulative']
+                stack[-1][1][1] += record['rss']
+
+    def report(self, limit=None, sortBy='self'):
+        """
+        Args:
+            limit (int): optional; the number of modules to return
+            sortBy (str): optional; any numeric key of the records
+
+        Returns:
+            list: the records in descending order of sortBy
+        """
+        return report(self.records, limit=limit, sortBy=sortBy)
+
+    def folded(self, unit=1e6):
+        return folded(self.records, unit=unit)
+
+
+def report(records, limit=None, sortBy='self'):
+    rows = sorted(records, key=lambda d: d[sortBy], reverse=True)
+    return rows[:limit] if limit is not None else rows
+
+
+def folded(records, unit=1e6):
+    """
+    Renders the import tree in the folded-stack format (see CallTree.folded()), weighted by the self time
+
+    Returns:
+        list: the lines
+    """
+    paths = list()
+    lines = list()
+    for record in records:
+        parent = record['parent']
+        path = (paths[parent] + ';' if parent >= 0 else '') + record['name']
+        paths.append(path)
+        weight = int(round(record['self'] * unit))
+        if weight > 0:
+            lines.append('{} {}'.format(path, weight))
+    return lines
+
+
+def parse(records, ed=None):
+    """
+    Args:
+        records (list):
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: modules (the records), time (the cumulative time of the top-level imports), error, traceback
+    """
+    result = dict()
+    result['modules'] = records
+    result['time'] = sum(d['cumulative'] for d in records if d['parent'] < 0)
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
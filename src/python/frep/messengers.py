@@ -0,0 +1,171 @@
+"""
+Messengers take the dict generated by a profiler and send it to somewhere
+
+AsyncMessenger moves the delivery (and, for the profilers that support it, the parsing) off the SUP's thread: the
+profiler only puts the message in a bounded queue, one or more worker threads take the messages in batches and hand
+them to the wrapped messenger.
+"""
+
+import Queue
+import threading
+import traceback
+
+from frep import exitHooks
+
+
+class _Deferred(object):
+
+    __slots__ = ('f', 'args', 'kwargs')
+
+    def __init__(self, f, args, kwargs):
+        self.f = f
+        self.args = args
+        self.kwargs = kwargs
+
+
+class AsyncMessenger(object):
+    """
+    Wraps any messenger callable, e.g.
+
+        m = AsyncMessenger(sendToElasticSearch)
+        p = profilers.PidStatProfiler.create(messenger=m)
+
+    When the queue is full the message is dropped (and counted) unless block is True, in which case the caller waits
+    up to timeout seconds for a free slot before dropping it. A dropped deferred call (see defer()) still runs on the
+    caller's thread, so that the profiler releases what the call holds (e.g. a dump file); only its result is dropped.
+
+    The queue is flushed at interpreter exit, see exitHooks.
+
+    Attributes:
+        numDelivered (int): the number of messages handed to the wrapped messenger
+        numDropped (int): the number of messages dropped because the queue is full
+        numFailed (int): the number of messages that the parser or the wrapped messenger fails to process
+    """
+
+    def __init__(self, messenger, maxSize=10000, batchSize=100, numWorkers=1, block=False, timeout=None,
+                 batched=False):
+        """
+
+        Args:
+            messenger (callable): takes a dict (or a list of dicts if batched is True)
+            maxSize (int): optional; the capacity of the queue
+            batchSize (int): optional; the maximum number of messages a worker takes at once
+            numWorkers (int): optional; the number of worker threads
+            block (bool): optional; whether to apply back pressure when the queue is full
+            timeout (float): optional; see block; None means waiting indefinitely
+            batched (bool): optional; whether the messenger takes a list of dicts per call
+        """
+        self.messenger = messenger
+        self.batchSize = batchSize
+        self.block = block
+        self.timeout = timeout
+        self.batched = batched
+        self.numDelivered = 0
+        self.numDropped = 0
+        self.numFailed = 0
+        self._queue = Queue.Queue(maxSize)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._workers = list()
+        for i in xrange(numWorkers):
+            t = threading.Thread(target=self._run, name='frep-asyncMessenger-{}'.format(i))
+            t.daemon = True
+            t.start()
+            self._workers.append(t)
+        exitHooks.register(self)
+
+    def __call__(self, d):
+        self._put(d)
+
+    def defer(self, parser, *args, **kwargs):
+        """
+        Queues a call of parser(*args, **kwargs) whose result is delivered to the messenger; profilers use this to
+        move the parsing off the SUP's thread
+
+        Args:
+            parser (callable):
+        """
+        self._put(_Deferred(parser, args, kwargs))
+
+    def flush(self):
+        """
+        Blocks until every queued message is processed
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Flushes the queue then stops the workers; the messages sent afterwards are dropped
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        for t in self._workers:
+            self._queue.put(None)
+        for t in self._workers:
+            t.join()
+
+    def _put(self, item):
+        if not self._closed:
+            try:
+                self._queue.put(item, self.block, self.timeout)
+                return
+            except Queue.Full:
+                pass
+        with self._lock:
+            self.numDropped += 1
+        if isinstance(item, _Deferred):
+            try:
+                item.f(*item.args, **item.kwargs)
+            except Exception:
+                traceback.print_exc()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # stop at a sentinel so that each worker receives one
+            while len(batch) < self.batchSize and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except Queue.Empty:
+                    break
+            try:
+                self._deliver([item for item in batch if item is not None])
+            finally:
+                for item in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def _deliver(self, batch):
+        messages = list()
+        numFailed = 0
+        for item in batch:
+            if isinstance(item, _Deferred):
+                try:
+                    item = item.f(*item.args, **item.kwargs)
+                except Exception:
+                    traceback.print_exc()
+                    numFailed += 1
+                    continue
+            messages.append(item)
+        numDelivered = 0
+        if self.batched and messages:
+            try:
+                self.messenger(messages)
+                numDelivered = len(messages)
+            except Exception:
+                traceback.print_exc()
+                numFailed += len(messages)
+        else:
+            for d in messages:
+                try:
+                    self.messenger(d)
+                    numDelivered += 1
+                except Exception:
+                    traceback.print_exc()
+                    numFailed += 1
+        with self._lock:
+            self.numDelivered += numDelivered
+            self.numFailed += numFailed
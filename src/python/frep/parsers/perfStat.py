@@ -6,6 +6,59 @@ def parse(text, ed=None):
     return PerfStatParser(text, ed=ed).parse()
 
 
+def parseIntervalLine(line):
+    """
+    Parses one line of the CSV, interval output of perf stat (-x, -I <msec>), e.g.
+
+         1.001234567,7.89,msec,task-clock,7892358,100.00,0.003,CPUs utilized
+
+    Args:
+        line (str):
+
+    Returns:
+        tuple: (timestamp, key, value) or None if the line is not a counter; the value is None if the counter is not
+            counted; the key follows the human-readable output of perf stat, e.g. 'task-clock (msec)', 'instructions'
+    """
+    fields = line.strip().split(',')
+    if len(fields) < 4:
+        return None
+    try:
+        ts = float(fields[0])
+    except ValueError, e:
+        return None
+    try:
+        value = float(fields[1])
+    except ValueError, e:
+        # <not counted>, <not supported>
+        value = None
+    unit, event = fields[2], fields[3]
+    k = '{} ({})'.format(event, unit) if unit else event
+    return ts, k, value
+
+
+def fromCounts(counts, elapsed, ed=None):
+    """
+    Builds the same dict as parse() from raw counter values
+
+    Args:
+        counts (dict): counter name (see parseIntervalLine) to value
+        elapsed (float): wall time in seconds
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict:
+    """
+    d = dict(counts)
+    clock = d.get('task-clock (msec)', d.get('cpu-clock (msec)'))
+    if clock is not None:
+        d['CPU-Utilization'] = clock / (elapsed * 1000.0) if elapsed else 0.0
+        d['CPU-Instructions-executed'] = clock
+    d['time-elapsed'] = elapsed
+    d['error'] = ed.errorText if ed is not None else ''
+    d['traceback'] = ed.tbStrings if ed is not None else list()
+    return d
+
+
 class Begin(object):
     pass
 
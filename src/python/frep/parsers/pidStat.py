@@ -0,0 +1,318 @@
+"""
+A columnar parser of the pidstat dump
+
+Unlike PidStatParser, which creates one ProcessRecord per row, this parser stores each column in one array:
+a NumPy structured array if NumPy is installed, otherwise one array.array per column. The rows are located with a
+single compiled regular expression over the whole dump and split column-wise, so the per-value cost is a C-level
+conversion instead of a Python dict insertion.
+
+With NumPy, the numbers are converted in one pass as fixed-point integers: pidstat prints every decimal column with the
+same number of decimals, so once the dots are removed the dump parses as integers, about twice as fast as floats. A
+dump that does not follow that layout is parsed as floats instead.
+
+The rows are kept in the order of the dump; use PidStatTable.select() to look up the rows by Time and TID.
+"""
+
+import array
+import itertools
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+BEGIN = '<pidstat>'
+END = '</pidstat>'
+
+INT_COLUMNS = ('Time', 'UID', 'TGID', 'TID', 'VSZ', 'RSS', 'StkSize', 'StkRef', 'iodelay')
+STR_COLUMNS = ('Command', )
+
+_headerPattern = re.compile(r'^#(.*)$', re.M)
+_rowPattern = re.compile(r'^[ \t]*(\d.*)$', re.M)
+# the characters of the numeric columns
+_NUMBER_CHARS = '0123456789.- \t\n'
+
+
+def parse(filePath, ed=None):
+    return PidStatColumnarParser(filePath, ed=ed).parse()
+
+
+class PidStatTable(object):
+    """
+    Attributes:
+        columns (list): the column names, in the order of the dump
+        data (object): a numpy structured array if numpy is available, otherwise a dict of column name to
+            array.array ('l' or 'd') or list (for the string columns)
+        sampleOffsets (list): the index of the first row (the process record) of each sample
+    """
+
+    def __init__(self, columns, data, sampleOffsets):
+        self.columns = columns
+        self.data = data
+        self.sampleOffsets = sampleOffsets
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def column(self, name):
+        """
+        Args:
+            name (str): e.g. 'RSS'
+
+        Returns:
+            object: a numpy array, an array.array or a list
+        """
+        return self.data[name]
+
+    def select(self, tid=None, begin=None, end=None):
+        """
+        Args:
+            tid (int): optional; 0 selects the process records
+            begin (int): optional; the minimum Time
+            end (int): optional; the maximum Time
+
+        Returns:
+            list: the indices of the selected rows
+        """
+        if numpy is not None:
+            mask = numpy.ones(len(self), dtype=bool)
+            if tid is not None:
+                mask &= self.data['TID'] == tid
+            if begin is not None:
+                mask &= self.data['Time'] >= begin
+            if end is not None:
+                mask &= self.data['Time'] <= end
+            return numpy.flatnonzero(mask).tolist()
+        tids = self.data['TID']
+        times = self.data['Time']
+        return [i for i in xrange(len(self))
+                if (tid is None or tids[i] == tid) and
+                (begin is None or times[i] >= begin) and
+                (end is None or times[i] <= end)]
+
+    def record(self, index):
+        """
+        Returns:
+            dict: the row as a dict, like ProcessRecord
+        """
+        return dict((c, self._item(c, index)) for c in self.columns)
+
+    def toSamples(self):
+        """
+        Returns:
+            list: the samples in the layout of PidStatParser.parse()
+        """
+        samples = list()
+        offsets = list(self.sampleOffsets) + [len(self)]
+        for begin, end in zip(offsets[:-1], offsets[1:]):
+            samples.append([list(self.columns)] + [self.record(i) for i in xrange(begin, end)])
+        return samples
+
+    def _item(self, c, index):
+        v = self.data[c][index]
+        # from numpy scalar to Python scalar
+        return v.item() if numpy is not None else v
+
+
+class PidStatColumnarParser(object):
+
+    def __init__(self, filePath, ed=None):
+        """
+
+        Args:
+            filePath (str):
+            ed (ExceptionDescriptor):
+        """
+        self.filePath = filePath
+        self.ed = ed
+
+    def parse(self):
+        """
+        Returns:
+            dict: {'table': PidStatTable, 'error': str, 'traceback': list} or None if the dump is incomplete
+        """
+        FAILED = None
+        with open(self.filePath, 'r') as fp:
+            text = fp.read()
+        if BEGIN not in text[:1024].split('\n', 3)[:3]:
+            return FAILED
+        # the end marker is on the last line, rstrip() of the whole dump would copy it
+        tail = text[-1024:].rstrip()
+        if not tail[tail.rfind('\n') + 1:].startswith(END):
+            return FAILED
+        result = dict()
+        result['table'] = self.parseText(text)
+        result['error'] = self.ed.errorText if self.ed is not None else ''
+        result['traceback'] = self.ed.tbStrings if self.ed is not None else list()
+        return result
+
+    @classmethod
+    def parseText(cls, text):
+        """
+        Args:
+            text (str): the content of a dump
+
+        Returns:
+            PidStatTable:
+        """
+        header = _headerPattern.search(text)
+        if header is None:
+            return PidStatTable(list(), dict(), list())
+        columns = header.groups()[0].split()
+        rows = _rowPattern.findall(text)
+        # pidstat prints the command in the last column
+        numNumeric = len(columns) - 1 if columns[-1] in STR_COLUMNS else len(columns)
+        if numpy is not None:
+            data = cls._toStructuredArray(columns, numNumeric, rows)
+        else:
+            tokens, strings = cls._split(columns, numNumeric, rows)
+            data = cls._toArrays(columns, numNumeric, tokens, strings)
+        return PidStatTable(columns, data, cls._sampleOffsets(columns, data))
+
+    @classmethod
+    def _split(cls, columns, numNumeric, rows):
+        """
+        Returns:
+            tuple: (the numeric values of all the rows, the values of the string column)
+        """
+        n = len(columns)
+        tokens = '\n'.join(rows).split()
+        if len(tokens) == len(rows) * n:
+            strings = tokens[numNumeric::n]
+            del tokens[numNumeric::n]
+            return tokens, strings
+        # some command contains white spaces
+        cells = [row.split(None, n - 1) for row in rows]
+        for i, c in enumerate(cells):
+            if len(c) != n:
+                raise ValueError('Can not parse: row {}, expect {} columns: {}'.format(i, n, rows[i]))
+        strings = [c[-1] for c in cells] if numNumeric < n else list()
+        return [v for c in cells for v in c[:numNumeric]], strings
+
+    @classmethod
+    def _raiseInvalidToken(cls, columns, tokens):
+        numNumeric = len(columns) if columns[-1] not in STR_COLUMNS else len(columns) - 1
+        for i, v in enumerate(tokens):
+            try:
+                float(v)
+            except ValueError:
+                raise ValueError('Can not parse: row {}, k {}, v {}'.format(i / numNumeric, columns[i % numNumeric], v))
+        raise ValueError('Can not parse: expect {} values, got {}'.format(numNumeric, len(tokens)))
+
+    @classmethod
+    def _dtype(cls, c):
+        return 'i8' if c in INT_COLUMNS else 'f8'
+
+    @classmethod
+    def _toStructuredArray(cls, columns, numNumeric, rows):
+        if numNumeric < len(columns):
+            # no list per row: with a large heap alive, the collector would walk it over and over;
+            # a command that contains white spaces is caught by _parseNumbers()
+            ends = [row.rfind(' ') for row in rows]
+            lines = [row[:e] for row, e in itertools.izip(rows, ends)]
+            strings = [row[e + 1:] for row, e in itertools.izip(rows, ends)]
+        else:
+            lines = rows
+            strings = list()
+        values = cls._parseNumbers('\n'.join(lines), len(rows), numNumeric)
+        if values is None:
+            # some command contains white spaces, or some value is not a number
+            tokens, strings = cls._split(columns, numNumeric, rows)
+            values = cls._parseNumbers(' '.join(tokens), len(rows), numNumeric)
+            if values is None:
+                cls._raiseInvalidToken(columns, tokens)
+        dtype = [(c, cls._dtype(c)) for c in columns[:numNumeric]]
+        if numNumeric < len(columns):
+            dtype.append((columns[-1], 'S{}'.format(max([len(v) for v in strings] or [1]))))
+        data = numpy.empty(len(rows), dtype=dtype)
+        for i, c in enumerate(columns[:numNumeric]):
+            data[c] = values[i]
+        if numNumeric < len(columns):
+            data[columns[-1]] = strings
+        return data
+
+    @classmethod
+    def _parseNumbers(cls, text, numRows, numNumeric):
+        """
+        Args:
+            text (str): numRows rows of numNumeric numbers
+
+        Returns:
+            list: one numpy array per column, or None if the text does not hold numRows * numNumeric numbers
+        """
+        # numpy.fromstring() silently stops at the first token that is not a number
+        if text.translate(None, _NUMBER_CHARS):
+            return None
+        values = cls._parseFixedPoint(text, numRows, numNumeric)
+        if values is not None:
+            return values
+        matrix = numpy.fromstring(text, sep=' ')
+        if len(matrix) != numRows * numNumeric:
+            return None
+        matrix = matrix.reshape(numRows, numNumeric)
+        return [matrix[:, i] for i in xrange(numNumeric)]
+
+    @classmethod
+    def _parseFixedPoint(cls, text, numRows, numNumeric):
+        first = text[:text.find('\n')].split() if numRows > 1 else text.split()
+        if len(first) != numNumeric:
+            return None
+        decimals = [len(v) - v.find('.') - 1 if '.' in v else 0 for v in first]
+        numDecimalColumns = numNumeric - decimals.count(0)
+        places = max(decimals)
+        if [d for d in decimals if d and d != places]:
+            return None
+        # every row has a dot in the same columns, followed by the same number of digits
+        buf = numpy.frombuffer(text + ' ' * (places + 1), dtype=numpy.uint8)
+        dots = numpy.flatnonzero(buf == ord('.'))
+        if len(dots) != numRows * numDecimalColumns:
+            return None
+        if len(dots):
+            newLines = numpy.flatnonzero(buf == ord('\n'))
+            if len(newLines) != numRows - 1:
+                return None
+            # the first and last dot of each row lie within it
+            byRow = dots.reshape(numRows, numDecimalColumns)
+            if (byRow[1:, 0] < newLines).any() or (byRow[:-1, -1] > newLines).any():
+                return None
+            for i in xrange(1, places + 1):
+                # below '0' wraps around
+                if ((buf[dots + i] - ord('0')) > 9).any():
+                    return None
+            if (buf[dots + places + 1] > ord(' ')).any():
+                return None
+        matrix = numpy.fromstring(text.replace('.', ''), dtype=numpy.int64, sep=' ')
+        if len(matrix) != numRows * numNumeric:
+            return None
+        matrix = matrix.reshape(numRows, numNumeric)
+        # the division of two exact integers rounds as float() does
+        return [matrix[:, i] / 10.0 ** d if d else matrix[:, i] for i, d in enumerate(decimals)]
+
+    @classmethod
+    def _toArrays(cls, columns, numNumeric, tokens, strings):
+        try:
+            values = array.array('d', map(float, tokens))
+        except ValueError:
+            cls._raiseInvalidToken(columns, tokens)
+        data = dict()
+        for i, c in enumerate(columns[:numNumeric]):
+            column = values[i::numNumeric]
+            data[c] = array.array('l', map(int, column)) if c in INT_COLUMNS else column
+        if numNumeric < len(columns):
+            data[columns[-1]] = strings
+        return data
+
+    @classmethod
+    def _sampleOffsets(cls, columns, data):
+        if 'TID' in columns:
+            # with -t every sample starts with the process record
+            tids = data['TID']
+            if numpy is not None:
+                return numpy.flatnonzero(tids == 0).tolist()
+            return [i for i, v in enumerate(tids) if v == 0]
+        if 'Time' in columns:
+            times = data['Time']
+            return [i for i in xrange(len(times)) if i == 0 or times[i] != times[i - 1]]
+        return list()
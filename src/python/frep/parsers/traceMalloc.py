@@ -0,0 +1,41 @@
+"""
+Turns the tracemalloc (or resident set size) measurements of a call into the dict that TraceMallocProfiler sends
+"""
+
+
+def parse(net, peak, before=None, after=None, topN=10, ed=None):
+    """
+    Args:
+        net (int): the traced memory (or RSS) at the end of the call minus the one at the beginning, in bytes
+        peak (int): the highest traced memory (or RSS) during the call minus the one at the beginning, in bytes; None
+            if it is not known
+        before (tracemalloc.Snapshot): optional; taken at the beginning of the call
+        after (tracemalloc.Snapshot): optional; taken at the end of the call
+        topN (int): optional; the number of allocation sites to report
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: net, peak, sites, error, traceback; sites is a list of dicts (size, count, traceback) in descending
+            order of the growth in size, where traceback is a list of 'file:line' strings, most recent call first; it
+            is empty if the snapshots are not given
+    """
+    result = dict()
+    result['net'] = net
+    result['peak'] = peak
+    result['sites'] = sites(before, after, topN) if before is not None and after is not None else list()
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
+
+
+def sites(before, after, topN=10):
+    """
+    Returns:
+        list: the topN allocation sites that grew the most between the two snapshots
+    """
+    keyType = 'traceback' if after.traceback_limit > 1 else 'lineno'
+    stats = [s for s in after.compare_to(before, keyType) if s.size_diff > 0]
+    stats.sort(key=lambda s: s.size_diff, reverse=True)
+    return [dict(size=s.size_diff, count=s.count_diff,
+                 traceback=['{}:{}'.format(f.filename, f.lineno) for f in reversed(s.traceback)])
+            for s in stats[:topN]]
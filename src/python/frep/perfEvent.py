@@ -0,0 +1,196 @@
+"""
+Per-thread hardware and software counters opened with the perf_event_open(2) syscall through ctypes
+
+The counters of a thread are opened as one group so that a single read() returns all of them; hardware counters
+(cycles, instructions) are only added when the PMU is accessible, which is typically not the case in containers and
+virtual machines, in that case the group falls back to the software counters.
+"""
+
+import ctypes
+import os
+import platform
+import struct
+
+
+PERF_TYPE_HARDWARE = 0
+PERF_TYPE_SOFTWARE = 1
+
+PERF_COUNT_HW_CPU_CYCLES = 0
+PERF_COUNT_HW_INSTRUCTIONS = 1
+
+PERF_COUNT_SW_TASK_CLOCK = 1
+PERF_COUNT_SW_PAGE_FAULTS = 2
+PERF_COUNT_SW_CONTEXT_SWITCHES = 3
+PERF_COUNT_SW_CPU_MIGRATIONS = 4
+
+PERF_FORMAT_TOTAL_TIME_ENABLED = 1 << 0
+PERF_FORMAT_TOTAL_TIME_RUNNING = 1 << 1
+PERF_FORMAT_GROUP = 1 << 3
+
+FLAG_EXCLUDE_KERNEL = 1 << 5
+FLAG_EXCLUDE_HV = 1 << 6
+
+SYSCALL_NUMBERS = {
+    'x86_64': 298,
+    'i386': 336,
+    'i686': 336,
+    'aarch64': 241,
+    'armv7l': 364,
+    'ppc64le': 319,
+}
+
+# (name, type, config); the names follow the output of perf stat
+HARDWARE_EVENTS = (
+    ('cycles', PERF_TYPE_HARDWARE, PERF_COUNT_HW_CPU_CYCLES),
+    ('instructions', PERF_TYPE_HARDWARE, PERF_COUNT_HW_INSTRUCTIONS),
+)
+
+SOFTWARE_EVENTS = (
+    ('task-clock (msec)', PERF_TYPE_SOFTWARE, PERF_COUNT_SW_TASK_CLOCK),
+    ('context-switches', PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CONTEXT_SWITCHES),
+    ('cpu-migrations', PERF_TYPE_SOFTWARE, PERF_COUNT_SW_CPU_MIGRATIONS),
+    ('page-faults', PERF_TYPE_SOFTWARE, PERF_COUNT_SW_PAGE_FAULTS),
+)
+
+
+class PerfEventAttr(ctypes.Structure):
+    """
+    struct perf_event_attr (PERF_ATTR_SIZE_VER5); the bit fields are collapsed into flags
+    """
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('size', ctypes.c_uint32),
+        ('config', ctypes.c_uint64),
+        ('sample_period', ctypes.c_uint64),
+        ('sample_type', ctypes.c_uint64),
+        ('read_format', ctypes.c_uint64),
+        ('flags', ctypes.c_uint64),
+        ('wakeup_events', ctypes.c_uint32),
+        ('bp_type', ctypes.c_uint32),
+        ('config1', ctypes.c_uint64),
+        ('config2', ctypes.c_uint64),
+        ('branch_sample_type', ctypes.c_uint64),
+        ('sample_regs_user', ctypes.c_uint64),
+        ('sample_stack_user', ctypes.c_uint32),
+        ('clockid', ctypes.c_int32),
+        ('sample_regs_intr', ctypes.c_uint64),
+        ('aux_watermark', ctypes.c_uint32),
+        ('sample_max_stack', ctypes.c_uint16),
+        ('reserved', ctypes.c_uint16),
+    ]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_syscallNumber = SYSCALL_NUMBERS.get(platform.machine())
+
+
+def _paranoid():
+    try:
+        with open('/proc/sys/kernel/perf_event_paranoid', 'r') as fp:
+            return int(fp.read())
+    except (IOError, OSError, ValueError):
+        return 2
+
+
+def perfEventOpen(eventType, config, groupFd=-1, excludeKernel=True):
+    """
+    Opens a counter of the calling thread on any cpu
+
+    Args:
+        eventType (int): PERF_TYPE_*
+        config (int): PERF_COUNT_*
+        groupFd (int): the fd of the group leader or -1 to create a new group
+        excludeKernel (bool): count the user space only; required if perf_event_paranoid is greater than 1
+
+    Returns:
+        int: the fd
+
+    Raises:
+        OSError: if the counter can not be opened
+    """
+    if _syscallNumber is None:
+        raise OSError('perf_event_open is not supported on {}'.format(platform.machine()))
+    attr = PerfEventAttr()
+    attr.type = eventType
+    attr.size = ctypes.sizeof(PerfEventAttr)
+    attr.config = config
+    attr.read_format = PERF_FORMAT_GROUP | PERF_FORMAT_TOTAL_TIME_ENABLED | PERF_FORMAT_TOTAL_TIME_RUNNING
+    if excludeKernel:
+        attr.flags = FLAG_EXCLUDE_KERNEL | FLAG_EXCLUDE_HV
+    fd = _libc.syscall(_syscallNumber, ctypes.byref(attr), 0, -1, groupFd, 0)
+    if fd < 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+    return fd
+
+
+class CounterGroup(object):
+    """
+    The counters of the calling thread; it must be read from the thread that opens it
+
+    Attributes:
+        names (list): the names of the opened counters, in the order of the values returned by read()
+    """
+
+    def __init__(self, hardware=True):
+        """
+
+        Args:
+            hardware (bool): whether to try the hardware counters first
+        """
+        self.names = list()
+        self.fds = list()
+        self._excludeKernel = _paranoid() > 1
+        if hardware:
+            self._openAll(HARDWARE_EVENTS)
+        self._openAll(SOFTWARE_EVENTS)
+        self._format = '{}Q'.format(3 + len(self.fds))
+        self._size = struct.calcsize(self._format)
+
+    def _openAll(self, events):
+        for name, eventType, config in events:
+            try:
+                fd = perfEventOpen(eventType, config, groupFd=self.fds[0] if self.fds else -1,
+                                   excludeKernel=self._excludeKernel)
+            except OSError:
+                # the PMU (or this software event) is not available
+                continue
+            self.names.append(name)
+            self.fds.append(fd)
+
+    def read(self):
+        """
+        Returns:
+            list: the counter values, scaled if the group has been multiplexed; empty if no counter is opened
+        """
+        if not self.fds:
+            return list()
+        values = struct.unpack(self._format, os.read(self.fds[0], self._size))
+        enabled, running = values[1], values[2]
+        if running and running < enabled:
+            return [v * enabled / running for v in values[3:]]
+        return list(values[3:])
+
+    def close(self, _close=os.close):
+        # _close is bound early since the module globals may be gone when __del__() runs at interpreter exit
+        while self.fds:
+            _close(self.fds.pop())
+
+    def __del__(self):
+        self.close()
+
+
+def toCounts(names, begin, end):
+    """
+    Args:
+        names (list): see CounterGroup.names
+        begin (list): CounterGroup.read()
+        end (list): CounterGroup.read()
+
+    Returns:
+        dict: counter name to delta, the task clock converted from nanosecond to millisecond like perf stat
+    """
+    counts = dict()
+    for name, b, e in zip(names, begin, end):
+        counts[name] = (e - b) / 1e6 if name == 'task-clock (msec)' else float(e - b)
+    return counts
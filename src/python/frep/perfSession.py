@@ -0,0 +1,272 @@
+"""
+One long-running perf stat per profiled process, driven through perf's control fifo (--control fifo:ctl,ack)
+
+perf stat starts with its counters disabled (-D -1) and prints the counter values of every interval in CSV (-x, -I);
+a call enables the counters on entry and disables them on exit. Its delta is computed after the fact, once perf has
+printed the interval that carries its tail, and handed to a callback on the thread that reads perf's output: the
+latency added to a call is that of the two fifo round trips, rather than one interval or the time it takes to spawn
+perf.
+
+Overlapping calls keep the counters enabled until the last one exits; the delta of each call includes the activity of
+the calls that overlap with it.
+
+Requires perf 5.10 or later: if perf does not start, rejects --control or exits, the session is discarded and the call
+that notices it raises RuntimeError without waiting for TIMEOUT; the next call starts a new session.
+
+The sessions are stopped at interpreter exit, see exitHooks.
+"""
+
+import os
+import select
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+
+from frep import exitHooks
+from frep.parsers import perfStat
+
+
+class PerfSession(object):
+    """
+    Attributes:
+
+        INTERVAL_MS (int):
+            perf stat -I; the minimum is 10
+
+        TIMEOUT (float):
+            how long (in seconds) to wait for perf to acknowledge a command
+
+        POLL_INTERVAL (float):
+            how often (in seconds) to check that perf is still running while waiting for an acknowledgement
+
+    """
+    INTERVAL_MS = 10
+    TIMEOUT = 5.0
+    POLL_INTERVAL = 0.05
+
+    _registry = dict()
+    _registryLock = threading.Lock()
+
+    def __init__(self, pid, intervalMs=None, events=None):
+        """
+
+        Args:
+            pid (int):
+            intervalMs (int): optional; by default it uses INTERVAL_MS
+            events (list): optional; perf stat -e; by default it uses perf's default events plus -d
+        """
+        self.pid = pid
+        self.intervalMs = intervalMs if intervalMs is not None else self.INTERVAL_MS
+        self.events = events
+        self.p = None
+        self._dirPath = None
+        self._ctl = None
+        self._ack = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._numActive = 0
+        self._stopped = False
+        # guards the state below, which the reader thread updates
+        self._stateLock = threading.Lock()
+        self._totals = dict()
+        self._ticks = 0
+        self._ts = None
+        self._numLines = 0
+        self._groupSize = None
+        self._complete = False
+        # (target tick, totals at begin(), elapsed, callback) of the calls waiting for their tail
+        self._pending = list()
+        self._reading = True
+
+    @classmethod
+    def get(cls, pid, intervalMs=None, events=None):
+        """
+        Returns the running session of the given pid, starting one if there isn't;
+        note that the first caller decides the interval and the events
+        """
+        key = (os.getpid(), pid)
+        with cls._registryLock:
+            session = cls._registry.get(key)
+            if session is None:
+                session = cls(pid, intervalMs=intervalMs, events=events)
+                session.start()
+                cls._registry[key] = session
+                # once the messengers that the calls may deliver to exist, so that it is stopped before they close
+                exitHooks.register(session, 'stop')
+        return session
+
+    @classmethod
+    def stopAll(cls):
+        with cls._registryLock:
+            sessions = cls._registry.values()
+            cls._registry.clear()
+        for session in sessions:
+            session.stop()
+
+    def start(self):
+        try:
+            self._dirPath = tempfile.mkdtemp(prefix='frep-perf-')
+            ctlPath = os.path.join(self._dirPath, 'ctl')
+            ackPath = os.path.join(self._dirPath, 'ack')
+            os.mkfifo(ctlPath)
+            os.mkfifo(ackPath)
+            # O_RDWR so that opening a fifo does not block until perf opens the other end
+            self._ctl = os.open(ctlPath, os.O_RDWR)
+            self._ack = os.open(ackPath, os.O_RDWR)
+            cmds = ['perf', 'stat', '-x,', '-I', str(self.intervalMs), '-D', '-1',
+                    '--control', 'fifo:{},{}'.format(ctlPath, ackPath)]
+            cmds.extend(['-e', ','.join(self.events)] if self.events else ['-d'])
+            cmds.extend(['-p', str(self.pid)])
+            with open(os.devnull, 'w') as devNull:
+                self.p = subprocess.Popen(cmds, env=dict(), stdout=devNull, stderr=subprocess.PIPE)
+        except Exception:
+            self._stopped = True
+            self._removeFifos()
+            raise
+        self._thread = threading.Thread(target=self._run, name='frep-perfSession-{}'.format(self.pid))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        with self._stateLock:
+            if self._stopped:
+                return
+            self._stopped = True
+        if self.p.poll() is None:
+            self.p.send_signal(signal.SIGINT)
+        self.p.wait()
+        self._thread.join()
+        self._removeFifos()
+
+    def discard(self):
+        """
+        Unregisters the session, so that the next get() starts a new one, then stops it
+        """
+        with self._registryLock:
+            key = (os.getpid(), self.pid)
+            if self._registry.get(key) is self:
+                del self._registry[key]
+        self.stop()
+
+    def begin(self):
+        """
+        Enables the counters if no other call is active
+
+        Returns:
+            tuple: a token that must be passed to end()
+        """
+        with self._lock:
+            if not self._numActive:
+                self._command('enable')
+            self._numActive += 1
+        with self._stateLock:
+            return time.time(), dict(self._totals)
+
+    def end(self, token, callback):
+        """
+        Disables the counters if no other call is active; it does not wait for the interval that carries the tail of
+        the call, the counter values are passed to the callback once perf has printed it (or has exited)
+
+        Args:
+            token (tuple): returned by begin()
+            callback (callable): takes (counts, elapsed) where counts is a dict of the counter values accumulated
+                since begin(); it is called on the thread that reads perf's output, or on this thread if perf is gone
+        """
+        t, before = token
+        elapsed = time.time() - t
+        with self._lock:
+            self._numActive -= 1
+            if not self._numActive:
+                self._command('disable')
+        with self._stateLock:
+            # if an interval is being printed, its counters were read before the call exits
+            target = self._ticks + (2 if self._numLines and not self._complete else 1)
+            entry = (target, before, elapsed, callback)
+            if self._reading:
+                self._pending.append(entry)
+                return
+            ready = [self._attribute(entry)]
+        self._deliver(ready)
+
+    def _command(self, cmd):
+        if self._stopped:
+            raise RuntimeError('perf is not running')
+        try:
+            os.write(self._ctl, '{}\n'.format(cmd))
+            deadline = time.time() + self.TIMEOUT
+            while True:
+                if self.p.poll() is not None:
+                    raise RuntimeError('perf exited with {}: {}'.format(self.p.returncode, cmd))
+                r, _, _ = select.select([self._ack], [], [], self.POLL_INTERVAL)
+                if r:
+                    break
+                if time.time() >= deadline:
+                    raise RuntimeError('perf did not acknowledge the command: {}'.format(cmd))
+        except Exception:
+            self.discard()
+            raise
+        os.read(self._ack, 16)
+
+    def _run(self):
+        for line in iter(self.p.stderr.readline, ''):
+            r = perfStat.parseIntervalLine(line)
+            if r is None:
+                continue
+            ts, k, value = r
+            with self._stateLock:
+                if ts != self._ts:
+                    if self._ts is not None and not self._complete:
+                        self._finishGroup()
+                    self._ts = ts
+                    self._numLines = 0
+                    self._complete = False
+                if value is not None:
+                    self._totals[k] = self._totals.get(k, 0.0) + value
+                self._numLines += 1
+                if self._numLines == self._groupSize:
+                    self._finishGroup()
+                ready = self._popReady()
+            self._deliver(ready)
+        with self._stateLock:
+            # perf is gone, the pending calls get what has been printed
+            self._reading = False
+            ready = self._popReady(flush=True)
+        self._deliver(ready)
+
+    def _finishGroup(self):
+        if self._groupSize is None:
+            self._groupSize = self._numLines
+        self._complete = True
+        self._ticks += 1
+
+    def _popReady(self, flush=False):
+        ready = [self._attribute(e) for e in self._pending if flush or e[0] <= self._ticks]
+        self._pending = [e for e in self._pending if not (flush or e[0] <= self._ticks)]
+        return ready
+
+    def _attribute(self, entry):
+        target, before, elapsed, callback = entry
+        counts = dict((k, v - before.get(k, 0.0)) for k, v in self._totals.iteritems())
+        return callback, counts, elapsed
+
+    @classmethod
+    def _deliver(cls, ready):
+        for callback, counts, elapsed in ready:
+            try:
+                callback(counts, elapsed)
+            except Exception:
+                # the reader thread must keep going
+                traceback.print_exc()
+
+    def _removeFifos(self):
+        for fd in (self._ctl, self._ack):
+            if fd is not None:
+                os.close(fd)
+        self._ctl = self._ack = None
+        if self._dirPath is not None:
+            shutil.rmtree(self._dirPath, ignore_errors=True)
+            self._dirPath = None
@@ -0,0 +1,209 @@
+"""
+Reads the per-process and per-thread counters straight from /proc, producing the same sample layout as pidstat -dtrsh
+
+Each sample is a list whose first element is the list of column names, followed by the process record and then the
+thread record(s); see PidStatParser.parse()
+
+Rates (minflt/s, majflt/s, kB_rd/s, kB_wr/s, kB_ccwr/s) and iodelay are computed against the previous reading of
+the same task, therefore a task that shows up for the first time reports zero.
+
+Note that unlike pidstat, Time is a float (seconds since epoch) since the sampler can run at sub-second intervals;
+StkSize and StkRef require walking /proc/<pid>/smaps and are always reported as 0.
+"""
+
+import os
+import threading
+import time
+
+
+COLUMNS = ('Time', 'UID', 'TGID', 'TID', 'minflt/s', 'majflt/s', 'VSZ', 'RSS', '%MEM', 'StkSize', 'StkRef',
+           'kB_rd/s', 'kB_wr/s', 'kB_ccwr/s', 'iodelay', 'Command')
+
+MIN_INTERVAL = 0.01
+
+PAGE_KB = os.sysconf('SC_PAGE_SIZE') / 1024
+
+
+def _read(filePath):
+    with open(filePath, 'r') as fp:
+        return fp.read()
+
+
+def _memTotal():
+    for line in _read('/proc/meminfo').splitlines():
+        if line.startswith('MemTotal:'):
+            return int(line.split()[1])
+    return 0
+
+
+def readStat(filePath):
+    """
+    Args:
+        filePath (str): /proc/<pid>/stat or /proc/<pid>/task/<tid>/stat
+
+    Returns:
+        tuple: (comm, minflt, majflt, delayacct_blkio_ticks)
+    """
+    text = _read(filePath)
+    lParen = text.find('(')
+    rParen = text.rfind(')')
+    fields = text[rParen + 2:].split()
+    # fields[0] is the 3rd field (state) documented in proc(5)
+    return text[lParen + 1:rParen], int(fields[7]), int(fields[9]), int(fields[39])
+
+
+def readStatm(filePath):
+    """
+    Returns:
+        tuple: (VSZ, RSS) in kB
+    """
+    fields = _read(filePath).split()
+    return int(fields[0]) * PAGE_KB, int(fields[1]) * PAGE_KB
+
+
+def readIO(filePath):
+    """
+    Returns:
+        tuple: (read_bytes, write_bytes, cancelled_write_bytes); zeros if the file is not readable
+    """
+    try:
+        text = _read(filePath)
+    except (IOError, OSError):
+        return 0, 0, 0
+    d = dict()
+    for line in text.splitlines():
+        k, _, v = line.partition(':')
+        d[k] = v
+    return int(d.get('read_bytes', 0)), int(d.get('write_bytes', 0)), int(d.get('cancelled_write_bytes', 0))
+
+
+class ProcSampler(object):
+    """
+    A background thread that samples a process at a fixed interval
+
+    Usage:
+        s = ProcSampler(pid, interval=0.01)
+        s.start()
+        ...
+        s.stop()
+        s.samples
+
+    A final sample is always taken upon stop(), so that a SUP shorter than the interval still gets one sample.
+
+    Attributes:
+        samples (list): the collected samples, see the module doc
+        onSample (callable): optional; if given it is called with each new sample (from the sampler thread)
+        keep (bool): whether to keep the samples in the samples list; a long-lived sampler that hands every sample
+            to onSample should set it to False
+    """
+
+    def __init__(self, pid=None, interval=0.1, recordType=dict, onSample=None, keep=True):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            interval (float): seconds between two samples; the minimum is MIN_INTERVAL
+            recordType (type): the dict type used for the per-task records
+            onSample (callable): optional
+            keep (bool): optional
+        """
+        if interval < MIN_INTERVAL:
+            raise ValueError('Interval must be at least {} second(s), got {}'.format(MIN_INTERVAL, interval))
+        self.pid = pid if pid is not None else os.getpid()
+        self.interval = interval
+        self.recordType = recordType
+        self.onSample = onSample
+        self.keep = keep
+        self.samples = list()
+        self._procDir = '/proc/{}'.format(self.pid)
+        self._uid = os.stat(self._procDir).st_uid
+        self._memTotal = _memTotal()
+        self._previous = dict()
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stopEvent.clear()
+        self._read()
+        self._thread = threading.Thread(target=self._run, name='frep-procSampler-{}'.format(self.pid))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopEvent.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopEvent.wait(self.interval):
+            self.sample()
+        self.sample()
+
+    def sample(self):
+        """
+        Takes one sample immediately; it is safe to call this from any thread while the sampler is running
+
+        Returns:
+            list: the new sample or None if the process is gone
+        """
+        with self._lock:
+            try:
+                sample = self._read()
+            except (IOError, OSError):
+                return None
+            if self.keep:
+                self.samples.append(sample)
+        if self.onSample is not None:
+            self.onSample(sample)
+        return sample
+
+    def _read(self):
+        now = time.time()
+        vsz, rss = readStatm(self._procDir + '/statm')
+        mem = round(100.0 * rss / self._memTotal, 2) if self._memTotal else 0.0
+        comm, minflt, majflt, blkio = readStat(self._procDir + '/stat')
+        counters = (minflt, majflt) + readIO(self._procDir + '/io') + (blkio, )
+        sample = [list(COLUMNS), self._record(now, self.pid, 0, counters, vsz, rss, mem, comm)]
+        taskDir = self._procDir + '/task'
+        for tid in sorted(int(_) for _ in os.listdir(taskDir)):
+            try:
+                comm, minflt, majflt, blkio = readStat('{}/{}/stat'.format(taskDir, tid))
+            except (IOError, OSError):
+                # the thread exits between listdir() and open()
+                continue
+            counters = (minflt, majflt) + readIO('{}/{}/io'.format(taskDir, tid)) + (blkio, )
+            sample.append(self._record(now, 0, tid, counters, vsz, rss, mem, '|__' + comm))
+        return sample
+
+    def _record(self, now, tgid, tid, counters, vsz, rss, mem, comm):
+        key = tgid or -tid
+        previous = self._previous.get(key)
+        self._previous[key] = (now, counters)
+        if previous is None or now <= previous[0]:
+            rates = (0.0, 0.0, 0.0, 0.0, 0.0)
+            iodelay = 0
+        else:
+            dt = now - previous[0]
+            d = [c - p for c, p in zip(counters, previous[1])]
+            rates = (d[0] / dt, d[1] / dt, d[2] / 1024.0 / dt, d[3] / 1024.0 / dt, d[4] / 1024.0 / dt)
+            iodelay = d[5]
+        values = (now, self._uid, tgid, tid) + rates[:2] + (vsz, rss, mem, 0, 0) + rates[2:] + (iodelay, comm)
+        return self.recordType(zip(COLUMNS, values))
+
+
+def parse(samples, ed=None):
+    """
+    Wraps a list of samples in the same dict that PidStatParser.parse() returns
+
+    Args:
+        samples (list):
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict:
+    """
+    result = dict()
+    result['samples'] = samples
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
@@ -0,0 +1,286 @@
+"""
+Follows the descendant processes of a process through /proc
+
+ProcessTreeSampler samples, at a fixed interval, every descendant that appears after it starts (the ones that already
+exist are ignored) and keeps, per child, the latest CPU time, RSS and I/O bytes plus the peak RSS. The descendants are
+found with /proc/<pid>/task/<tid>/children when the kernel provides it, otherwise by scanning the parent pid of every
+process in /proc.
+
+A child that starts and exits between two samples is not seen; its CPU time is still counted by the reaped CPU time
+(getrusage(RUSAGE_CHILDREN)) if it is waited for by the profiled process.
+
+tagPopen() patches subprocess.Popen so that each child it starts is tagged with the innermost span of the calling
+thread (see frep.spans), or with the calling function if no span is open; the descendants of a tagged child inherit
+its tag.
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+from frep import procSampler
+from frep import spans
+
+
+CLK_TCK = os.sysconf('SC_CLK_TCK')
+
+_tags = dict()
+_tagLock = threading.Lock()
+_originalInit = [None]
+# the number of tagPopen() calls not yet reverted by untagPopen()
+_numTagging = [0]
+_SKIPPED = ('subprocess', 'frep')
+
+
+def readProcess(pid):
+    """
+    Returns:
+        dict: key: pid, ppid, command, startTime (clock ticks since boot, it tells a reused pid apart), cpu (user +
+            system time, in seconds), rss (kB), readBytes, writeBytes; None if the process is gone
+    """
+    procDir = '/proc/{}'.format(pid)
+    try:
+        with open(procDir + '/stat', 'r') as fp:
+            text = fp.read()
+        rss = procSampler.readStatm(procDir + '/statm')[1]
+    except (IOError, OSError):
+        return None
+    readBytes, writeBytes, cancelled = procSampler.readIO(procDir + '/io')
+    lParen = text.find('(')
+    rParen = text.rfind(')')
+    fields = text[rParen + 2:].split()
+    # fields[0] is the 3rd field (state) documented in proc(5)
+    return dict(pid=pid, ppid=int(fields[1]), command=text[lParen + 1:rParen], startTime=int(fields[19]),
+                cpu=(int(fields[11]) + int(fields[12])) / float(CLK_TCK), rss=rss, readBytes=readBytes,
+                writeBytes=writeBytes - cancelled)
+
+
+def _childrenOf(pid):
+    """
+    Returns:
+        list: the child pids; None if the kernel does not provide /proc/<pid>/task/<tid>/children
+    """
+    taskDir = '/proc/{}/task'.format(pid)
+    pids = list()
+    try:
+        tids = os.listdir(taskDir)
+    except OSError:
+        return list()
+    for tid in tids:
+        try:
+            with open('{}/{}/children'.format(taskDir, tid), 'r') as fp:
+                pids.extend(int(_) for _ in fp.read().split())
+        except IOError, e:
+            if not os.path.exists('{}/{}'.format(taskDir, tid)):
+                continue
+            return None
+    return pids
+
+
+def _parents():
+    """
+    Returns:
+        dict: key: pid, value: parent pid, of every process in /proc
+    """
+    parents = dict()
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open('/proc/{}/stat'.format(name), 'r') as fp:
+                text = fp.read()
+        except IOError, e:
+            continue
+        parents[int(name)] = int(text[text.rfind(')') + 2:].split()[1])
+    return parents
+
+
+def descendants(pid):
+    """
+    Returns:
+        list: the pids of the descendants of the process, parents before children
+    """
+    pids = list()
+    children = _childrenOf(pid)
+    if children is not None:
+        queue = children
+        while queue:
+            child = queue.pop(0)
+            pids.append(child)
+            queue.extend(_childrenOf(child) or list())
+        return pids
+    childrenOf = dict()
+    for child, parent in _parents().iteritems():
+        childrenOf.setdefault(parent, list()).append(child)
+    queue = list(childrenOf.get(pid, list()))
+    while queue:
+        child = queue.pop(0)
+        pids.append(child)
+        queue.extend(childrenOf.get(child, list()))
+    return pids
+
+
+def _tagOf(pid, ppids):
+    while pid is not None:
+        tag = _tags.get(pid)
+        if tag is not None:
+            return tag
+        pid = ppids.get(pid)
+    return None
+
+
+class ProcessTreeSampler(object):
+    """
+    Attributes:
+        children (dict): key: (pid, startTime), value: the latest readProcess() of the child plus begin (the time it
+            is first seen), maxRss, tag and exited
+        peakRss (int): the highest sum of the RSS of the descendants seen in one sample, in kB
+    """
+
+    def __init__(self, pid=None, interval=0.05):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            interval (float): seconds between two samples; the minimum is procSampler.MIN_INTERVAL
+        """
+        if interval < procSampler.MIN_INTERVAL:
+            raise ValueError('Interval must be at least {} second(s), got {}'.format(procSampler.MIN_INTERVAL,
+                                                                                      interval))
+        self.pid = pid if pid is not None else os.getpid()
+        self.interval = interval
+        self.children = dict()
+        self.peakRss = 0
+        self._existing = set()
+        self._lock = threading.Lock()
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    def start(self):
+        for pid in descendants(self.pid):
+            r = readProcess(pid)
+            if r is not None:
+                self._existing.add((pid, r['startTime']))
+        self._thread = threading.Thread(target=self._run, name='frep-processTree-{}'.format(self.pid))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopEvent.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopEvent.wait(self.interval):
+            self.sample()
+        self.sample()
+
+    def sample(self):
+        """
+        Reads every descendant once; it is safe to call this from any thread while the sampler is running
+        """
+        now = time.time()
+        readings = [r for r in (readProcess(pid) for pid in descendants(self.pid)) if r is not None]
+        ppids = dict((r['pid'], r['ppid']) for r in readings)
+        with self._lock:
+            seen = set()
+            totalRss = 0
+            for r in readings:
+                key = (r['pid'], r['startTime'])
+                if key in self._existing:
+                    continue
+                seen.add(key)
+                totalRss += r['rss']
+                previous = self.children.get(key)
+                r['begin'] = previous['begin'] if previous is not None else now
+                r['maxRss'] = max(r['rss'], previous['maxRss'] if previous is not None else 0)
+                r['tag'] = _tagOf(r['pid'], ppids) or (previous['tag'] if previous is not None else None)
+                r['exited'] = False
+                self.children[key] = r
+            for key, r in self.children.iteritems():
+                if key not in seen:
+                    r['exited'] = True
+            self.peakRss = max(self.peakRss, totalRss)
+
+
+def childrenUsage():
+    """
+    Returns:
+        tuple: (user + system time in seconds, maxrss in kB) of the waited-for descendants, see getrusage(2)
+    """
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime, ru.ru_maxrss
+
+
+def parse(children, peakRss, reapedCpu, elapsed, ed=None):
+    """
+    Args:
+        children (list): see ProcessTreeSampler.children
+        peakRss (int): see ProcessTreeSampler.peakRss
+        reapedCpu (float): the CPU time of the descendants waited for during the call, in seconds
+        elapsed (float): the wall time of the call, in seconds
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: children (one dict per child, in the order they are seen), total, time, error, traceback; total
+            has cpu (the sampled CPU time of the children), reapedCpu, rss (the RSS of the children still alive at the
+            end), peakRss, readBytes, writeBytes and numChildren
+    """
+    children = sorted(children, key=lambda r: (r['begin'], r['pid']))
+    total = dict()
+    total['cpu'] = sum(r['cpu'] for r in children)
+    total['reapedCpu'] = reapedCpu
+    total['rss'] = sum(r['rss'] for r in children if not r['exited'])
+    total['peakRss'] = peakRss
+    total['readBytes'] = sum(r['readBytes'] for r in children)
+    total['writeBytes'] = sum(r['writeBytes'] for r in children)
+    total['numChildren'] = len(children)
+    result = dict()
+    result['children'] = children
+    result['total'] = total
+    result['time'] = elapsed
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
+
+
+def tagPopen():
+    """
+    Patches subprocess.Popen.__init__ to tag each child, see the module docstring; the calls are counted, the patch is
+    reverted (and the tags forgotten) by the untagPopen() that matches the first call
+    """
+    with _tagLock:
+        _numTagging[0] += 1
+        if _originalInit[0] is not None:
+            return
+        _originalInit[0] = vars(subprocess.Popen)['__init__']
+        init = subprocess.Popen.__init__
+
+        def _init(self, *args, **kwargs):
+            span = spans.current()
+            if span is not None:
+                tag = span.name
+            else:
+                # the first caller outside subprocess (check_call() etc.) and frep
+                frame = sys._getframe(1)
+                while frame.f_back is not None and frame.f_globals.get('__name__', '').split('.')[0] in _SKIPPED:
+                    frame = frame.f_back
+                code = frame.f_code
+                tag = '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            init(self, *args, **kwargs)
+            _tags[self.pid] = tag
+
+        subprocess.Popen.__init__ = _init
+
+
+def untagPopen():
+    with _tagLock:
+        if _numTagging[0] > 0:
+            _numTagging[0] -= 1
+        if _numTagging[0] or _originalInit[0] is None:
+            return
+        subprocess.Popen.__init__ = _originalInit[0]
+        _originalInit[0] = None
+        _tags.clear()
@@ -20,16 +20,40 @@ dump:
 
 """
 
+import itertools
 import os
 import re
 import shlex
 import signal
 import subprocess
+import sys
 import tempfile
+import threading
 import time
 import traceback
-
+from distutils.spawn import find_executable
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from frep import clocks
+from frep import exitHooks
+from frep import gcMonitor
+from frep import histogram
+from frep import importTracker
+from frep import perfEvent
+from frep import perfSession
+from frep import procSampler
+from frep import processTree
+from frep import residentMemory
+from frep import resourceUsage
+from frep import sharedSampler
+from frep import sharedStats
+from frep import stackSampler
 from frep.parsers import perfStat
+from frep.parsers import traceMalloc
 
 
 class DefaultProfiler(object):
@@ -77,6 +101,40 @@ def _noExc(*args, **kwargs):
     return None
 
 
+class CallStack(threading.local):
+    """
+    A per-thread stack of per-call states
+
+    A profiler instance is shared by every caller of the decorated or patched function, including concurrent callers
+    (e.g. a thread pool) and recursive ones, therefore it keeps the state of each call here rather than on self:
+    push() in __enter__() and pop() in __exit__()
+    """
+
+    def __init__(self):
+        self.frames = list()
+
+    def push(self, state):
+        self.frames.append(state)
+
+    def pop(self):
+        return self.frames.pop()
+
+    def __len__(self):
+        return len(self.frames)
+
+
+def _send(messenger, parser, *args, **kwargs):
+    """
+    Sends parser(*args, **kwargs) to the messenger; if the messenger supports deferred delivery (see
+    messengers.AsyncMessenger) the parsing is handed over to it as well, off the SUP's thread
+    """
+    defer = getattr(messenger, 'defer', None)
+    if defer is not None:
+        defer(parser, *args, **kwargs)
+    else:
+        messenger(parser(*args, **kwargs))
+
+
 class ProcessRecord(dict):
 
     @classmethod
@@ -219,6 +277,90 @@ class PidStatParser(object):
         result['traceback'] = self.ed.tbStrings if self.ed is not None else list()
         return result
 
+    @classmethod
+    def createReduced(cls, filePath, ed=None):
+        return cls(filePath, ed=ed).reduce()
+
+    def iterSamples(self, follow=None, pollInterval=0.1):
+        """
+        Yields the samples one by one (in the same layout as parse()) while the dump is being written, each sample as
+        soon as its block is complete.
+
+        The attribute complete is set to True once the end marker is found.
+
+        Args:
+            follow (callable): optional; returns True while the writer is alive, e.g.
+                lambda: pidstat.poll() is None; if not given it stops at the end of the file
+            pollInterval (float): optional; how long to wait for the writer at the end of the file, in seconds
+
+        Returns:
+            generator:
+        """
+        self.complete = False
+        with open(self.filePath, 'r') as fp:
+            it = self._tail(fp, follow, pollInterval)
+            if not PidStatBegin.find(it):
+                return
+            while True:
+                s = self.createSample(it)
+                if s is self.POISON_PILL:
+                    return
+                if s is self.CANDY:
+                    self.complete = True
+                    return
+                if s is None:
+                    continue
+                yield s
+
+    def reduce(self, follow=None, pollInterval=0.1):
+        """
+        A constant-memory alternative to parse(): instead of keeping the samples it keeps the running statistics of
+        each column, see PidStatReducer
+
+        Args:
+            follow (callable): optional; see iterSamples()
+            pollInterval (float): optional; see iterSamples()
+
+        Returns:
+            dict:
+        """
+        FAILED = None
+        reducer = PidStatReducer()
+        for s in self.iterSamples(follow=follow, pollInterval=pollInterval):
+            reducer.add(s)
+        if not self.complete:
+            return FAILED
+        result = dict()
+        result['reduced'] = reducer.result()
+        result['numSamples'] = reducer.numSamples
+        result['error'] = self.ed.errorText if self.ed is not None else ''
+        result['traceback'] = self.ed.tbStrings if self.ed is not None else list()
+        return result
+
+    @classmethod
+    def _tail(cls, fp, follow, pollInterval):
+        partial = ''
+        while True:
+            line = fp.readline()
+            if line:
+                partial += line
+                if partial.endswith('\n'):
+                    yield partial
+                    partial = ''
+                continue
+            if follow is not None and follow():
+                time.sleep(pollInterval)
+                continue
+            # the writer is gone, drain what it has written since the last read
+            for line in fp.readlines():
+                partial += line
+                if partial.endswith('\n'):
+                    yield partial
+                    partial = ''
+            if partial:
+                yield partial
+            return
+
     def createSample(self, it):
         try:
             line = it.next()
@@ -236,29 +378,183 @@ class PidStatParser(object):
         return None
 
 
+class PidStatReducer(object):
+    """
+    Keeps the running min, max and mean of each numeric column, per TID (0 is the process), instead of the samples
+
+    Attributes:
+        numSamples (int): the number of samples added so far
+    """
+
+    KEYS = ('Time', 'UID', 'TGID', 'TID', 'Command')
+
+    def __init__(self):
+        self.numSamples = 0
+        self._stats = dict()
+
+    def add(self, sample):
+        """
+        Args:
+            sample (list): a sample in the layout of PidStatParser.parse()
+        """
+        self.numSamples += 1
+        columns = [c for c in sample[0] if c not in self.KEYS]
+        for r in sample[1:]:
+            stats = self._stats.setdefault(r.get('TID', 0), dict())
+            for c in columns:
+                v = r[c]
+                s = stats.get(c)
+                if s is None:
+                    stats[c] = [v, v, float(v), 1]
+                    continue
+                if v < s[0]:
+                    s[0] = v
+                if v > s[1]:
+                    s[1] = v
+                s[2] += v
+                s[3] += 1
+
+    def result(self):
+        """
+        Returns:
+            dict: TID to {column: {'min': , 'max': , 'mean': , 'count': }}
+        """
+        result = dict()
+        for tid, stats in self._stats.iteritems():
+            result[tid] = dict(
+                (c, dict(min=s[0], max=s[1], mean=s[2] / s[3], count=s[3]))
+                for c, s in stats.iteritems()
+            )
+        return result
+
+
 class SimpleTimerProfiler(object):
 
     def __init__(self, excGenerator=None, parser=None, messenger=None):
-        self.t = None
         self.excGenerator = excGenerator if excGenerator is not None else _noExc
         self.parser = parser if parser is not None else _doNothing
         self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
 
     @classmethod
     def create(cls, messenger=None):
         return cls(excGenerator=ExceptionDescriptor.create, parser=None, messenger=messenger)
 
     def __enter__(self):
-        self.t = time.time()
+        self.calls.push(time.time())
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        t = self.calls.pop()
         ed = self.excGenerator(exc_type, exc_val, exc_tb)
-        d = dict(time=time.time() - self.t)
+        d = dict(time=time.time() - t)
         d['error'] = ed.errorText if ed is not None else ''
         d['traceback'] = ed.tbStrings if ed is not None else list()
         self.messenger(d)
 
 
+class HistogramTimerProfiler(object):
+    """
+    An aggregating counterpart of SimpleTimerProfiler
+
+    Instead of one message per call, the latencies (measured with a monotonic clock) are recorded in a log-linear
+    histogram, see histogram.Histogram; a summary is sent to the messenger once per INTERVAL (checked when a call
+    exits) and at interpreter exit (see exitHooks), after which the histogram starts over.
+
+    The summary dict:
+        name, begin, end (the wall time of the window), count, numErrors, and mean, min, max, p50, p90, p99, p999 in
+        seconds
+
+    Attributes:
+
+        INTERVAL (float):
+            how frequently, in seconds, is the summary sent
+
+    """
+    INTERVAL = 60.0
+
+    PERCENTILES = (('p50', 50), ('p90', 90), ('p99', 99), ('p999', 99.9))
+
+    def __init__(self, name=None, interval=None, messenger=None):
+        """
+
+        Args:
+            name (str): optional; identifies the SUP in the summaries
+            interval (float): optional; by default it uses INTERVAL
+            messenger (callable): optional; a function object that takes the summary dict then sends it to somewhere
+        """
+        self.name = name
+        self.interval = interval if interval is not None else self.INTERVAL
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.histogram = histogram.Histogram()
+        self.numErrors = 0
+        self._lock = threading.Lock()
+        self.calls = CallStack()
+        self._begin = time.time()
+        self._lastSent = clocks.monotonic()
+        exitHooks.register(self, 'flush')
+
+    @classmethod
+    def create(cls, messenger=None, name=None):
+        return cls(name=name, messenger=messenger)
+
+    def __enter__(self):
+        self.calls.push(clocks.monotonic())
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        t = clocks.monotonic()
+        ns = int((t - self.calls.pop()) * 1e9)
+        summary = None
+        with self._lock:
+            self.histogram.record(ns)
+            if exc_type is not None:
+                self.numErrors += 1
+            if t - self._lastSent >= self.interval:
+                self._lastSent = t
+                summary = self._summarize()
+                self._reset()
+        if summary is not None:
+            self.messenger(summary)
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: the summary of the current window
+        """
+        with self._lock:
+            return self._summarize()
+
+    def reset(self):
+        with self._lock:
+            self._reset()
+
+    def flush(self):
+        """
+        Sends the summary of the current window, if it is not empty, and starts a new one
+        """
+        with self._lock:
+            if not self.histogram.count:
+                return
+            self._lastSent = clocks.monotonic()
+            summary = self._summarize()
+            self._reset()
+        self.messenger(summary)
+
+    def _reset(self):
+        self.histogram.reset()
+        self.numErrors = 0
+        self._begin = time.time()
+
+    def _summarize(self):
+        h = self.histogram
+        d = dict(name=self.name, begin=self._begin, end=time.time(), count=h.count, numErrors=self.numErrors)
+        d['mean'] = h.mean() / 1e9
+        d['min'] = (h.min or 0) / 1e9
+        d['max'] = (h.max or 0) / 1e9
+        for k, q in self.PERCENTILES:
+            d[k] = h.percentile(q) / 1e9
+        return d
+
+
 class PerfStatProfiler(object):
     code = \
 """#!/usr/bin/env python
@@ -273,17 +569,19 @@ for i in xrange({}):
     timeout = 3600  # 3600 seconds
     interval = 0.1  # sleep(0.1)
     numIterations = int(timeout / interval)  # 36000
-    filePath = '/tmp/wait_for_exec_{}.py'
+    filePath = '/tmp/wait_for_exec_{}_{}.py'
 
     def __init__(self, pid=None, excGenerator=None, parser=None, messenger=None):
         self.pid = pid if pid is not None else os.getpid()
         self.excGenerator = excGenerator if excGenerator is not None else ExceptionDescriptor.create
         self.parser = parser if parser is not None else perfStat.parse
         self.messenger = messenger if messenger is not None else _doNothing
-        self.p = None
+        self.calls = CallStack()
+        self._callIds = itertools.count()
 
     def _writeFile(self):
-        filePath = self.filePath.format(self.pid)
+        # each call has its own pill so that overlapping calls do not stop each other's perf
+        filePath = self.filePath.format(self.pid, next(self._callIds))
         code = self.code.format(self.numIterations, filePath, self.interval)
         with open(filePath, 'w') as fp:
             fp.write(code)
@@ -293,18 +591,18 @@ for i in xrange({}):
     def __enter__(self):
         filePath = self._writeFile()
         cmds = shlex.split('perf stat -a -d -t {} {}'.format(self.pid, filePath))
-        self.p = subprocess.Popen(cmds, env=dict(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        p = subprocess.Popen(cmds, env=dict(), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.calls.push((p, filePath))
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        filePath = self.filePath.format(self.pid)
+        p, filePath = self.calls.pop()
         os.remove(filePath)
-        while self.p.poll() is None:
+        while p.poll() is None:
             time.sleep(0.05)
         # If SUP completes before the process spins up - Popen - it will throw an error complaining that the Pill
         # is not found. This typically happens with fast SUP.
-        if self.p.poll() == 0:
-            d = self.parser(self.p.stdout.read() + self.p.stderr.read())
-            self.messenger(d)
+        if p.poll() == 0:
+            _send(self.messenger, self.parser, p.stdout.read() + p.stderr.read())
 
 
 class PidStatProfiler(object):
@@ -336,6 +634,9 @@ class PidStatProfiler(object):
             this provides a simple integrity checkpoint so that the parser can tell whether the subject-under-profiling,
             SUP, exits unexpectedly (i.e. encounters sig-11)
 
+    In the reduced mode (see createReduced()) the dump is reduced by a thread while pidstat is writing it, see
+    PidStatParser.reduce(): the messenger receives the running statistics instead of the samples, in constant memory.
+
     """
     DELETE_UPON_COMPLETION = True
 
@@ -345,7 +646,7 @@ class PidStatProfiler(object):
     BEGIN = '<pidstat>'
     END = '</pidstat>'
 
-    def __init__(self, pid=None, filePath=None, excGenerator=None, parser=None, messenger=None):
+    def __init__(self, pid=None, filePath=None, excGenerator=None, parser=None, messenger=None, reduced=False):
         """
 
         Args:
@@ -354,40 +655,796 @@ class PidStatProfiler(object):
             excGenerator (callable): optional; a function that takes (exc_type, exc_val, exc_tb) then produces an
                 ExceptionDescriptor object or None
             parser (callable): optional; a function object that takes (a file path, an ExceptionDescriptor) then
-                generates a dict
+                generates a dict; it is not used in the reduced mode
             messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+            reduced (bool): optional; whether to reduce the dump while it is being written
         """
         self.pid = pid if pid is not None else os.getpid()
-        self.filePath = filePath if filePath is not None else tempfile.mkstemp()[-1]
+        if filePath is None:
+            fd, filePath = tempfile.mkstemp()
+            os.close(fd)
+        self.filePath = filePath
         self.excGenerator = excGenerator if excGenerator is not None else _noExc
         self.parser = parser if parser is not None else _doNothing
         self.messenger = messenger if messenger is not None else _doNothing
-        self.p = None
-        self.fd = None
+        self.reduced = reduced
+        self.calls = CallStack()
+        self._dumpIds = itertools.count()
+        self._lock = threading.Lock()
+        # whether a call owns self.filePath, from __enter__() until its dump is parsed or moved aside
+        self._filePathOwned = False
 
     @classmethod
     def create(cls, messenger=None):
         return cls(excGenerator=ExceptionDescriptor.create, parser=PidStatParser.create, messenger=messenger)
 
+    @classmethod
+    def createReduced(cls, messenger=None):
+        return cls(excGenerator=ExceptionDescriptor.create, messenger=messenger, reduced=True)
+
     def __enter__(self):
-        self.fd = open(self.filePath, 'w')
-        self.fd.write('{}\n'.format(self.BEGIN))
-        self.fd.flush()
-        self.p = subprocess.Popen(['pidstat', '-dtrsh', '-p', str(self.pid), self.INTERVAL, self.MAX_DURATION],
-                                  stdout=self.fd,
-                                  stderr=subprocess.PIPE)
+        with self._lock:
+            # filePath belongs to one call at a time; the overlapping calls write to their own temp files
+            owned = self._filePathOwned
+            self._filePathOwned = True
+        if not owned:
+            filePath = self.filePath
+            fd = open(filePath, 'w')
+        else:
+            tmpFd, filePath = tempfile.mkstemp()
+            fd = os.fdopen(tmpFd, 'w')
+        fd.write('{}\n'.format(self.BEGIN))
+        fd.flush()
+        p = subprocess.Popen(['pidstat', '-dtrsh', '-p', str(self.pid), self.INTERVAL, self.MAX_DURATION],
+                             stdout=fd,
+                             stderr=subprocess.PIPE)
+        tail = _PidStatTail(filePath) if self.reduced else None
+        self.calls.push((p, fd, filePath, tail))
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.p.poll() is not None:
+        p, fd, filePath, tail = self.calls.pop()
+        if p.poll() is not None:
             # one hour of waiting
             pass
         else:
+            p.send_signal(signal.SIGINT)
+        # reap pidstat (its last lines precede the end marker) and close its pipe, or both leak
+        p.wait()
+        p.stderr.close()
+        fd.flush()
+        fd.write('\n{}\n'.format(self.END))
+        fd.close()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        if hasattr(self.messenger, 'defer') and filePath == self.filePath:
+            # the next call reuses self.filePath while the dump is waiting to be parsed
+            dumpPath = '{}.{}'.format(self.filePath, next(self._dumpIds))
+            os.rename(filePath, dumpPath)
+            filePath = dumpPath
+            self._releaseFilePath()
+        _send(self.messenger, self._parse, filePath, ed, tail)
+
+    def _releaseFilePath(self):
+        with self._lock:
+            self._filePathOwned = False
+
+    def _parse(self, filePath, ed, tail):
+        try:
+            if tail is not None:
+                return tail.finish(ed)
+            return self.parser(filePath, ed=ed)
+        finally:
+            if type(self).DELETE_UPON_COMPLETION:
+                os.remove(filePath)
+            if filePath == self.filePath:
+                # only now can the next call truncate it
+                self._releaseFilePath()
+
+
+class _PidStatTail(object):
+    """
+    Reduces a dump in a thread from the moment pidstat starts writing it, see PidStatParser.reduce()
+    """
+
+    def __init__(self, filePath):
+        self.parser = PidStatParser(filePath)
+        self.result = None
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='frep-pidStatTail')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        # waits on the event instead of sleeping between the polls, so that finish() returns as soon as the rest of
+        # the dump is reduced
+        self.result = self.parser.reduce(follow=lambda: not self._closed.wait(0.1), pollInterval=0)
+
+    def finish(self, ed):
+        """
+        Args:
+            ed (ExceptionDescriptor): the dump must be complete (closed) by now
+
+        Returns:
+            dict: see PidStatParser.reduce()
+        """
+        self.parser.ed = ed
+        self._closed.set()
+        self._thread.join()
+        return self.result
+
+
+class ProcSamplerProfiler(object):
+    """
+    An in-process counterpart of PidStatProfiler
+
+    Instead of forking pidstat for every call it runs a background thread that reads /proc/<pid>/stat, statm, io and
+    task/*/stat directly, see procSampler.ProcSampler; the emitted dict has the same layout as PidStatParser.parse()
+
+    Attributes:
+
+        INTERVAL (float):
+            how frequently will the profiler inspect the process, in seconds; the minimum is procSampler.MIN_INTERVAL
+
+    """
+    INTERVAL = 0.1
+
+    def __init__(self, pid=None, interval=None, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            interval (float): optional; by default it uses INTERVAL
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; a function object that takes (a list of samples, an ExceptionDescriptor)
+                then generates a dict
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.pid = pid if pid is not None else os.getpid()
+        self.interval = interval if interval is not None else self.INTERVAL
+        if self.interval < procSampler.MIN_INTERVAL:
+            raise ValueError('Interval must be at least {} second(s)'.format(procSampler.MIN_INTERVAL))
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else _doNothing
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None, interval=None):
+        return cls(interval=interval, excGenerator=ExceptionDescriptor.create, parser=procSampler.parse,
+                   messenger=messenger)
+
+    def __enter__(self):
+        sampler = procSampler.ProcSampler(self.pid, interval=self.interval, recordType=ProcessRecord)
+        sampler.start()
+        self.calls.push(sampler)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sampler = self.calls.pop()
+        sampler.stop()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, sampler.samples, ed=ed)
+
+
+class PidStatStream(object):
+    """
+    A long-lived pidstat process whose output is parsed while it is being written
+
+    This is a source for sharedSampler.SharedSampler: each complete sample is handed to onSample (from a reader
+    thread), with the same layout as the samples produced by PidStatParser.parse()
+
+    Attributes:
+
+        resolution (float):
+            pidstat prints whole-second times
+
+    """
+    resolution = 1.0
+
+    def __init__(self, pid=None, interval=None, onSample=None):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            interval (str): optional; by default it uses PidStatProfiler.INTERVAL
+            onSample (callable): optional
+        """
+        self.pid = pid if pid is not None else os.getpid()
+        self.interval = interval if interval is not None else PidStatProfiler.INTERVAL
+        self.onSample = onSample
+        self.p = None
+        self._thread = None
+
+    def start(self):
+        cmds = ['pidstat', '-dtrsh', '-p', str(self.pid), str(self.interval)]
+        # pidstat's stdout is block-buffered when it is not a terminal
+        if find_executable('stdbuf'):
+            cmds = ['stdbuf', '-oL'] + cmds
+        with open(os.devnull, 'w') as devNull:
+            self.p = subprocess.Popen(cmds, stdout=subprocess.PIPE, stderr=devNull)
+        self._thread = threading.Thread(target=self._run, name='frep-pidStatStream-{}'.format(self.pid))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self.p.poll() is None:
             self.p.send_signal(signal.SIGINT)
-        self.p.poll()
-        self.fd.flush()
-        self.fd.write('\n{}\n'.format(self.END))
-        self.fd.close()
+        self.p.wait()
+        self._thread.join()
+
+    def _run(self):
+        it = iter(self.p.stdout.readline, '')
+        for line in it:
+            columns = list()
+            if not PidStatSample.accept(line, o_columns=columns):
+                continue
+            records = PidStatSample().parse(it, columns)
+            if records and self.onSample is not None:
+                self.onSample([columns] + records)
+
+    def sample(self):
+        """
+        Runs pidstat once, e.g. for a call that returns before the first sample of the stream; without an interval
+        pidstat reports the rates averaged since the process started
+
+        Returns:
+            list: the sample or None if pidstat fails
+        """
+        with open(os.devnull, 'w') as devNull:
+            try:
+                p = subprocess.Popen(['pidstat', '-dtrsh', '-p', str(self.pid)], stdout=subprocess.PIPE,
+                                     stderr=devNull)
+            except OSError:
+                return None
+            out = p.communicate()[0]
+        it = iter(out.splitlines(True))
+        for line in it:
+            columns = list()
+            if PidStatSample.accept(line, o_columns=columns):
+                records = PidStatSample().parse(it, columns)
+                return [columns] + records if records else None
+        return None
+
+
+class SharedSamplerProfiler(object):
+    """
+    Subscribes to the session-wide sampler of the process instead of owning one, see sharedSampler
+
+    All the instances that profile the same pid with the same backend share one sampler (one pidstat process or one
+    /proc thread); each call receives the samples that fall in its own [enter, exit] window, in the same dict as
+    PidStatParser.parse() returns.
+
+    Attributes:
+
+        BACKENDS (tuple):
+            'proc': a procSampler.ProcSampler thread, the interval is in seconds (see ProcSamplerProfiler.INTERVAL)
+            'pidstat': a PidStatStream, the interval is in whole seconds (see PidStatProfiler.INTERVAL)
+
+    """
+    BACKENDS = ('proc', 'pidstat')
+
+    def __init__(self, pid=None, backend='proc', interval=None, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            backend (str): optional; one of BACKENDS
+            interval (float): optional; it only takes effect if this profiler is the first one to use the sampler
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see ProcSamplerProfiler
+            messenger (callable): optional; see PidStatProfiler
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError('Unknown backend: {}, expect one of {}'.format(backend, self.BACKENDS))
+        self.pid = pid if pid is not None else os.getpid()
+        self.backend = backend
+        self.interval = interval
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else _doNothing
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None, backend='proc', interval=None):
+        return cls(backend=backend, interval=interval, excGenerator=ExceptionDescriptor.create,
+                   parser=procSampler.parse, messenger=messenger)
+
+    def _createSource(self):
+        if self.backend == 'pidstat':
+            return PidStatStream(self.pid, interval=self.interval)
+        interval = self.interval if self.interval is not None else ProcSamplerProfiler.INTERVAL
+        return procSampler.ProcSampler(self.pid, interval=interval, recordType=ProcessRecord, keep=False)
+
+    def __enter__(self):
+        session = sharedSampler.SharedSampler.get((self.backend, self.pid), self._createSource)
+        self.calls.push((session, session.subscribe()))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        session, token = self.calls.pop()
+        samples = session.unsubscribe(token)
         ed = self.excGenerator(exc_type, exc_val, exc_tb)
-        self.messenger(self.parser(self.filePath, ed=ed))
-        if type(self).DELETE_UPON_COMPLETION:
-            os.remove(self.filePath)
+        _send(self.messenger, self.parser, samples, ed=ed)
+
+
+class PerfSessionProfiler(object):
+    """
+    A low-latency counterpart of PerfStatProfiler
+
+    Instead of launching perf stat for every call, all the instances that profile the same pid share one perf stat
+    process whose counters are enabled and disabled around each call through perf's control fifo, see perfSession;
+    the emitted dict has the same layout as perfStat.parse() plus the raw counters keyed by their names
+
+    The dict is sent from the thread that reads perf's output, once perf has printed the interval that carries the
+    tail of the call, see perfSession.PerfSession.end()
+
+    """
+
+    def __init__(self, pid=None, intervalMs=None, events=None, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            intervalMs (int): optional; see perfSession.PerfSession
+            events (list): optional; see perfSession.PerfSession
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; a function object that takes (a dict of counters, the elapsed time, an
+                ExceptionDescriptor) then generates a dict
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.pid = pid if pid is not None else os.getpid()
+        self.intervalMs = intervalMs
+        self.events = events
+        self.excGenerator = excGenerator if excGenerator is not None else ExceptionDescriptor.create
+        self.parser = parser if parser is not None else perfStat.fromCounts
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None):
+        return cls(excGenerator=ExceptionDescriptor.create, parser=perfStat.fromCounts, messenger=messenger)
+
+    def __enter__(self):
+        session = perfSession.PerfSession.get(self.pid, intervalMs=self.intervalMs, events=self.events)
+        self.calls.push((session, session.begin()))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        session, token = self.calls.pop()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        session.end(token, lambda counts, elapsed: _send(self.messenger, self.parser, counts, elapsed, ed=ed))
+
+
+class PerfEventProfiler(object):
+    """
+    Reads the counters of the calling thread, opened in-process with perf_event_open(2), on __enter__() and __exit__()
+
+    Each thread opens its counter group once (see perfEvent.CounterGroup) and keeps it for the later calls, so the cost
+    of a call is two read() syscalls; the emitted dict has the same layout as perfStat.parse().
+
+    The hardware counters (cycles, instructions) are only reported if the PMU is accessible; if no counter can be
+    opened at all (e.g. the syscall is blocked) only the elapsed time is reported.
+    """
+
+    def __init__(self, hardware=True, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            hardware (bool): optional; whether to try the hardware counters
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see PerfSessionProfiler
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.hardware = hardware
+        self.excGenerator = excGenerator if excGenerator is not None else ExceptionDescriptor.create
+        self.parser = parser if parser is not None else perfStat.fromCounts
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+        self._local = threading.local()
+
+    def _group(self):
+        group = getattr(self._local, 'group', None)
+        if group is None:
+            group = self._local.group = perfEvent.CounterGroup(hardware=self.hardware)
+        return group
+
+    def __enter__(self):
+        group = self._group()
+        self.calls.push((time.time(), group.read()))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        group = self._local.group
+        end = group.read()
+        t = time.time()
+        begin_t, begin = self.calls.pop()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, perfEvent.toCounts(group.names, begin, end), t - begin_t, ed=ed)
+
+
+class ImportProfiler(object):
+    """
+    Profiles the imports done within the context, e.g. the start-up of a tool:
+
+        with profilers.ImportProfiler.create(messenger=exporters.ChromeTraceWriter('/tmp/startup.json')):
+            import heavyTool
+
+    The imports are recorded as a tree with the cumulative time, the self time and the RSS growth of each module, see
+    importTracker; the modules already imported before entering the context are not recorded.
+    """
+
+    def __init__(self, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; a function object that takes (a list of import records, an
+                ExceptionDescriptor) then generates a dict
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else _doNothing
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None):
+        return cls(excGenerator=ExceptionDescriptor.create, parser=importTracker.parse, messenger=messenger)
+
+    def __enter__(self):
+        tracker = importTracker.ImportTracker()
+        tracker.install()
+        self.calls.push(tracker)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        tracker = self.calls.pop()
+        tracker.uninstall()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, tracker.records, ed=ed)
+
+
+class TraceMallocProfiler(object):
+    """
+    Measures the memory allocated by each call with tracemalloc (Python 3.4+), or the resident set size of the process
+    without it (Python 2)
+
+    Each call reports the net growth and the peak of the traced memory; every snapshotEvery-th call also takes a
+    snapshot at both ends and reports the topN allocation sites that grew the most, see parsers.traceMalloc. Taking
+    the snapshots is the expensive part, and comparing them is done by the parser, which AsyncMessenger runs off the
+    SUP's thread.
+
+    If tracemalloc is not tracing yet, the profiler starts it with depth frames per traceback and stops it once the
+    last active call returns. The traced memory is process-wide, so the allocations of the other threads are counted
+    while they overlap the call. The per-call peak requires tracemalloc.reset_peak() (Python 3.9+); without it the
+    peak is None unless the call started the tracing.
+
+    Without tracemalloc, net and peak are the growth of the RSS and of its high-water mark, see residentMemory: they
+    count pages rather than bytes, include the native allocations and miss the memory that the call reuses from the
+    allocator's free lists. There are no snapshots, hence no sites, and since the high-water mark is never reset the
+    peak is None unless the call raises the highest RSS the process has had so far.
+    """
+
+    def __init__(self, topN=10, depth=1, snapshotEvery=1, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            topN (int): optional; the number of allocation sites to report, 0 to never take snapshots
+            depth (int): optional; the number of frames recorded per allocation if the profiler starts tracemalloc
+            snapshotEvery (int): optional; take the snapshots on the 1st, (n+1)th, (2n+1)th... calls, if tracemalloc is
+                available
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see parsers.traceMalloc.parse()
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.topN = topN
+        self.depth = depth
+        self.snapshotEvery = snapshotEvery
+        self.excGenerator = excGenerator if excGenerator is not None else ExceptionDescriptor.create
+        self.parser = parser if parser is not None else traceMalloc.parse
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+        self._callIds = itertools.count()
+        self._lock = threading.Lock()
+        self._numActive = 0
+        self._started = False
+
+    def __enter__(self):
+        if tracemalloc is None:
+            current, mark = residentMemory.read()
+            self.calls.push([current, current, None, mark])
+            return
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.depth)
+                self._started = True
+            self._numActive += 1
+        current, peak = tracemalloc.get_traced_memory()
+        # the outer calls of this thread keep the peak that reset_peak() is about to discard
+        for frame in self.calls.frames:
+            frame[1] = max(frame[1], peak)
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            knownPeak = True
+        else:
+            knownPeak = self._started and self._numActive == 1
+        snapshot = None
+        if self.topN and next(self._callIds) % self.snapshotEvery == 0:
+            snapshot = self._snapshot()
+            current = tracemalloc.get_traced_memory()[0]
+        self.calls.push([current, current, snapshot, knownPeak])
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if tracemalloc is None:
+            current, peak = residentMemory.read()
+            begin, highest, before, mark = self.calls.pop()
+            # otherwise the peak of the call is anywhere under the mark
+            knownPeak = peak > mark
+            after = None
+        else:
+            current, peak = tracemalloc.get_traced_memory()
+            begin, highest, before, knownPeak = self.calls.pop()
+            after = self._snapshot() if before is not None else None
+            with self._lock:
+                self._numActive -= 1
+                if not self._numActive and self._started:
+                    tracemalloc.stop()
+                    self._started = False
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        peak = max(highest, peak) - begin if knownPeak else None
+        _send(self.messenger, self.parser, current - begin, peak, before=before, after=after, topN=self.topN, ed=ed)
+
+    @staticmethod
+    def _snapshot():
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+
+class GcProfiler(object):
+    """
+    Times the garbage collections that happen during each call and reports them by generation, see gcMonitor
+
+    A pause is charged to every call open on the collecting thread, so gcShare (the GC time over the wall time) of an
+    outer call includes its inner calls. Without gc.callbacks (Python 2) only the number of collections is reported,
+    unless timed is True: the automatic collections of the whole process are then deferred to the end of the calls,
+    see gcMonitor.
+    """
+
+    def __init__(self, timed=False, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            timed (bool): optional; without gc.callbacks, whether to time the collections at the cost of changing the
+                collector while a call is open
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see gcMonitor.parse()
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.timed = timed
+        self.parser = parser if parser is not None else gcMonitor.parse
+        self.messenger = messenger if messenger is not None else _doNothing
+
+    @classmethod
+    def create(cls, messenger=None, timed=False):
+        return cls(timed=timed, excGenerator=ExceptionDescriptor.create, parser=gcMonitor.parse, messenger=messenger)
+
+    def __enter__(self):
+        gcMonitor.push(timed=self.timed)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        frame, elapsed = gcMonitor.pop()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, frame, elapsed, ed=ed)
+
+
+class StackSamplerProfiler(object):
+    """
+    Samples the Python stack of the calling thread while the SUP runs and emits the stacks, cut at the SUP, as folded
+    stacks with their numbers of samples, see stackSampler
+
+    The overhead is bounded by the sampling rate rather than by the number of calls the SUP makes.
+
+    Attributes:
+
+        INTERVAL (float):
+            the sampling interval in seconds (100 Hz by default); the minimum is stackSampler.MIN_INTERVAL
+
+    """
+    INTERVAL = 0.01
+
+    def __init__(self, interval=None, useSignal=False, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            interval (float): optional; by default it uses INTERVAL
+            useSignal (bool): optional; sample the main thread with SIGPROF instead of a watcher thread, see
+                stackSampler
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see stackSampler.parse()
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.interval = interval if interval is not None else self.INTERVAL
+        if self.interval < stackSampler.MIN_INTERVAL:
+            raise ValueError('Interval must be at least {} second(s)'.format(stackSampler.MIN_INTERVAL))
+        self.useSignal = useSignal
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else stackSampler.parse
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None, interval=None, useSignal=False):
+        return cls(interval=interval, useSignal=useSignal, excGenerator=ExceptionDescriptor.create,
+                   parser=stackSampler.parse, messenger=messenger)
+
+    def __enter__(self):
+        # the frame that enters the profiler, i.e. the wrapper of the SUP, possibly through a CompositeProfiler
+        frame = sys._getframe(1)
+        while frame.f_code.co_name == '__enter__' and frame.f_globals.get('__name__') == __name__:
+            frame = frame.f_back
+        sampler = stackSampler.StackSampler(entryFrame=frame, interval=self.interval,
+                                            useSignal=self.useSignal)
+        sampler.start()
+        self.calls.push((sampler, time.time()))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sampler, t = self.calls.pop()
+        sampler.stop()
+        sampler.entryFrame = None
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, sampler.counts, sampler.numSamples, sampler.interval, time.time() - t,
+              ed=ed)
+
+
+class ResourceDeltaProfiler(object):
+    """
+    Reads the resource usage of the calling thread on __enter__() and __exit__() and reports the difference: wall and
+    CPU time (their difference being the time spent off CPU, e.g. waiting on I/O or locks), user and system time,
+    context switches, page faults and I/O bytes, see resourceUsage
+
+    A per-call, in-process counterpart of PidStatProfiler; a call costs a getrusage(2) and a read of
+    /proc/thread-self/io on each end.
+    """
+
+    def __init__(self, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see resourceUsage.delta()
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else resourceUsage.delta
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None):
+        return cls(excGenerator=ExceptionDescriptor.create, parser=resourceUsage.delta, messenger=messenger)
+
+    def __enter__(self):
+        self.calls.push(resourceUsage.read())
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        end = resourceUsage.read()
+        begin = self.calls.pop()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, begin, end, ed=ed)
+
+
+class ProcessTreeProfiler(object):
+    """
+    Follows the processes that the SUP starts (subprocess, multiprocessing, os.system...) and all their descendants,
+    and reports the CPU time, RSS and I/O bytes of each child plus the totals, see processTree
+
+    The children are sampled every interval seconds by a background thread; the CPU time of the children that the SUP
+    waits for is also taken from getrusage(RUSAGE_CHILDREN), which counts the children too short-lived to be sampled.
+
+    If tagPopen is True, subprocess.Popen is patched while any call of this profiler is active so that each child is
+    tagged with the span (or the function) that starts it.
+
+    Attributes:
+
+        INTERVAL (float):
+            how frequently will the profiler walk the process tree, in seconds
+
+    """
+    INTERVAL = 0.05
+
+    def __init__(self, pid=None, interval=None, tagPopen=False, excGenerator=None, parser=None, messenger=None):
+        """
+
+        Args:
+            pid (int): optional; by default it calls POSIX getpid()
+            interval (float): optional; by default it uses INTERVAL
+            tagPopen (bool): optional
+            excGenerator (callable): optional; see PidStatProfiler
+            parser (callable): optional; see processTree.parse()
+            messenger (callable): optional; a function object that takes the above dict then sends it to somewhere
+        """
+        self.pid = pid if pid is not None else os.getpid()
+        self.interval = interval if interval is not None else self.INTERVAL
+        self.tagPopen = tagPopen
+        self.excGenerator = excGenerator if excGenerator is not None else _noExc
+        self.parser = parser if parser is not None else processTree.parse
+        self.messenger = messenger if messenger is not None else _doNothing
+        self.calls = CallStack()
+
+    @classmethod
+    def create(cls, messenger=None, interval=None, tagPopen=False):
+        return cls(interval=interval, tagPopen=tagPopen, excGenerator=ExceptionDescriptor.create,
+                   parser=processTree.parse, messenger=messenger)
+
+    def __enter__(self):
+        if self.tagPopen:
+            processTree.tagPopen()
+        sampler = processTree.ProcessTreeSampler(self.pid, interval=self.interval)
+        sampler.start()
+        self.calls.push((sampler, processTree.childrenUsage()[0], time.time()))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        sampler, reapedCpu, t = self.calls.pop()
+        sampler.stop()
+        reapedCpu = processTree.childrenUsage()[0] - reapedCpu
+        if self.tagPopen:
+            processTree.untagPopen()
+        ed = self.excGenerator(exc_type, exc_val, exc_tb)
+        _send(self.messenger, self.parser, sampler.children.values(), sampler.peakRss, reapedCpu, time.time() - t,
+              ed=ed)
+
+
+class SharedStatsProfiler(object):
+    """
+    Records the duration of each call in a sharedStats.SharedStats segment under the given name; the processes that
+    share the segment (e.g. the workers of a pool forked after it is created) aggregate into it without sending
+    anything per call, and any of them (or another process) reads the merged statistics with SharedStats.read()
+    """
+
+    def __init__(self, stats, name):
+        """
+
+        Args:
+            stats (sharedStats.SharedStats):
+            name (str): the qualified name of the profiled function
+        """
+        self.stats = stats
+        self.name = name
+        self.calls = CallStack()
+
+    def __enter__(self):
+        self.calls.push(clocks.monotonic())
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stats.record(self.name, clocks.monotonic() - self.calls.pop())
+
+
+class CompositeProfiler(object):
+    """
+    Runs several profilers around the same call: they are entered in the given order and exited in the reverse order,
+    so each one measures the ones that come after it; if a profiler fails to enter, the ones already entered are
+    exited before the error propagates
+    """
+
+    def __init__(self, profilers):
+        """
+
+        Args:
+            profilers (list): the profilers, each implementing the context manager interface
+        """
+        self.profilers = list(profilers)
+        self.calls = CallStack()
+
+    def __enter__(self):
+        entered = list()
+        try:
+            for p in self.profilers:
+                p.__enter__()
+                entered.append(p)
+        except Exception:
+            exc_type, exc_val, exc_tb = sys.exc_info()
+            for p in reversed(entered):
+                p.__exit__(exc_type, exc_val, exc_tb)
+            raise exc_type, exc_val, exc_tb
+        self.calls.push(entered)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for p in reversed(self.calls.pop()):
+            p.__exit__(exc_type, exc_val, exc_tb)
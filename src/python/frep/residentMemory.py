@@ -0,0 +1,25 @@
+"""
+Reads the resident set size (RSS) of this process: the current one from /proc/self/statm and its high-water mark from
+getrusage(RUSAGE_SELF). The mark is never reset (writing to /proc/self/clear_refs would also clear the soft-dirty and
+referenced bits of every page of the process), so it only gives the peak of a call if the call raises it.
+
+Both are process-wide, rounded to pages, and include the memory of the native code as well as the memory that the
+allocator has not given back to the system yet.
+"""
+
+import resource
+
+from frep import procSampler
+
+
+STATM = '/proc/self/statm'
+
+
+def read():
+    """
+    Returns:
+        tuple: (the current RSS, its high-water mark) in bytes
+    """
+    rss = procSampler.readStatm(STATM)[1] * 1024
+    # ru_maxrss is in kB on Linux
+    return rss, max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, rss)
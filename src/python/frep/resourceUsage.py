@@ -0,0 +1,117 @@
+"""
+Reads the resource usage of the calling thread: getrusage(RUSAGE_THREAD), the thread CPU clock and
+/proc/thread-self/io; a reading costs a few microseconds, so the difference of two readings measures one call.
+
+The I/O counters come in two flavours:
+
+rchar / wchar:
+    the bytes passed to read(2) / write(2) and the like, whether or not they reach the storage
+
+read_bytes / write_bytes:
+    the bytes fetched from or sent to the storage layer (page cache misses, write-back)
+
+Reading /proc/thread-self/io is itself a read(2): its bytes are charged to rchar after the counters are taken, so
+delta() subtracts the size of the begin reading from rchar (the end reading is not counted).
+"""
+
+import resource
+import threading
+
+from frep import clocks
+
+
+# Linux; Python 2 does not define the constant
+RUSAGE_THREAD = getattr(resource, 'RUSAGE_THREAD', 1)
+
+IO_KEYS = ('rchar', 'wchar', 'read_bytes', 'write_bytes')
+
+_local = threading.local()
+
+
+def _ioPath():
+    path = getattr(_local, 'ioPath', None)
+    if path is None:
+        path = '/proc/thread-self/io'
+        try:
+            open(path, 'r').close()
+        except (IOError, OSError):
+            # before Linux 3.17
+            path = '/proc/self/task/{}/io'.format(gettid())
+        _local.ioPath = path
+    return path
+
+
+def gettid():
+    """
+    Returns:
+        int: the kernel thread id of the calling thread
+    """
+    if hasattr(threading, 'get_native_id'):
+        return threading.get_native_id()
+    import ctypes
+    import platform
+    SYS_gettid = {'x86_64': 186, 'i386': 224, 'i686': 224, 'aarch64': 178}.get(platform.machine(), 186)
+    return ctypes.CDLL(None).syscall(SYS_gettid)
+
+
+def readIO():
+    """
+    Returns:
+        tuple: the IO_KEYS counters of the calling thread; zeros if they are not readable
+    """
+    return _readIO()[0]
+
+
+def _readIO():
+    try:
+        with open(_ioPath(), 'r') as fp:
+            text = fp.read()
+    except (IOError, OSError):
+        return (0, ) * len(IO_KEYS), 0
+    d = dict()
+    for line in text.splitlines():
+        k, _, v = line.partition(':')
+        d[k] = v
+    return tuple(int(d.get(k, 0)) for k in IO_KEYS), len(text)
+
+
+def read():
+    """
+    Returns:
+        tuple: wall time, thread CPU time, the rusage of the thread, the I/O counters of the thread, the number of
+            bytes read to get the latter
+    """
+    io, ioSize = _readIO()
+    return clocks.monotonic(), clocks.threadTime(), resource.getrusage(RUSAGE_THREAD), io, ioSize
+
+
+def delta(begin, end, ed=None):
+    """
+    Args:
+        begin (tuple): see read()
+        end (tuple): see read()
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: time (wall), cpu (thread CPU time), offCpu (time - cpu, i.e. waiting), user, sys, voluntarySwitches,
+            involuntarySwitches, minorFaults, majorFaults, rchar, wchar, read_bytes, write_bytes, error, traceback;
+            times in seconds, I/O in bytes; rchar excludes the begin reading of the I/O counters
+    """
+    wall0, cpu0, ru0, io0, ioSize0 = begin
+    wall1, cpu1, ru1, io1, _ = end
+    result = dict()
+    result['time'] = wall1 - wall0
+    result['cpu'] = cpu1 - cpu0
+    result['offCpu'] = max(result['time'] - result['cpu'], 0.0)
+    result['user'] = ru1.ru_utime - ru0.ru_utime
+    result['sys'] = ru1.ru_stime - ru0.ru_stime
+    result['voluntarySwitches'] = ru1.ru_nvcsw - ru0.ru_nvcsw
+    result['involuntarySwitches'] = ru1.ru_nivcsw - ru0.ru_nivcsw
+    result['minorFaults'] = ru1.ru_minflt - ru0.ru_minflt
+    result['majorFaults'] = ru1.ru_majflt - ru0.ru_majflt
+    for k, v0, v1 in zip(IO_KEYS, io0, io1):
+        result[k] = v1 - v0
+    result['rchar'] -= ioSize0
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
@@ -0,0 +1,217 @@
+"""
+Profiles an unmodified program: patches the given functions, runs the program's script (or module) in this
+interpreter with runpy and writes an aggregated report at exit, e.g.
+
+    python -m frep run --patch corelib.publish:publish,Graph.addNode --profiler timer,pidstat -- script.py args
+
+A patch spec is a module dot path and its comma-separated symbols: free functions or methods (Class.method). The
+patches are lazy: a module that the program has not imported yet is patched when it is first imported (see
+augmentation.LazyMonkey), so the patches cost nothing until then.
+
+Each patched function gets its own profilers, combined in a CompositeProfiler in the order given; their messages are
+tagged with the function and the profiler names, aggregated in memory (see compare.values()) and, with --output, written
+to a run file that compare reads and, with --store, to a profile store (see frep.store). The report is written once the
+program returns, at interpreter exit, i.e. after its non-daemon threads are joined.
+"""
+
+import atexit
+import os
+import runpy
+import sys
+import threading
+from distutils.spawn import find_executable
+
+import frep
+from frep import compare
+from frep import profilers
+from frep import sampling
+from frep import store
+
+
+# name: factory taking the messenger
+PROFILERS = {
+    'timer': lambda messenger: profilers.SimpleTimerProfiler.create(messenger=messenger),
+    'pidstat': lambda messenger: profilers.PidStatProfiler.create(messenger=messenger),
+    'perfstat': lambda messenger: profilers.PerfStatProfiler(messenger=messenger),
+    'proc': lambda messenger: profilers.ProcSamplerProfiler.create(messenger=messenger),
+    'resource': lambda messenger: profilers.ResourceDeltaProfiler.create(messenger=messenger),
+    'gc': lambda messenger: profilers.GcProfiler.create(messenger=messenger),
+    'stacks': lambda messenger: profilers.StackSamplerProfiler.create(messenger=messenger),
+    'processtree': lambda messenger: profilers.ProcessTreeProfiler.create(messenger=messenger),
+    'tracemalloc': lambda messenger: profilers.TraceMallocProfiler(messenger=messenger),
+}
+
+# name: the executable the profiler runs
+REQUIRES = {
+    'pidstat': 'pidstat',
+    'perfstat': 'perf',
+}
+
+
+def parsePatch(spec):
+    """
+    Args:
+        spec (str): e.g. 'corelib.publish:publish,Graph.addNode'
+
+    Returns:
+        tuple: the module dot path, the free functions, the methods
+    """
+    moduleDotPath, sep, symbols = spec.partition(':')
+    symbols = [s.strip() for s in symbols.split(',') if s.strip()]
+    if not moduleDotPath or not symbols:
+        raise ValueError('Expected module.path:symbol[,Class.method...], got {}'.format(spec))
+    return moduleDotPath, [s for s in symbols if '.' not in s], [s for s in symbols if '.' in s]
+
+
+def _quantile(values, q):
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class Runner(object):
+    """
+    Attributes:
+        names (list): the qualified names of the patched functions, in the order they are patched
+        numCalls (dict): key: function name, value: the number of calls reported by the first profiler, whose messages
+            also give the durations of the calls in the profile store
+        numErrors (dict): key: function name, value: the number of those calls that raised
+    """
+
+    def __init__(self, patchSpecs, profilerNames, every=None, outputPath=None, reportPath=None, storePath=None):
+        """
+
+        Args:
+            patchSpecs (list): see parsePatch()
+            profilerNames (list): keys of PROFILERS
+            every (int): optional; profile the 1st, (n+1)th, (2n+1)th... calls of each function only
+            outputPath (str): optional; the run file to write, see compare.RunWriter
+            reportPath (str): optional; by default the report goes to stderr
+            storePath (str): optional; the profile store to write, see store.Store
+        """
+        for name in profilerNames:
+            if name not in PROFILERS:
+                raise ValueError('Unknown profiler {}, expected one of {}'.format(name, ', '.join(sorted(PROFILERS))))
+            # rather than failing in the first patched call of the program
+            if name in REQUIRES and not find_executable(REQUIRES[name]):
+                raise ValueError('Profiler {} requires {}, which is not installed'.format(name, REQUIRES[name]))
+        self.patches = [parsePatch(spec) for spec in patchSpecs]
+        self.profilerNames = list(profilerNames)
+        self.every = every
+        self.reportPath = reportPath
+        self.names = list()
+        self.numCalls = dict()
+        self.numErrors = dict()
+        self._values = dict()
+        self._lock = threading.Lock()
+        self._writer = compare.RunWriter(outputPath) if outputPath else None
+        self._store = store.Store(storePath) if storePath else None
+        self._closed = False
+
+    def messenger(self, name, profilerName):
+        def _(d):
+            self.receive(name, profilerName, d)
+        return _
+
+    def receive(self, name, profilerName, d):
+        if not d:
+            return
+        d = dict(d)
+        d['profiler'] = profilerName
+        with self._lock:
+            if profilerName == self.profilerNames[0]:
+                self.numCalls[name] = self.numCalls.get(name, 0) + 1
+                if d.get('error'):
+                    self.numErrors[name] = self.numErrors.get(name, 0) + 1
+            if not d.get('error'):
+                values = self._values.setdefault(name, dict())
+                for k, v in compare.values(d):
+                    values.setdefault(k, list()).append(v)
+        if self._writer is not None:
+            self._writer.write(name, d)
+        if self._store is not None:
+            self._store.add(name, d, source=profilerName, duration=profilerName == self.profilerNames[0])
+
+    def _profiler(self, name):
+        return profilers.CompositeProfiler([PROFILERS[p](self.messenger(name, p)) for p in self.profilerNames])
+
+    def install(self):
+        """
+        Patches the functions (lazily) and registers close() at exit
+        """
+        for moduleDotPath, freeFuncs, methods in self.patches:
+            for symbols, kwarg in ((freeFuncs, 'freeFuncs'), (methods, 'methods')):
+                for symbol in symbols:
+                    name = '{}.{}'.format(moduleDotPath, symbol)
+                    sampler = sampling.EveryN(self.every) if self.every else None
+                    frep.patch(moduleDotPath, profiler=self._profiler(name), sampler=sampler, lazy=True,
+                               **{kwarg: [symbol]})
+                    self.names.append(name)
+        atexit.register(self.close)
+
+    def run(self, target, args, module=False):
+        """
+        Runs the program as __main__, with sys.argv set to [target] + args
+
+        Args:
+            target (str): a script path, or a module dot path if module is True
+            args (list):
+            module (bool): optional
+
+        Returns:
+            int: the exit status of the program
+        """
+        argv = sys.argv[:]
+        path = sys.path[:]
+        sys.argv[:] = [target] + list(args)
+        try:
+            if module:
+                runpy.run_module(target, run_name='__main__', alter_sys=True)
+            else:
+                # as the interpreter does for a script
+                sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+                runpy.run_path(target, run_name='__main__')
+        except SystemExit, e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            sys.stderr.write('{}\n'.format(e.code))
+            return 1
+        finally:
+            sys.argv[:] = argv
+            sys.path[:] = path
+        return 0
+
+    def report(self):
+        """
+        Returns:
+            list: the lines of the report: per function the number of calls and errors, then per metric (prefixed with
+                the profiler name) the count, mean, median, 90th and 99th percentiles and the maximum
+        """
+        lines = ['{:<48} {:<32} {:>8} {:>12} {:>12} {:>12} {:>12} {:>12}'.format(
+            'function', 'metric', 'count', 'mean', 'p50', 'p90', 'p99', 'max')]
+        with self._lock:
+            for name in self.names:
+                lines.append('{} calls: {}, errors: {}'.format(name, self.numCalls.get(name, 0),
+                                                              self.numErrors.get(name, 0)))
+                for metric, values in sorted(self._values.get(name, dict()).iteritems()):
+                    values = sorted(values)
+                    lines.append('{:<48} {:<32} {:>8} {:>12.6g} {:>12.6g} {:>12.6g} {:>12.6g} {:>12.6g}'.format(
+                        '', metric, len(values), sum(values) / float(len(values)), _quantile(values, 0.5),
+                        _quantile(values, 0.9), _quantile(values, 0.99), values[-1]))
+        return lines
+
+    def close(self):
+        """
+        Writes the report (once) and closes the run file and the store
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._writer is not None:
+            self._writer.close()
+        if self._store is not None:
+            self._store.close()
+        text = '\n'.join(self.report()) + '\n'
+        if self.reportPath:
+            with open(self.reportPath, 'w') as fp:
+                fp.write(text)
+        else:
+            sys.stderr.write(text)
@@ -0,0 +1,132 @@
+"""
+Sampling policies decide which calls of a decorated or patched function are profiled, see frep.deco() and
+frep.patch(); a call that is not sampled goes straight to the original function.
+
+The policies are shared by all the threads that call the function; their bookkeeping is not locked, so under
+contention a policy may accept slightly more or fewer calls than asked for.
+"""
+
+import itertools
+import random
+import time
+
+
+class SamplingPolicy(object):
+
+    def accept(self):
+        """
+        Returns:
+            bool: whether to profile the coming call
+        """
+        return True
+
+    def record(self, overhead):
+        """
+        Called after a sampled call
+
+        Args:
+            overhead (float): the time spent in the profiler's __enter__() and __exit__(), in seconds
+        """
+        pass
+
+
+class EveryN(SamplingPolicy):
+    """
+    Profiles the 1st, (n+1)th, (2n+1)th... calls
+    """
+
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError('n must be positive, got {}'.format(n))
+        self.n = n
+        self._counter = itertools.count()
+
+    def accept(self):
+        return next(self._counter) % self.n == 0
+
+
+class Probabilistic(SamplingPolicy):
+    """
+    Profiles each call with the probability p
+    """
+
+    def __init__(self, p):
+        if not 0.0 <= p <= 1.0:
+            raise ValueError('p must be within [0, 1], got {}'.format(p))
+        self.p = p
+        self._random = random.random
+
+    def accept(self):
+        return self._random() < self.p
+
+
+class TimeBased(SamplingPolicy):
+    """
+    Profiles at most one call every interval seconds
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._last = None
+
+    def accept(self):
+        now = time.time()
+        if self._last is None or now - self._last >= self.interval:
+            self._last = now
+            return True
+        return False
+
+
+class Adaptive(SamplingPolicy):
+    """
+    Keeps the measured overhead of the profiler below targetPercent of the wall time
+
+    Every second of wall time earns targetPercent / 100 seconds of credit; a sampled call spends its overhead; a call
+    is sampled while there is credit left. The credit is capped by maxCredit so that an idle period does not turn into
+    a burst of sampled calls.
+    """
+
+    def __init__(self, targetPercent=1.0, maxCredit=0.1):
+        """
+
+        Args:
+            targetPercent (float): optional; the overhead budget
+            maxCredit (float): optional; in seconds
+        """
+        self.budget = targetPercent / 100.0
+        self.maxCredit = maxCredit
+        self._credit = 0.0
+        self._last = time.time()
+
+    def accept(self):
+        now = time.time()
+        self._credit = min(self._credit + self.budget * (now - self._last), self.maxCredit)
+        self._last = now
+        return self._credit > 0
+
+    def record(self, overhead):
+        self._credit -= overhead
+
+
+def call(profiler, policy, f, args, kwargs):
+    """
+    Calls f within the profiler, reporting the overhead of the profiler to the policy
+
+    Args:
+        profiler (object): implements context manager interface
+        policy (SamplingPolicy):
+        f (callable):
+        args (tuple):
+        kwargs (dict):
+    """
+    t = time.time()
+    marks = [t, t]
+    try:
+        with profiler:
+            marks[0] = time.time()
+            try:
+                return f(*args, **kwargs)
+            finally:
+                marks[1] = time.time()
+    finally:
+        policy.record(marks[0] - t + time.time() - marks[1])
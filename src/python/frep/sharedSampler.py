@@ -0,0 +1,187 @@
+"""
+One long-lived sampler per sampled process, multiplexed across all the calls that are being profiled
+
+Rather than spawning a sampler (a pidstat child process or a /proc thread) per call, a profiler subscribes to the
+session-wide SharedSampler in __enter__() and unsubscribes in __exit__(); the latter returns the samples whose Time
+falls in the [enter, exit] window of that call. The beginning of the window is rounded down to the time resolution of
+the source (whole seconds for pidstat), and a call whose window holds no sample gets the latest sample instead, or one
+taken on demand.
+
+The sampler keeps only the samples that may still be claimed by an active subscriber, and stops its source once it has
+had no subscriber for idleTimeout seconds; the next subscriber starts it again. The samplers are stopped at interpreter
+exit, see exitHooks.
+"""
+
+import collections
+import itertools
+import math
+import os
+import threading
+import time
+
+from frep import exitHooks
+
+
+class SharedSampler(object):
+    """
+    Multiplexes the samples of a single source among the subscribers
+
+    A source is any object that implements start() and stop() and calls its onSample attribute with each new sample
+    (a list whose first element is the column names, followed by the records, see procSampler); it may also
+    implement sample() to take one sample on demand, and have a resolution attribute, the granularity in seconds of
+    the Time of its samples. It must support being started again once stopped.
+
+    Use SharedSampler.get() to retrieve the session-wide instance.
+
+    Attributes:
+
+        IDLE_TIMEOUT (float):
+            the default idleTimeout, in seconds
+
+    """
+    IDLE_TIMEOUT = 5.0
+
+    _registry = dict()
+    _registryLock = threading.Lock()
+
+    def __init__(self, source, idleTimeout=None):
+        """
+
+        Args:
+            source (object): see the class doc; it must not have been started
+            idleTimeout (float): optional; by default it uses IDLE_TIMEOUT
+        """
+        self.source = source
+        self.source.onSample = self._onSample
+        self.resolution = getattr(source, 'resolution', 0)
+        self.idleTimeout = idleTimeout if idleTimeout is not None else self.IDLE_TIMEOUT
+        self._lock = threading.Lock()
+        # serializes the start() and stop() of the source
+        self._sourceLock = threading.Lock()
+        self._samples = collections.deque()
+        self._latest = None
+        self._subscribers = dict()
+        self._tokens = itertools.count()
+        self._started = False
+        self._idleSince = None
+        self._stopping = False
+
+    @classmethod
+    def get(cls, key, sourceFactory):
+        """
+        Returns the session-wide sampler for the given key, creating it from sourceFactory() if there isn't one;
+
+        Note that the first caller decides the source (hence the sampling interval) of a key.
+
+        Args:
+            key (hashable): identifies the sampled subject, e.g. ('proc', pid)
+            sourceFactory (callable): creates a new source
+
+        Returns:
+            SharedSampler:
+        """
+        # a forked child must not share the parent's sampler
+        key = (os.getpid(), key)
+        with cls._registryLock:
+            sampler = cls._registry.get(key)
+            if sampler is None:
+                sampler = cls._registry[key] = cls(sourceFactory())
+                exitHooks.register(sampler, 'stop')
+        return sampler
+
+    @classmethod
+    def stopAll(cls):
+        with cls._registryLock:
+            samplers = cls._registry.values()
+            cls._registry.clear()
+        for sampler in samplers:
+            sampler.stop()
+
+    def subscribe(self):
+        """
+        Returns:
+            int: a token that must be passed to unsubscribe()
+        """
+        with self._lock:
+            token = next(self._tokens)
+            self._subscribers[token] = time.time()
+            started = self._started
+        if not started:
+            with self._sourceLock:
+                with self._lock:
+                    started = self._started
+                    self._started = True
+                if not started:
+                    self.source.start()
+        return token
+
+    def unsubscribe(self, token):
+        """
+        Args:
+            token (int): returned by subscribe()
+
+        Returns:
+            list: the samples taken within the [enter, exit] window of the subscriber
+        """
+        end = time.time()
+        with self._lock:
+            begin = self._windowBegin(self._subscribers[token])
+            samples = [s for s in self._samples if begin <= s[1]['Time'] <= end]
+            if not samples and self._latest is not None:
+                samples.append(self._latest)
+        if not samples and hasattr(self.source, 'sample'):
+            sample = self.source.sample()
+            if sample is not None:
+                samples.append(sample)
+        with self._lock:
+            self._subscribers.pop(token)
+            if not self._subscribers:
+                self._idleSince = end
+            self._trim()
+        return samples
+
+    def stop(self):
+        with self._sourceLock:
+            with self._lock:
+                if not self._started:
+                    return
+                self._started = False
+                self._latest = None
+            self.source.stop()
+
+    def _stopIfIdle(self):
+        with self._sourceLock:
+            with self._lock:
+                self._stopping = False
+                if self._subscribers or not self._started:
+                    return
+                self._started = False
+                self._latest = None
+            self.source.stop()
+
+    def _windowBegin(self, begin):
+        return math.floor(begin / self.resolution) * self.resolution if self.resolution else begin
+
+    def _onSample(self, sample):
+        stop = False
+        with self._lock:
+            self._latest = sample
+            if self._subscribers:
+                self._samples.append(sample)
+            elif (self._started and not self._stopping and self._idleSince is not None and
+                  time.time() - self._idleSince >= self.idleTimeout):
+                self._stopping = stop = True
+            self._trim()
+        if stop:
+            # the source's stop() joins the thread that runs this callback
+            t = threading.Thread(target=self._stopIfIdle, name='frep-sharedSampler-stop')
+            t.daemon = True
+            t.start()
+
+    def _trim(self):
+        if not self._subscribers:
+            self._samples.clear()
+            return
+        oldest = self._windowBegin(min(self._subscribers.itervalues()))
+        while self._samples and self._samples[0][1]['Time'] < oldest:
+            self._samples.popleft()
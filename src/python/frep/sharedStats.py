@@ -0,0 +1,250 @@
+"""
+Per-function call statistics shared by a tree of processes through a memory-mapped file
+
+The segment is divided in slots, one per process: a process claims a free slot (under an fcntl lock, once) the first
+time it records, and a forked child claims its own slot the first time it records after the fork, so no two
+processes ever write the same memory and recording needs no inter-process lock. The slots of the exited processes are
+kept, so the reader merges the statistics of every process that has ever recorded, in one pass over the segment.
+
+Layout (native byte order):
+
+    header      magic, version, numSlots, maxFunctions, nameSize, padded to HEADER_SIZE bytes
+    slot        pid, numEntries, numDropped, then maxFunctions entries
+    entry       name (nameSize bytes), count, total, min, max (nanoseconds), NUM_BUCKETS counters
+
+Bucket i counts the durations d (in nanoseconds) with d.bit_length() == i, i.e. 2 ** (i - 1) <= d < 2 ** i.
+
+A reader running concurrently with the writers may see an entry half updated; the statistics are exact once the
+writers are idle.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+
+from frep import spans
+
+
+MAGIC = 'frepstat'
+VERSION = 1
+HEADER_SIZE = 64
+NUM_BUCKETS = 64
+
+_HEADER = struct.Struct('8sIIII')
+_SLOT = struct.Struct('qII')
+_STATS = struct.Struct('QQQQ')
+_BUCKET = struct.Struct('I')
+_BUCKETS = struct.Struct('{}I'.format(NUM_BUCKETS))
+
+
+class SharedStats(spans.SpanListener):
+    """
+    E.g. in the parent, before forking the workers:
+
+        stats = SharedStats.create('/dev/shm/frep-render')
+        stats.attach()  # every instrumented function records its duration by its span name
+        pool = multiprocessing.Pool(32)
+        ...
+        for name, d in stats.read().iteritems():
+            print name, d['count'], d['mean']
+
+    Attributes:
+        numDropped (int): the number of records this process could not store (no free slot or no free entry)
+    """
+
+    def __init__(self, filePath, fd, numSlots, maxFunctions, nameSize):
+        self.filePath = filePath
+        self.numSlots = numSlots
+        self.maxFunctions = maxFunctions
+        self.nameSize = nameSize
+        self.numDropped = 0
+        self._entrySize = nameSize + _STATS.size + _BUCKETS.size
+        self._slotSize = _SLOT.size + maxFunctions * self._entrySize
+        self._fd = fd
+        self._buf = mmap.mmap(fd, HEADER_SIZE + numSlots * self._slotSize)
+        self._name = struct.Struct('{}s'.format(nameSize))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._slot = None
+        self._offsets = dict()
+
+    @classmethod
+    def create(cls, filePath, numSlots=64, maxFunctions=512, nameSize=96):
+        """
+        Creates (or truncates) the segment
+
+        Args:
+            filePath (str): e.g. under /dev/shm so that it stays in memory
+            numSlots (int): optional; the maximum number of processes
+            maxFunctions (int): optional; the maximum number of functions per process
+            nameSize (int): optional; the longer names are truncated
+        """
+        fd = os.open(filePath, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0644)
+        slotSize = _SLOT.size + maxFunctions * (nameSize + _STATS.size + _BUCKETS.size)
+        # a sparse file, the pages of the unused slots are never allocated
+        os.ftruncate(fd, HEADER_SIZE + numSlots * slotSize)
+        stats = cls(filePath, fd, numSlots, maxFunctions, nameSize)
+        _HEADER.pack_into(stats._buf, 0, MAGIC, VERSION, numSlots, maxFunctions, nameSize)
+        return stats
+
+    @classmethod
+    def open(cls, filePath):
+        """
+        Maps an existing segment, e.g. to read it from another process
+        """
+        fd = os.open(filePath, os.O_RDWR)
+        magic, version, numSlots, maxFunctions, nameSize = _HEADER.unpack(os.read(fd, _HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            os.close(fd)
+            raise ValueError('{} is not a frep stats segment'.format(filePath))
+        return cls(filePath, fd, numSlots, maxFunctions, nameSize)
+
+    def close(self):
+        self._buf.close()
+        os.close(self._fd)
+
+    def attach(self):
+        """
+        Records the duration of every span, i.e. every decorated or patched function, under its span name
+        """
+        spans.addListener(self)
+
+    def detach(self):
+        spans.removeListener(self)
+
+    def onExit(self, span):
+        self.record(span.name, span.end - span.begin)
+
+    def _slotOffset(self, slot):
+        return HEADER_SIZE + slot * self._slotSize
+
+    def _claim(self):
+        self._pid = os.getpid()
+        self._slot = None
+        self._offsets = dict()
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            for slot in xrange(self.numSlots):
+                offset = self._slotOffset(slot)
+                if _SLOT.unpack_from(self._buf, offset)[0] == 0:
+                    _SLOT.pack_into(self._buf, offset, self._pid, 0, 0)
+                    self._slot = slot
+                    return
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def _addEntry(self, name):
+        slotOffset = self._slotOffset(self._slot)
+        pid, numEntries, numDropped = _SLOT.unpack_from(self._buf, slotOffset)
+        if numEntries >= self.maxFunctions:
+            return None
+        offset = slotOffset + _SLOT.size + numEntries * self._entrySize
+        self._name.pack_into(self._buf, offset, name[:self.nameSize])
+        # publish the entry after its name is written
+        _SLOT.pack_into(self._buf, slotOffset, pid, numEntries + 1, numDropped)
+        self._offsets[name] = offset
+        return offset
+
+    def _drop(self):
+        self.numDropped += 1
+        if self._slot is not None:
+            slotOffset = self._slotOffset(self._slot)
+            pid, numEntries, numDropped = _SLOT.unpack_from(self._buf, slotOffset)
+            _SLOT.pack_into(self._buf, slotOffset, pid, numEntries, numDropped + 1)
+
+    def record(self, name, seconds):
+        """
+        Args:
+            name (str): the qualified name of the function
+            seconds (float): the duration of the call
+        """
+        ns = max(int(seconds * 1e9), 0)
+        buf = self._buf
+        with self._lock:
+            if self._pid != os.getpid():
+                self._claim()
+            if self._slot is None:
+                self.numDropped += 1
+                return
+            offset = self._offsets.get(name)
+            if offset is None:
+                offset = self._addEntry(name)
+                if offset is None:
+                    self._drop()
+                    return
+            offset += self.nameSize
+            count, total, lo, hi = _STATS.unpack_from(buf, offset)
+            _STATS.pack_into(buf, offset, count + 1, total + ns, min(lo, ns) if count else ns, max(hi, ns))
+            offset += _STATS.size + _BUCKET.size * min(ns.bit_length(), NUM_BUCKETS - 1)
+            _BUCKET.pack_into(buf, offset, _BUCKET.unpack_from(buf, offset)[0] + 1)
+
+    def read(self):
+        """
+        Merges the slots of all the processes
+
+        Returns:
+            dict: key: name, value: dict of count, total, min, max, mean (in seconds), buckets (a list of
+                NUM_BUCKETS counters, see the module docstring), numProcesses
+        """
+        buf = self._buf
+        merged = dict()
+        for slot in xrange(self.numSlots):
+            slotOffset = self._slotOffset(slot)
+            pid, numEntries, numDropped = _SLOT.unpack_from(buf, slotOffset)
+            if not pid:
+                continue
+            for i in xrange(min(numEntries, self.maxFunctions)):
+                offset = slotOffset + _SLOT.size + i * self._entrySize
+                name = self._name.unpack_from(buf, offset)[0].rstrip('\0')
+                count, total, lo, hi = _STATS.unpack_from(buf, offset + self.nameSize)
+                if not count:
+                    continue
+                buckets = _BUCKETS.unpack_from(buf, offset + self.nameSize + _STATS.size)
+                d = merged.get(name)
+                if d is None:
+                    merged[name] = d = dict(count=0, total=0, min=lo, max=hi, buckets=[0] * NUM_BUCKETS,
+                                            numProcesses=0)
+                d['count'] += count
+                d['total'] += total
+                d['min'] = min(d['min'], lo)
+                d['max'] = max(d['max'], hi)
+                d['numProcesses'] += 1
+                d['buckets'] = [a + b for a, b in zip(d['buckets'], buckets)]
+        for d in merged.itervalues():
+            d['mean'] = d['total'] / 1e9 / d['count']
+            d['total'] /= 1e9
+            d['min'] /= 1e9
+            d['max'] /= 1e9
+        return merged
+
+    def processes(self):
+        """
+        Returns:
+            list: (pid, number of functions, number of dropped records) of each claimed slot
+        """
+        slots = list()
+        for slot in xrange(self.numSlots):
+            pid, numEntries, numDropped = _SLOT.unpack_from(self._buf, self._slotOffset(slot))
+            if pid:
+                slots.append((pid, numEntries, numDropped))
+        return slots
+
+
+def percentile(d, q):
+    """
+    Args:
+        d (dict): the stats of one function, see SharedStats.read()
+        q (float): in [0, 100]
+
+    Returns:
+        float: an upper bound of the q-th percentile, in seconds (within a factor of 2)
+    """
+    rank = q / 100.0 * d['count']
+    n = 0
+    for i, c in enumerate(d['buckets']):
+        n += c
+        if c and n >= rank:
+            return min((1 << i) / 1e9, d['max'])
+    return d['max']
@@ -0,0 +1,153 @@
+"""
+Span tracking across the instrumented functions
+
+Every function decorated by frep.deco() or patched by frep.patch() opens a span while a listener is registered, e.g.
+
+    tree = callTree.CallTree()
+    spans.addListener(tree)
+    pipeline()
+    spans.removeListener(tree)
+
+The spans of a thread form a stack: the span of an instrumented function called (directly or indirectly) by another
+instrumented function has the latter's span as parent. Without any listener a call costs one extra function call.
+
+The span of a decorated function is named module.function; the span of a patched method is named module.Class.method.
+"""
+
+import threading
+import time
+
+
+# a tuple so that the callers iterate over it without holding a lock
+_listeners = tuple()
+_lock = threading.Lock()
+_local = threading.local()
+
+
+class Span(object):
+    """
+    Attributes:
+        name (str):
+        parent (Span): None for the outermost span of a thread
+        depth (int): 0 for the outermost span of a thread
+        threadId (int): the ident of the thread
+        begin (float): wall time
+        end (float): wall time; None while the span is open
+    """
+
+    __slots__ = ('name', 'parent', 'depth', 'threadId', 'begin', 'end')
+
+    def __init__(self, name, parent, threadId):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.threadId = threadId
+        self.begin = time.time()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.time()) - self.begin
+
+    def path(self):
+        """
+        Returns:
+            list: the names of the spans from the outermost one to this one
+        """
+        names = list()
+        span = self
+        while span is not None:
+            names.append(span.name)
+            span = span.parent
+        names.reverse()
+        return names
+
+
+class SpanListener(object):
+    """
+    The base class of the span listeners; a listener is called on the thread that opens and closes the span
+    """
+
+    def onEnter(self, span):
+        pass
+
+    def onExit(self, span):
+        pass
+
+
+def addListener(listener):
+    """
+    Args:
+        listener (SpanListener):
+    """
+    global _listeners
+    with _lock:
+        if listener not in _listeners:
+            _listeners = _listeners + (listener, )
+
+
+def removeListener(listener):
+    global _listeners
+    with _lock:
+        _listeners = tuple(l for l in _listeners if l is not listener)
+
+
+def isEnabled():
+    return bool(_listeners)
+
+
+def current():
+    """
+    Returns:
+        Span: the innermost open span of the calling thread, None if there is none
+    """
+    return getattr(_local, 'span', None)
+
+
+def enter(name):
+    """
+    Opens a span on the calling thread
+
+    Args:
+        name (str):
+
+    Returns:
+        Span:
+    """
+    span = Span(name, getattr(_local, 'span', None), threading.current_thread().ident)
+    _local.span = span
+    for listener in _listeners:
+        listener.onEnter(span)
+    return span
+
+
+def exit(span):
+    """
+    Closes the span opened by enter()
+
+    Args:
+        span (Span):
+    """
+    span.end = time.time()
+    _local.span = span.parent
+    for listener in _listeners:
+        listener.onExit(span)
+
+
+def call(name, f, args, kwargs):
+    """
+    Calls f within a span if any listener is registered
+
+    Args:
+        name (str): the name of the span
+        f (callable):
+        args (tuple):
+        kwargs (dict):
+    """
+    if not _listeners:
+        return f(*args, **kwargs)
+    span = enter(name)
+    try:
+        return f(*args, **kwargs)
+    finally:
+        exit(span)
@@ -0,0 +1,183 @@
+"""
+Samples the Python stack of one thread at a fixed rate and counts the distinct stacks
+
+Two ways to take the samples:
+
+thread (the default):
+    a watcher thread reads the thread's current frame from sys._current_frames(); it works for any thread and samples
+    the wall time (a thread waiting on I/O or a lock is sampled too)
+
+signal:
+    setitimer(ITIMER_PROF) delivers SIGPROF and the handler reads the interrupted frame; it only works for the main
+    thread (Python runs the signal handlers there) and samples the CPU time of the process; only one sampler can use
+    it at a time
+
+The stacks are cut at the entry frame, i.e. only the frames called (directly or not) by it are kept, and the frames of
+frep itself are skipped; the samples taken while a profiler enters or exits (e.g. while it stops the sampler) are
+dropped. A stack is kept as a tuple of code objects; rendering them is left to parse().
+"""
+
+import os
+import signal
+import sys
+import threading
+
+
+MIN_INTERVAL = 0.001
+
+_FREP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_signalLock = threading.Lock()
+_signalSampler = [None]
+_internal = dict()
+
+
+def _isInternal(code):
+    internal = _internal.get(code)
+    if internal is None:
+        internal = _internal[code] = os.path.dirname(os.path.abspath(code.co_filename)) == _FREP_DIR
+    return internal
+
+
+class StackSampler(object):
+    """
+    Attributes:
+        counts (dict): key: a tuple of code objects (the outermost first), value: the number of samples
+        numSamples (int): the number of samples taken
+    """
+
+    def __init__(self, threadId=None, entryFrame=None, interval=0.01, useSignal=False):
+        """
+
+        Args:
+            threadId (int): optional; the ident of the sampled thread, by default the calling thread
+            entryFrame (frame): optional; the frame to cut the stacks at; by default the stacks are not cut
+            interval (float): optional; in seconds; the minimum is MIN_INTERVAL
+            useSignal (bool): optional; see the module docstring; it falls back to the watcher thread if the sampled
+                thread is not the main thread or another sampler is using the signal
+        """
+        if interval < MIN_INTERVAL:
+            raise ValueError('Interval must be at least {} second(s), got {}'.format(MIN_INTERVAL, interval))
+        self.threadId = threadId if threadId is not None else threading.current_thread().ident
+        self.entryFrame = entryFrame
+        self.interval = interval
+        self.useSignal = useSignal
+        self.counts = dict()
+        self.numSamples = 0
+        self._stopEvent = threading.Event()
+        self._thread = None
+        self._oldHandler = None
+
+    def start(self):
+        if self.useSignal and self._claimSignal():
+            self._oldHandler = signal.signal(signal.SIGPROF, self._onSignal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+            return
+        self.useSignal = False
+        self._thread = threading.Thread(target=self._run, name='frep-stackSampler-{}'.format(self.threadId))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self.useSignal:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._oldHandler if self._oldHandler is not None else signal.SIG_DFL)
+            with _signalLock:
+                _signalSampler[0] = None
+            return
+        self._stopEvent.set()
+        self._thread.join()
+
+    def _claimSignal(self):
+        if not isinstance(threading.current_thread(), threading._MainThread):
+            return False
+        if self.threadId != threading.current_thread().ident:
+            return False
+        with _signalLock:
+            if _signalSampler[0] is not None:
+                return False
+            _signalSampler[0] = self
+        return True
+
+    def _onSignal(self, signum, frame):
+        self.record(frame)
+
+    def _run(self):
+        while not self._stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            if frame is None:
+                return
+            self.record(frame)
+
+    def record(self, frame):
+        """
+        Counts the stack that ends with the frame
+
+        Args:
+            frame (frame): the innermost frame
+        """
+        codes = list()
+        entryFrame = self.entryFrame
+        while frame is not None and frame is not entryFrame:
+            code = frame.f_code
+            if not _isInternal(code):
+                codes.append(code)
+            elif code.co_name in ('__enter__', '__exit__'):
+                return
+            frame = frame.f_back
+        if entryFrame is not None and frame is None:
+            # the sample is taken after the entry frame returns
+            return
+        codes.reverse()
+        key = tuple(codes)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.numSamples += 1
+
+
+def label(code):
+    return '{} ({}:{})'.format(code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+
+
+def folded(counts):
+    """
+    Renders the stacks in the folded-stack format, see CallTree.folded()
+
+    Args:
+        counts (dict): see StackSampler.counts
+
+    Returns:
+        list: the lines, in descending order of the number of samples
+    """
+    labels = dict()
+    lines = list()
+    for codes, n in sorted(counts.iteritems(), key=lambda kv: kv[1], reverse=True):
+        names = list()
+        for code in codes:
+            name = labels.get(code)
+            if name is None:
+                name = labels[code] = label(code)
+            names.append(name)
+        lines.append('{} {}'.format(';'.join(names) or '<entry>', n))
+    return lines
+
+
+def parse(counts, numSamples, interval, elapsed, ed=None):
+    """
+    Args:
+        counts (dict): see StackSampler.counts
+        numSamples (int):
+        interval (float): the sampling interval, in seconds
+        elapsed (float): the wall time of the call, in seconds
+        ed (ExceptionDescriptor):
+
+    Returns:
+        dict: key: stacks (folded-stack lines), numSamples, interval, time, error, traceback
+    """
+    result = dict()
+    result['stacks'] = folded(counts)
+    result['numSamples'] = numSamples
+    result['interval'] = interval
+    result['time'] = elapsed
+    result['error'] = ed.errorText if ed is not None else ''
+    result['traceback'] = ed.tbStrings if ed is not None else list()
+    return result
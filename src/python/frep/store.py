@@ -0,0 +1,423 @@
+"""
+A local SQLite store of the profiles: the messages of the profilers and the spans, indexed by function, host, pid and
+time, e.g.
+
+    s = store.Store('/var/tmp/frep.db')
+    frep.patch('corelib.publish', freeFuncs=['publish'], profiler=profilers.PidStatProfiler.create(
+        messenger=s.messenger('corelib.publish.publish')))
+    ...
+    for day, count, p99 in s.percentilePerDay('corelib.publish.publish', 99, days=30):
+        print day, count, p99
+
+Tables:
+
+calls:
+    one row per message or span: function, host, pid, time (the wall time it is recorded), duration (the time or
+    time-elapsed of the message, the duration of the span), error, source (the profiler name, or span); when several
+    profilers measure the same calls, only the messages of one of them have a duration (see add()), so that each call
+    is counted once; an ingested pidstat dump has none
+
+metrics:
+    the numeric top-level values of each message (perfStat.parse() counters, the resource deltas, ...), by call; the
+    time of a message that has no duration is one of them
+
+samples:
+    the process record (TID 0) of each pidstat sample (PidStatParser.parse()), by call: time, rss, vsz, the page
+    faults and the I/O rates
+
+aggregates:
+    the summaries of HistogramTimerProfiler: begin, end, count, numErrors, mean, min, max and the percentiles
+
+The database is in WAL mode, so readers (e.g. the query CLI) do not block the writer. The rows are buffered and
+written in one transaction per batchSize messages, at the latest at close(), which runs at interpreter exit (see
+exitHooks).
+
+Store.ingest() loads a directory of pidstat dumps: a pool of processes parses them and the calling process writes the
+rows, SQLite having one writer at a time.
+"""
+
+import fnmatch
+import math
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from frep import exitHooks
+from frep import spans
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    function TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    time REAL NOT NULL,
+    duration REAL,
+    error TEXT,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_function_time ON calls (function, time);
+CREATE INDEX IF NOT EXISTS calls_host_time ON calls (host, time);
+CREATE INDEX IF NOT EXISTS calls_pid ON calls (pid);
+CREATE INDEX IF NOT EXISTS calls_time ON calls (time);
+
+CREATE TABLE IF NOT EXISTS metrics (
+    callId INTEGER NOT NULL REFERENCES calls (id),
+    name TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS metrics_callId ON metrics (callId);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics (name);
+
+CREATE TABLE IF NOT EXISTS samples (
+    callId INTEGER NOT NULL REFERENCES calls (id),
+    function TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    time REAL NOT NULL,
+    rss INTEGER,
+    vsz INTEGER,
+    minflt REAL,
+    majflt REAL,
+    kbRead REAL,
+    kbWrite REAL
+);
+CREATE INDEX IF NOT EXISTS samples_function_time ON samples (function, time);
+CREATE INDEX IF NOT EXISTS samples_host_time ON samples (host, time);
+CREATE INDEX IF NOT EXISTS samples_pid ON samples (pid);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    function TEXT NOT NULL,
+    host TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    begin REAL NOT NULL,
+    end REAL NOT NULL,
+    count INTEGER,
+    numErrors INTEGER,
+    mean REAL,
+    min REAL,
+    max REAL,
+    p50 REAL,
+    p90 REAL,
+    p99 REAL,
+    p999 REAL
+);
+CREATE INDEX IF NOT EXISTS aggregates_function_begin ON aggregates (function, begin);
+CREATE INDEX IF NOT EXISTS aggregates_host_begin ON aggregates (host, begin);
+"""
+
+# samples column: the pidstat column
+SAMPLE_COLUMNS = (
+    ('rss', 'RSS'),
+    ('vsz', 'VSZ'),
+    ('minflt', 'minflt/s'),
+    ('majflt', 'majflt/s'),
+    ('kbRead', 'kB_rd/s'),
+    ('kbWrite', 'kB_wr/s'),
+)
+
+AGGREGATE_KEYS = ('begin', 'end', 'count', 'numErrors', 'mean', 'min', 'max', 'p50', 'p90', 'p99', 'p999')
+
+# the keys of a message that are not stored as metrics
+_NOT_METRICS = frozenset(('time', 'time-elapsed', 'pid'))
+
+_DAY = 86400.0
+
+
+def _processRecord(sample):
+    for record in sample[1:]:
+        if record.get('TID', 0) == 0:
+            return record
+    return None
+
+
+def _sampleRows(samples):
+    """
+    Returns:
+        list: (pid, time, rss, vsz, minflt, majflt, kbRead, kbWrite) of the process record of each sample
+    """
+    rows = list()
+    for sample in samples:
+        record = _processRecord(sample)
+        if record is None:
+            continue
+        rows.append((record.get('TGID'), record.get('Time')) + tuple(record.get(c) for k, c in SAMPLE_COLUMNS))
+    return rows
+
+
+class Store(spans.SpanListener):
+    """
+    Also a span listener: attach() records the duration of every span, i.e. every decorated or patched function,
+    under its span name
+
+    Attributes:
+        host (str): recorded with every row, by default the host name
+        numWritten (int): the number of messages and spans written so far
+    """
+
+    def __init__(self, filePath, host=None, batchSize=500):
+        """
+
+        Args:
+            filePath (str):
+            host (str): optional
+            batchSize (int): optional; the number of buffered messages that triggers a write
+        """
+        self.filePath = filePath
+        self.host = host if host is not None else socket.gethostname()
+        self.batchSize = batchSize
+        self.numWritten = 0
+        self._pending = list()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(filePath, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._closed = False
+        exitHooks.register(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def messenger(self, function, source=None, duration=True):
+        """
+        Args:
+            function (str): the name of the function the profiler measures
+            source (str): optional; e.g. the profiler name
+            duration (bool): optional; see add()
+
+        Returns:
+            callable: a messenger that stores the dicts (or lists of dicts, see AsyncMessenger's batched) it takes
+        """
+        def _(d):
+            for m in (d if isinstance(d, list) else [d]):
+                self.add(function, m, source=source, duration=duration)
+        return _
+
+    def attach(self):
+        spans.addListener(self)
+
+    def detach(self):
+        spans.removeListener(self)
+
+    def onExit(self, span):
+        self.add(span.name, dict(time=span.end - span.begin), source='span', t=span.end)
+
+    def add(self, function, d, source=None, pid=None, t=None, duration=True):
+        """
+        Buffers a message; it is written with the next batch
+
+        Args:
+            function (str):
+            d (dict): the message of a profiler
+            source (str): optional
+            pid (int): optional; by default the calling process
+            t (float): optional; by default now
+            duration (bool): optional; whether the time (or time-elapsed) of the message is the duration of the call;
+                False for all but one of the profilers that measure the same calls, e.g. of a CompositeProfiler
+        """
+        if not d:
+            return
+        item = (function, d, source, pid if pid is not None else os.getpid(), t if t is not None else time.time(),
+                duration)
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append(item)
+            if len(self._pending) < self.batchSize:
+                return
+            pending = self._pending
+            self._pending = list()
+            self._write(pending)
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = list()
+            self._write(pending)
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._write(self._pending)
+            self._pending = list()
+            self._closed = True
+            self._db.close()
+
+    def _write(self, pending):
+        if not pending:
+            return
+        with self._db:
+            cursor = self._db.cursor()
+            for function, d, source, pid, t, isDuration in pending:
+                if 'p99' in d and 'begin' in d:
+                    # a HistogramTimerProfiler summary
+                    cursor.execute('INSERT INTO aggregates VALUES (?, ?, ?{})'.format(', ?' * len(AGGREGATE_KEYS)),
+                                   (function, self.host, pid) + tuple(d.get(k) for k in AGGREGATE_KEYS))
+                    continue
+                duration = d.get('time', d.get('time-elapsed')) if isDuration else None
+                cursor.execute('INSERT INTO calls (function, host, pid, time, duration, error, source) '
+                               'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                               (function, self.host, pid, t, duration, d.get('error') or None, source))
+                callId = cursor.lastrowid
+                metrics = [(callId, k, v) for k, v in d.iteritems()
+                           if (k not in _NOT_METRICS or not isDuration and k != 'pid')
+                           and isinstance(v, (int, long, float)) and not isinstance(v, bool)]
+                if metrics:
+                    cursor.executemany('INSERT INTO metrics VALUES (?, ?, ?)', metrics)
+                rows = _sampleRows(d.get('samples') or list())
+                if rows:
+                    cursor.executemany('INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                       [(callId, function, self.host, row[0] if row[0] is not None else pid) + row[1:]
+                                        for row in rows])
+        self.numWritten += len(pending)
+
+    def query(self, sql, args=()):
+        """
+        Runs a read-only query on the stored rows (the buffered ones are written first)
+
+        Returns:
+            list: the rows
+        """
+        self.flush()
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def functions(self):
+        """
+        Returns:
+            list: the names of the functions that have calls, samples or aggregates
+        """
+        rows = self.query('SELECT function FROM calls UNION SELECT function FROM samples '
+                          'UNION SELECT function FROM aggregates ORDER BY function')
+        return [r[0] for r in rows]
+
+    def percentilePerDay(self, function, q, days=30, host=None, now=None, source=None):
+        """
+        E.g. the p99 of publish per day for the last 30 days
+
+        Args:
+            function (str):
+            q (float): in [0, 100]
+            days (int): optional; the number of days back from now
+            host (str): optional; all the hosts by default
+            now (float): optional; by default time.time()
+            source (str): optional; e.g. span if the store is attached as well as used as the messenger of a profiler,
+                by default the calls of every source that have a duration
+
+        Returns:
+            list: (day (UTC, YYYY-MM-DD), the number of calls, the q-th percentile of their durations in seconds), in
+                chronological order; the calls that raise are left out
+        """
+        now = now if now is not None else time.time()
+        sql = ("SELECT date(time, 'unixepoch') AS day, duration FROM calls "
+               "WHERE function = ? AND time >= ? AND duration IS NOT NULL AND error IS NULL")
+        args = [function, now - days * _DAY]
+        if host is not None:
+            sql += ' AND host = ?'
+            args.append(host)
+        if source is not None:
+            sql += ' AND source = ?'
+            args.append(source)
+        byDay = dict()
+        for day, duration in self.query(sql + ' ORDER BY day, duration', args):
+            byDay.setdefault(day, list()).append(duration)
+        result = list()
+        for day in sorted(byDay):
+            durations = byDay[day]
+            # nearest rank
+            rank = max(int(math.ceil(q * len(durations) / 100.0)), 1)
+            result.append((day, len(durations), durations[rank - 1]))
+        return result
+
+    def maxPerFunction(self, column='rss', since=None):
+        """
+        E.g. the max RSS per function
+
+        Args:
+            column (str): optional; a column of the samples table, see SAMPLE_COLUMNS
+            since (float): optional; the minimum sample time
+
+        Returns:
+            list: (function, max, number of samples), the highest first
+        """
+        if column not in [k for k, c in SAMPLE_COLUMNS]:
+            raise ValueError('Unknown column {}, expected one of {}'.format(
+                column, ', '.join(k for k, c in SAMPLE_COLUMNS)))
+        sql = 'SELECT function, MAX({0}), COUNT({0}) FROM samples'.format(column)
+        args = list()
+        if since is not None:
+            sql += ' WHERE time >= ?'
+            args.append(since)
+        return self.query(sql + ' GROUP BY function ORDER BY 2 DESC', args)
+
+    def ingest(self, dirPath, pattern='*', function=None, processes=None):
+        """
+        Loads the pidstat dumps of a directory, each as one call whose samples are the dump's; a pool of processes
+        parses the dumps, this process writes the rows
+
+        Args:
+            dirPath (str):
+            pattern (str): optional; a glob pattern of the file names
+            function (str): optional; by default the name of each file without its extension
+            processes (int): optional; the size of the pool, by default the number of CPUs
+
+        Returns:
+            tuple: the number of dumps loaded, the paths of the dumps that fail to parse
+        """
+        filePaths = sorted(os.path.join(dirPath, name) for name in os.listdir(dirPath)
+                           if fnmatch.fnmatch(name, pattern))
+        filePaths = [p for p in filePaths if os.path.isfile(p)]
+        numLoaded = 0
+        failed = list()
+        pool = multiprocessing.Pool(processes)
+        try:
+            for filePath, rows in pool.imap_unordered(_parseDump, filePaths):
+                if rows is None:
+                    failed.append(filePath)
+                    continue
+                name = function if function is not None else os.path.splitext(os.path.basename(filePath))[0]
+                self._insertDump(name, filePath, rows)
+                numLoaded += 1
+        finally:
+            pool.close()
+            pool.join()
+        return numLoaded, failed
+
+    def _insertDump(self, function, filePath, rows):
+        # a dump without -t has no TGID column
+        pid = rows[0][0] if rows and rows[0][0] is not None else 0
+        begin = rows[0][1] if rows and rows[0][1] is not None else os.path.getmtime(filePath)
+        with self._lock:
+            with self._db:
+                # the dump may span many calls, or none: it has no duration
+                cursor = self._db.execute('INSERT INTO calls (function, host, pid, time, duration, error, source) '
+                                          'VALUES (?, ?, ?, ?, NULL, NULL, ?)',
+                                          (function, self.host, pid, begin, 'pidstat'))
+                callId = cursor.lastrowid
+                self._db.executemany('INSERT INTO samples VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                     [(callId, function, self.host, row[0] if row[0] is not None else pid) + row[1:]
+                                      for row in rows if row[1] is not None])
+            self.numWritten += 1
+
+
+def _parseDump(filePath):
+    # in a worker process
+    from frep import profilers
+
+    try:
+        result = profilers.PidStatParser.create(filePath)
+    except Exception:
+        # raised in the parent by imap_unordered(), it would abort the whole ingest
+        return filePath, None
+    if result is None:
+        return filePath, None
+    return filePath, _sampleRows(result['samples'])
@@ -0,0 +1,36 @@
+
+import threading
+import time
+import unittest
+
+import frep
+from frep import profilers
+
+
+class TestPerfSessionProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.d = None
+        self.delivered = threading.Event()
+        p = profilers.PerfSessionProfiler.create(messenger=self.sendMessage)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            time.sleep(0.05)
+
+        self.SUP = SUP
+
+    def sendMessage(self, d):
+        # called on perf's reader thread once the interval that carries the tail of the call is printed
+        self.d = d
+        self.delivered.set()
+
+    def test_runSUP_expectProfilingData(self):
+        self.SUP()
+        self.assertTrue(self.delivered.wait(5.0))
+        self.assertTrue(self.d)
+        self.assertTrue('CPU-Utilization' in self.d)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,253 @@
+"""
+Measures the overhead of frep: the wrappers (deco, patch), the enter/exit of the profilers and the throughput of the
+parsers on scaled-up copies of the blender_* fixtures
+
+    python benchmark.py run [--output baseline.json] [--scale 0.1] [--only deco_DefaultProfiler,parse_perfStat]
+    python benchmark.py compare baseline.json [--threshold 0.25] [--scale 0.1] [--only ...]
+
+Every result is a duration per operation (a call, a parsed sample, a parsed line) in seconds, the best of --repeat
+runs; compare re-runs the suite and exits with 1 if any result is slower than the baseline by more than the
+threshold (a fraction). The benchmarks that need an executable that is not installed (pidstat, perf) are skipped.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from distutils.spawn import find_executable
+
+import frep
+from frep import profilers
+from frep import sampling
+from frep.parsers import perfStat
+from frep.parsers import pidStat
+
+import pidStatParser
+
+
+BENCHMARKS = list()
+
+
+def benchmark(numOps, requires=None):
+    """
+    Registers a benchmark; the function takes the number of operations and returns the elapsed time
+
+    Args:
+        numOps (int): the number of operations at scale 1
+        requires (str): optional; the executable the benchmark needs
+    """
+    def _(f):
+        BENCHMARKS.append((f.__name__, f, numOps, requires))
+        return f
+    return _
+
+
+def SUP():
+    pass
+
+
+def timeCalls(f, numCalls):
+    s = time.time()
+    for i in xrange(numCalls):
+        f()
+    return time.time() - s
+
+
+@benchmark(1000000)
+def call_baseline(numOps):
+    return timeCalls(SUP, numOps)
+
+
+@benchmark(1000000)
+def deco_DefaultProfiler(numOps):
+    return timeCalls(frep.deco(profiler=profilers.DefaultProfiler())(SUP), numOps)
+
+
+@benchmark(1000000)
+def deco_SimpleTimerProfiler(numOps):
+    return timeCalls(frep.deco(profiler=profilers.SimpleTimerProfiler())(SUP), numOps)
+
+
+@benchmark(1000000)
+def deco_HistogramTimerProfiler(numOps):
+    return timeCalls(frep.deco(profiler=profilers.HistogramTimerProfiler(interval=3600.0))(SUP), numOps)
+
+
+@benchmark(1000000)
+def deco_sampledEvery100(numOps):
+    return timeCalls(frep.deco(profiler=profilers.SimpleTimerProfiler(), sampler=sampling.EveryN(100))(SUP), numOps)
+
+
+@benchmark(1000000)
+def patch_DefaultProfiler(numOps):
+    m = sys.modules[__name__]
+    frep.patch(__name__, freeFuncs=['SUP'], profiler=profilers.DefaultProfiler())
+    try:
+        return timeCalls(m.SUP, numOps)
+    finally:
+        frep.unpatchAll()
+
+
+@benchmark(1000000)
+def patchMatching_DefaultProfiler(numOps):
+    m = sys.modules[__name__]
+    patches = frep.patchMatching(__name__, ['SUP'], profiler=profilers.DefaultProfiler())
+    try:
+        return timeCalls(m.SUP, numOps)
+    finally:
+        patches.restore()
+
+
+@benchmark(20, requires='pidstat')
+def deco_PidStatProfiler(numOps):
+    fd, filePath = tempfile.mkstemp()
+    os.close(fd)
+    p = profilers.PidStatProfiler(filePath=filePath)
+    try:
+        return timeCalls(frep.deco(profiler=p)(SUP), numOps)
+    finally:
+        os.remove(filePath)
+
+
+@benchmark(20, requires='perf')
+def deco_PerfStatProfiler(numOps):
+    return timeCalls(frep.deco(profiler=profilers.PerfStatProfiler())(SUP), numOps)
+
+
+def _scaledPidStat(numOps):
+    return pidStatParser.scaleDump(max(numOps / 20, 1))
+
+
+def _countRecords(filePath):
+    result = profilers.PidStatParser.create(filePath)
+    return sum(len(sample) - 1 for sample in result['samples'])
+
+
+@benchmark(72000)
+def parse_PidStatParser(numOps):
+    filePath = _scaledPidStat(numOps)
+    try:
+        s = time.time()
+        profilers.PidStatParser.create(filePath)
+        t = time.time() - s
+        return t * numOps / _countRecords(filePath)
+    finally:
+        os.remove(filePath)
+
+
+@benchmark(72000)
+def parse_PidStatColumnarParser(numOps):
+    filePath = _scaledPidStat(numOps)
+    try:
+        s = time.time()
+        pidStat.parse(filePath)
+        t = time.time() - s
+        return t * numOps / _countRecords(filePath)
+    finally:
+        os.remove(filePath)
+
+
+@benchmark(72000)
+def parse_PidStatParserReduced(numOps):
+    filePath = _scaledPidStat(numOps)
+    try:
+        s = time.time()
+        profilers.PidStatParser.createReduced(filePath)
+        t = time.time() - s
+        return t * numOps / _countRecords(filePath)
+    finally:
+        os.remove(filePath)
+
+
+@benchmark(10000)
+def parse_perfStat(numOps):
+    with open(pidStatParser.fixturePath('blender_perfstat_dump.txt'), 'r') as fp:
+        text = fp.read()
+    s = time.time()
+    for i in xrange(numOps):
+        perfStat.parse(text)
+    return time.time() - s
+
+
+@benchmark(1000000)
+def parse_perfStatIntervalLine(numOps):
+    with open(pidStatParser.fixturePath('blender_perfstat_interval_dump.txt'), 'r') as fp:
+        lines = fp.readlines()
+    lines = (lines * (numOps / len(lines) + 1))[:numOps]
+    s = time.time()
+    for line in lines:
+        perfStat.parseIntervalLine(line)
+    return time.time() - s
+
+
+def run(scale=1.0, repeat=3, names=None, log=sys.stderr):
+    """
+    Returns:
+        dict: key: benchmark name, value: seconds per operation, None if skipped
+    """
+    results = dict()
+    for name, f, numOps, requires in BENCHMARKS:
+        if names and name not in names:
+            continue
+        if requires and not find_executable(requires):
+            log.write('{:<32} skipped ({} is not installed)\n'.format(name, requires))
+            results[name] = None
+            continue
+        n = max(int(numOps * scale), 1)
+        best = min(f(n) for i in xrange(repeat)) / n
+        log.write('{:<32} {:>12.3f} us/op\n'.format(name, best * 1e6))
+        results[name] = best
+    return results
+
+
+def compare(baseline, results, threshold):
+    """
+    Returns:
+        list: (name, baseline, result, ratio) of the regressions
+    """
+    regressions = list()
+    for name, result in sorted(results.iteritems()):
+        old = baseline.get(name)
+        if old is None or result is None:
+            continue
+        ratio = result / old
+        if ratio > 1.0 + threshold:
+            regressions.append((name, old, result, ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subParsers = parser.add_subparsers(dest='command')
+    runParser = subParsers.add_parser('run')
+    runParser.add_argument('--output', help='write the results to this JSON file')
+    compareParser = subParsers.add_parser('compare')
+    compareParser.add_argument('baseline', help='a JSON file written by run')
+    compareParser.add_argument('--threshold', type=float, default=0.25)
+    for p in (runParser, compareParser):
+        p.add_argument('--scale', type=float, default=1.0, help='multiplies the number of operations')
+        p.add_argument('--repeat', type=int, default=3)
+        p.add_argument('--only', help='comma-separated names of the benchmarks to run, all by default')
+    args = parser.parse_args(argv)
+
+    names = args.only.split(',') if args.only else None
+    results = run(scale=args.scale, repeat=args.repeat, names=names)
+    if args.command == 'run':
+        if args.output:
+            with open(args.output, 'w') as fp:
+                json.dump(dict(results=results, python=sys.version.split()[0], time=time.time()), fp, indent=2,
+                          sort_keys=True)
+        return 0
+    with open(args.baseline, 'r') as fp:
+        baseline = json.load(fp)['results']
+    regressions = compare(baseline, results, args.threshold)
+    for name, old, new, ratio in regressions:
+        sys.stderr.write('REGRESSION {}: {:.3f} us/op -> {:.3f} us/op ({:+.0%})\n'.format(
+            name, old * 1e6, new * 1e6, ratio - 1.0))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+
+import imp
+import sys
+import time
+
+import frep
+
+
+class NullProfiler(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+def createModule(numClasses, numMethods):
+    """
+    Creates a module of numClasses classes of numMethods methods each, plus as many free functions as classes
+    """
+    m = imp.new_module('bulk__')
+    lines = list()
+    for i in xrange(numClasses):
+        lines.append('def func{}(x):\n    return x\n'.format(i))
+        lines.append('class Class{}(object):\n'.format(i))
+        for j in xrange(numMethods):
+            lines.append('    def meth{}(self, x):\n        return x\n'.format(j))
+    m.__dict__['__name__'] = 'bulk__'
+    exec '\n'.join(lines) in m.__dict__
+    sys.modules['bulk__'] = m
+    return m
+
+
+def perCall(f, numCalls):
+    s = time.time()
+    for i in xrange(numCalls):
+        f(i)
+    return (time.time() - s) / numCalls
+
+
+def run(numClasses=500, numMethods=10, numCalls=100000):
+    m = createModule(numClasses, numMethods)
+    o = m.Class0()
+    baseline = perCall(o.meth0, numCalls)
+    s = time.time()
+    patches = frep.patchMatching('bulk__', ['*'], profiler=NullProfiler())
+    patchTime = time.time() - s
+    numPatched = len(patches)
+    o = m.Class0()
+    patched = perCall(o.meth0, numCalls)
+    s = time.time()
+    patches.restore()
+    restoreTime = time.time() - s
+    print 'callables: {}'.format(numPatched)
+    print 'patch: {:.3f}s, restore: {:.3f}s'.format(patchTime, restoreTime)
+    print 'per call: {:.2f}us -> {:.2f}us'.format(baseline * 1e6, patched * 1e6)
+
+
+if __name__ == '__main__':
+    run(*[int(_) for _ in sys.argv[1:]])
@@ -0,0 +1,78 @@
+
+import os
+import sys
+import tempfile
+import time
+
+from frep import profilers
+from frep.parsers import pidStat
+
+
+def fixturePath(fileName):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'unit', 'testdata', fileName)
+
+
+def scaleDump(numSamples):
+    """
+    Repeats the samples of blender_pidstat_dump.txt until there are numSamples of them, i.e. a one hour dump at 1 second
+    interval has 3600 samples
+    """
+    with open(fixturePath('blender_pidstat_dump.txt'), 'r') as fp:
+        lines = fp.readlines()
+    begin = [i for i, l in enumerate(lines) if l.startswith('#')][0]
+    end = [i for i, l in enumerate(lines) if l.startswith('</pidstat>')][0]
+    block = lines[begin:end]
+    fd, filePath = tempfile.mkstemp()
+    with os.fdopen(fd, 'w') as fp:
+        fp.writelines(lines[:begin])
+        numBlockSamples = len([l for l in block if l.startswith('#')])
+        for i in xrange(numSamples / numBlockSamples + 1):
+            fp.writelines(block)
+        fp.writelines(lines[end:])
+    return filePath
+
+
+def sizeOf(o, seen=None):
+    seen = seen if seen is not None else set()
+    if id(o) in seen:
+        return 0
+    seen.add(id(o))
+    size = sys.getsizeof(o)
+    if isinstance(o, dict):
+        size += sum(sizeOf(k, seen) + sizeOf(v, seen) for k, v in o.iteritems())
+    elif isinstance(o, (list, tuple)):
+        size += sum(sizeOf(v, seen) for v in o)
+    return size
+
+
+def measure(f, *args):
+    """
+    Returns the best of three runs
+    """
+    best = None
+    for i in xrange(3):
+        s = time.time()
+        result = f(*args)
+        t = time.time() - s
+        best = t if best is None else min(best, t)
+    return best, result
+
+
+def run(numSamples=3600):
+    filePath = scaleDump(numSamples)
+    try:
+        rowTime, rowResult = measure(profilers.PidStatParser.create, filePath)
+        columnarTime, columnarResult = measure(pidStat.parse, filePath)
+    finally:
+        os.remove(filePath)
+    table = columnarResult['table']
+    rowSize = sizeOf(rowResult['samples'])
+    columnarSize = sizeOf(table.data) + sizeOf(table.sampleOffsets)
+    print 'rows: {} (numpy: {})'.format(len(table), pidStat.numpy is not None)
+    print 'PidStatParser:         {:.3f}s {:.1f}MB'.format(rowTime, rowSize / 1e6)
+    print 'PidStatColumnarParser: {:.3f}s {:.1f}MB'.format(columnarTime, columnarSize / 1e6)
+    print 'speedup: {:.1f}x, memory reduction: {:.1f}x'.format(rowTime / columnarTime, float(rowSize) / columnarSize)
+
+
+if __name__ == '__main__':
+    run(*[int(_) for _ in sys.argv[1:]])
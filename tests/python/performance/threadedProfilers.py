@@ -0,0 +1,54 @@
+
+import sys
+import threading
+import time
+
+from frep import deco
+from frep import profilers
+
+
+def stress(profiler, numThreads=32, numCalls=1000):
+    """
+    Runs a decorated function numCalls times in each of numThreads threads, every call recursing once, and checks that
+    every call is reported with a sane duration
+
+    Returns:
+        tuple: wall time, the number of reports, the number of bad reports
+    """
+    reports = list()
+    lock = threading.Lock()
+
+    def messenger(d):
+        with lock:
+            reports.append(d)
+
+    profiler.messenger = messenger
+
+    @deco(profiler=profiler)
+    def SUP(depth):
+        if depth:
+            SUP(depth - 1)
+
+    def worker():
+        for i in xrange(numCalls):
+            SUP(1)
+
+    threads = [threading.Thread(target=worker) for i in xrange(numThreads)]
+    s = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wallTime = time.time() - s
+    numBad = len([d for d in reports if not 0 <= d['time'] <= wallTime])
+    return wallTime, len(reports), numBad
+
+
+def run(numThreads=32, numCalls=1000):
+    wallTime, numReports, numBad = stress(profilers.SimpleTimerProfiler(), numThreads, numCalls)
+    print 'threads: {}, calls: {}'.format(numThreads, numThreads * numCalls * 2)
+    print 'SimpleTimerProfiler: {:.3f}s, reports: {}, bad reports: {}'.format(wallTime, numReports, numBad)
+
+
+if __name__ == '__main__':
+    run(*[int(_) for _ in sys.argv[1:]])
@@ -0,0 +1,57 @@
+import os
+from os.path import join
+
+
+class Graph(object):
+
+    def __init__(self):
+        self.nodes = list()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def addNode(self, node):
+        self.nodes.append(node)
+        return node
+
+    def addEdge(self, a, b):
+        return a, b
+
+    def removeNode(self, node):
+        self.nodes.remove(node)
+
+    @staticmethod
+    def create():
+        return Graph()
+
+    @classmethod
+    def createFrom(cls, nodes):
+        g = cls()
+        for n in nodes:
+            g.addNode(n)
+        return g
+
+    @property
+    def size(self):
+        return len(self.nodes)
+
+    getcwd = staticmethod(os.getcwd)
+
+    class Node(object):
+
+        def connect(self, other):
+            return other
+
+
+class OldStyle:
+
+    def run(self):
+        return 'run'
+
+
+def publish(x):
+    return x
+
+
+def publish_all(xs):
+    return [publish(x) for x in xs]
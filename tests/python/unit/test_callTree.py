@@ -0,0 +1,129 @@
+
+import threading
+import time
+import unittest
+
+import frep
+from frep import callTree
+from frep import spans
+
+
+@frep.deco()
+def leaf():
+    time.sleep(0.01)
+
+
+@frep.deco()
+def middle():
+    leaf()
+    leaf()
+    time.sleep(0.01)
+
+
+@frep.deco()
+def root():
+    middle()
+    leaf()
+
+
+@frep.deco()
+def recurse(depth):
+    if depth:
+        recurse(depth - 1)
+
+
+def name(f):
+    return '{}.{}'.format(__name__, f)
+
+
+class TestSpans(unittest.TestCase):
+
+    def test_noListener_expectNoSpan(self):
+        observed = list()
+
+        @frep.deco()
+        def SUP():
+            observed.append(spans.current())
+
+        SUP()
+        self.assertEqual([None], observed)
+
+    def test_expectParentLinked(self):
+        observed = list()
+
+        class Listener(spans.SpanListener):
+            def onExit(self, span):
+                observed.append(span.path())
+
+        listener = Listener()
+        spans.addListener(listener)
+        try:
+            middle()
+        finally:
+            spans.removeListener(listener)
+        self.assertEqual([name('middle'), name('leaf')], observed[0])
+        self.assertEqual([name('middle')], observed[-1])
+
+
+class TestCallTree(unittest.TestCase):
+
+    def test_expectCountsPerPath(self):
+        with callTree.CallTree() as tree:
+            root()
+        self.assertEqual(1, tree.counts[tree.find([name('root')])])
+        self.assertEqual(2, tree.counts[tree.find([name('root'), name('middle'), name('leaf')])])
+        self.assertEqual(1, tree.counts[tree.find([name('root'), name('leaf')])])
+        self.assertEqual(4, len(tree))
+
+    def test_expectSelfTimeExcludesCallees(self):
+        with callTree.CallTree() as tree:
+            root()
+        node = tree.find([name('root'), name('middle')])
+        self.assertTrue(tree.inclusive[node] >= 0.03)
+        self.assertTrue(0.01 <= tree.selfTime(node) < 0.02 + 0.05)
+        self.assertTrue(tree.selfTime(tree.find([name('root')])) < 0.01)
+
+    def test_recursion_expectInclusiveCountedOnce(self):
+        with callTree.CallTree() as tree:
+            recurse(3)
+        d = tree.byName()[name('recurse')]
+        self.assertEqual(4, d['count'])
+        self.assertEqual(tree.inclusive[tree.find([name('recurse')])], d['inclusive'])
+
+    def test_threads_expectSeparateStacks(self):
+        with callTree.CallTree() as tree:
+            threads = [threading.Thread(target=root) for i in xrange(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(4, len(tree))
+        self.assertEqual(4, tree.counts[tree.find([name('root')])])
+
+    def test_folded_expectOneLinePerPath(self):
+        with callTree.CallTree() as tree:
+            root()
+        lines = tree.folded()
+        self.assertTrue(any(l.startswith(';'.join([name('root'), name('middle'), name('leaf')]) + ' ') for l in lines))
+
+    def test_report_expectSortedBySelfTime(self):
+        with callTree.CallTree() as tree:
+            root()
+        rows = tree.report()
+        self.assertEqual(sorted([d['self'] for d in rows], reverse=True), [d['self'] for d in rows])
+
+    def test_patchedMethod_expectQualifiedName(self):
+        import sut__
+        frep.patch('sut__', freeFuncs=['sut'], methods=['SUT.meth'])
+        try:
+            with callTree.CallTree() as tree:
+                sut__.SUT().meth(1)
+                sut__.sut(1)
+        finally:
+            frep.unpatchAll()
+        self.assertTrue(tree.find(['sut__.SUT.meth']))
+        self.assertTrue(tree.find(['sut__.sut']))
+
+
+if __name__ == '__main__':
+    unittest.main()
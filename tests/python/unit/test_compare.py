@@ -0,0 +1,132 @@
+import StringIO
+import json
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+from frep import __main__
+from frep import compare
+from frep import profilers
+
+
+def fixturePath(fileName):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata', fileName)
+
+
+def latencies(n, scale, seed):
+    r = random.Random(seed)
+    return [scale * r.lognormvariate(0.0, 0.5) for i in xrange(n)]
+
+
+class TestMannWhitney(unittest.TestCase):
+
+    def test_separated_expectFullEffect(self):
+        u, p, effect = compare.mannWhitney([1.0, 2.0, 3.0, 4.0], [5.0, 6.0, 7.0, 8.0])
+        self.assertEqual(16.0, u)
+        self.assertEqual(1.0, effect)
+        # the exact p-value is 0.029; the normal approximation with continuity correction gives 0.030
+        self.assertAlmostEqual(0.0304, p, places=3)
+
+    def test_ties_expectAverageRanks(self):
+        u, p, effect = compare.mannWhitney([1.0, 2.0, 2.0], [2.0, 3.0])
+        # pairs where b > a: (2, 1) (3, 1) (3, 2) (3, 2), ties (2, 2) (2, 2) count half
+        self.assertEqual(5.0, u)
+        self.assertAlmostEqual(2.0 * 5.0 / 6.0 - 1.0, effect)
+
+    def test_identical_expectNoDifference(self):
+        u, p, effect = compare.mannWhitney([1.0] * 10, [1.0] * 10)
+        self.assertEqual(1.0, p)
+        self.assertEqual(0.0, effect)
+
+    def test_withoutNumpy_expectSameResult(self):
+        a = latencies(200, 1.0, 1) + [1.0] * 20
+        b = latencies(300, 1.1, 2) + [1.0] * 20
+        expected = compare.mannWhitney(a, b)
+        numpy = compare.numpy
+        compare.numpy = None
+        try:
+            actual = compare.mannWhitney(a, b)
+        finally:
+            compare.numpy = numpy
+        for e, v in zip(expected, actual):
+            self.assertAlmostEqual(e, v)
+
+
+class TestCompareRuns(unittest.TestCase):
+
+    def setUp(self):
+        self.filePaths = list()
+
+    def tearDown(self):
+        for filePath in self.filePaths:
+            os.remove(filePath)
+
+    def writeRun(self, times):
+        fd, filePath = tempfile.mkstemp()
+        os.close(fd)
+        self.filePaths.append(filePath)
+        w = compare.RunWriter(filePath)
+        for name, values in times.iteritems():
+            m = w.messenger(name)
+            for t in values:
+                m(dict(time=t, error='', traceback=list()))
+        m(dict(time=1000.0, error='ValueError', traceback=list()))
+        w.close()
+        return filePath
+
+    def test_load_expectTimesPerFunction(self):
+        run = compare.load(self.writeRun({'m.f': [1.0, 2.0], 'm.g': [3.0]}))
+        self.assertEqual([1.0, 2.0], list(run['m.f']['time']))
+        self.assertEqual([3.0], list(run['m.g']['time']))
+        self.assertEqual(1, sum(m['numErrors'] for m in run.itervalues()))
+
+    def test_load_pidStatSamples_expectProcessColumns(self):
+        d = profilers.PidStatParser.create(fixturePath('blender_pidstat_dump.txt'))
+        d['name'] = 'm.f'
+        fd, filePath = tempfile.mkstemp()
+        os.close(fd)
+        self.filePaths.append(filePath)
+        with open(filePath, 'w') as fp:
+            json.dump([d], fp)
+        run = compare.load(filePath)
+        self.assertEqual(len(d['samples']), len(run['m.f']['RSS']))
+        self.assertEqual(d['samples'][0][1]['RSS'], run['m.f']['RSS'][0])
+        self.assertNotIn('TID', run['m.f'])
+
+    def test_shiftedLatencies_expectRegression(self):
+        baseline = compare.load(self.writeRun({'m.slow': latencies(2000, 1.0, 1), 'm.same': latencies(2000, 1.0, 2),
+                                               'm.fast': latencies(2000, 1.0, 3)}))
+        candidate = compare.load(self.writeRun({'m.slow': latencies(2000, 1.2, 4), 'm.same': latencies(2000, 1.0, 5),
+                                                'm.fast': latencies(2000, 0.7, 6)}))
+        results = compare.compareRuns(baseline, candidate)
+        verdicts = dict((r['name'], r['verdict']) for r in results)
+        self.assertEqual({'m.slow': 'regression', 'm.same': '', 'm.fast': 'improvement'}, verdicts)
+        self.assertEqual('m.slow', results[0]['name'])
+        self.assertAlmostEqual(0.2, results[0]['change'], delta=0.05)
+
+    @unittest.skipIf(compare.numpy is None, 'NumPy is not installed')
+    def test_bootstrap_expectIntervalAroundChange(self):
+        baseline = compare.load(self.writeRun({'m.f': latencies(5000, 1.0, 1)}))
+        candidate = compare.load(self.writeRun({'m.f': latencies(5000, 1.3, 2)}))
+        r = compare.compareRuns(baseline, candidate, method=compare.BOOTSTRAP, numResamples=200)[0]
+        self.assertEqual('regression', r['verdict'])
+        self.assertTrue(r['low'] < r['change'] < r['high'])
+        self.assertTrue(r['low'] > 0.0)
+
+    def test_main_expectExitCodeOnRegression(self):
+        baseline = self.writeRun({'m.f': latencies(500, 1.0, 1)})
+        candidate = self.writeRun({'m.f': latencies(500, 1.5, 2)})
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.assertEqual(1, __main__.main(['compare', baseline, candidate]))
+            self.assertEqual(0, __main__.main(['compare', candidate, baseline]))
+            self.assertIn('m.f', sys.stdout.getvalue())
+        finally:
+            sys.stdout = stdout
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import gc
+import unittest
+import weakref
+
+from frep import exitHooks
+
+
+class Closable(object):
+
+    def __init__(self, log, name):
+        self.log = log
+        self.name = name
+
+    def close(self):
+        self.log.append(('close', self.name))
+
+    def flush(self):
+        self.log.append(('flush', self.name))
+
+
+class TestExitHooks(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = dict(exitHooks._entries)
+        exitHooks._entries.clear()
+
+    def tearDown(self):
+        exitHooks._entries.update(self.entries)
+
+    def test_runAll_expectMostRecentFirst(self):
+        log = list()
+        a = Closable(log, 'a')
+        b = Closable(log, 'b')
+        exitHooks.register(a)
+        exitHooks.register(b, 'flush')
+        exitHooks.runAll()
+        exitHooks.runAll()
+        self.assertEqual([('flush', 'b'), ('close', 'a')], log)
+
+    def test_register_expectNotKeptAlive(self):
+        log = list()
+        a = Closable(log, 'a')
+        ref = weakref.ref(a)
+        exitHooks.register(a)
+        del a
+        gc.collect()
+        self.assertIsNone(ref())
+        self.assertEqual(dict(), exitHooks._entries)
+        exitHooks.runAll()
+        self.assertEqual([], log)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import frep
+from frep import exporters
+from frep import profilers
+
+import testdata
+
+
+@frep.deco()
+def leaf():
+    time.sleep(0.001)
+
+
+@frep.deco()
+def root():
+    leaf()
+    leaf()
+
+
+class TestChromeTraceWriter(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filePath = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.filePath)
+
+    def load(self):
+        with open(self.filePath, 'r') as fp:
+            return json.load(fp)
+
+    def test_expectCompleteEventPerSpan(self):
+        with exporters.ChromeTraceWriter(self.filePath):
+            root()
+        events = [e for e in self.load() if e['ph'] == 'X']
+        self.assertEqual(3, len(events))
+        outer = [e for e in events if e['name'].endswith('.root')][0]
+        for e in events:
+            self.assertTrue(outer['ts'] <= e['ts'])
+            self.assertTrue(e['ts'] + e['dur'] <= outer['ts'] + outer['dur'] + 1)
+
+    def test_messenger_expectCounterEventPerSample(self):
+        w = exporters.ChromeTraceWriter(self.filePath)
+        w(profilers.PidStatParser.create(testdata.filePath('blender_pidstat_dump.txt')))
+        w(dict(time=1.0))
+        w.close()
+        events = self.load()
+        memory = [e for e in events if e['ph'] == 'C' and e['name'] == 'memory (kB)']
+        self.assertTrue(memory)
+        self.assertEqual(1515811161 * 1e6, memory[0]['ts'])
+        self.assertEqual(169412, memory[0]['args']['RSS'])
+        self.assertEqual(16367, memory[0]['pid'])
+
+    def test_notClosed_expectEventsOnDisk(self):
+        w = exporters.ChromeTraceWriter(self.filePath)
+        w.write(dict(name='a', ph='i', ts=0, pid=1, tid=1))
+        w._fp.flush()
+        with open(self.filePath, 'r') as fp:
+            self.assertTrue(fp.read().startswith('[\n{'))
+        w.close()
+
+
+class TestFoldedStackWriter(unittest.TestCase):
+
+    def test_expectLinePerPath(self):
+        fd, filePath = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            with exporters.FoldedStackWriter(filePath):
+                root()
+            with open(filePath, 'r') as fp:
+                lines = fp.read().splitlines()
+        finally:
+            os.remove(filePath)
+        stacks = [l.rsplit(' ', 1)[0] for l in lines]
+        self.assertTrue('{0}.root;{0}.leaf'.format(__name__) in stacks)
+        self.assertTrue(all(int(l.rsplit(' ', 1)[1]) > 0 for l in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
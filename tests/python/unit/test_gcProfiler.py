@@ -0,0 +1,153 @@
+
+import gc
+import sys
+import unittest
+
+import frep
+from frep import gcMonitor
+from frep import profilers
+
+
+class TestGcProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.reserved = sys.modules.keys()
+        self.messages = list()
+
+    def tearDown(self):
+        # e.g. test_lazyMonkey expects the testdata modules not to be imported yet
+        for k in sys.modules.keys():
+            if k not in self.reserved:
+                sys.modules.pop(k)
+
+    def test_expectCollectionsByGeneration(self):
+        p = profilers.GcProfiler.create(messenger=self.messages.append, timed=True)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            gc.collect(2)
+            gc.collect(0)
+
+        SUP()
+        d = self.messages[0]
+        self.assertEqual(1, d['collections'][2])
+        self.assertTrue(d['collections'][0] >= 1)
+        self.assertTrue(d['gcTimes'][2] > 0)
+        self.assertTrue(0 < d['gcShare'] <= 1)
+
+    def test_nested_expectPauseChargedToEveryOpenCall(self):
+        p = profilers.GcProfiler.create(messenger=self.messages.append, timed=True)
+
+        @frep.deco(profiler=p)
+        def inner():
+            gc.collect(2)
+
+        @frep.deco(profiler=p)
+        def outer():
+            inner()
+
+        outer()
+        innerD, outerD = self.messages
+        self.assertEqual(innerD['collections'][2], outerD['collections'][2])
+        self.assertTrue(outerD['gcTime'] >= innerD['gcTime'])
+
+    def test_allocations_expectAutomaticCollectionsTimed(self):
+        p = profilers.GcProfiler.create(messenger=self.messages.append, timed=True)
+        kept = list()
+
+        @frep.deco(profiler=p)
+        def SUP():
+            for i in xrange(gc.get_threshold()[0] * 4):
+                kept.append([i])
+
+        SUP()
+        d = self.messages[0]
+        self.assertTrue(sum(d['collections']) >= 1)
+        self.assertTrue(d['gcTime'] > 0)
+
+    @unittest.skipUnless(gcMonitor.isAvailable(), 'gc.callbacks is not available')
+    def test_expectCallbackRemovedAfterwards(self):
+        with profilers.GcProfiler():
+            self.assertTrue(gc.callbacks)
+        self.assertFalse([c for c in gc.callbacks if c.__module__ == gcMonitor.__name__])
+
+    @unittest.skipIf(gcMonitor.isAvailable(), 'gc.callbacks is available')
+    def test_expectCollectorRestoredAfterwards(self):
+        collect = gc.collect
+        with profilers.GcProfiler(timed=True):
+            with profilers.GcProfiler(timed=True):
+                self.assertFalse(gc.isenabled())
+                self.assertNotEqual(collect, gc.collect)
+            self.assertFalse(gc.isenabled())
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(collect, gc.collect)
+
+    @unittest.skipIf(gcMonitor.isAvailable(), 'gc.callbacks is available')
+    def test_collectorDisabledByProgram_expectExplicitCollectionsOnly(self):
+        p = profilers.GcProfiler.create(messenger=self.messages.append, timed=True)
+        kept = list()
+        gc.disable()
+        try:
+            with p:
+                for i in xrange(gc.get_threshold()[0] * 4):
+                    kept.append([i])
+            with p:
+                gc.collect(1)
+            self.assertFalse(gc.isenabled())
+        finally:
+            gc.enable()
+        self.assertEqual([[0, 0, 0], [0, 1, 0]], [d['collections'] for d in self.messages])
+
+    def test_untimed_expectCollectorUntouched(self):
+        p = profilers.GcProfiler.create(messenger=self.messages.append)
+        collect = gc.collect
+        kept = list()
+        with p:
+            self.assertTrue(gc.isenabled())
+            self.assertEqual(collect, gc.collect)
+            for i in xrange(gc.get_threshold()[0] * 4):
+                kept.append([i])
+        self.assertTrue(gc.isenabled())
+        self.assertEqual(collect, gc.collect)
+        d = self.messages[0]
+        self.assertTrue(sum(d['collections']) >= 1)
+        if not gcMonitor.isAvailable():
+            self.assertIsNone(d['gcTime'])
+            self.assertIsNone(d['collected'])
+
+    @unittest.skipIf(gcMonitor.isAvailable(), 'gc.callbacks is available')
+    def test_untimedInsideTimed_expectOnlyTheTimedOneTimed(self):
+        with profilers.GcProfiler.create(messenger=self.messages.append, timed=True):
+            with profilers.GcProfiler.create(messenger=self.messages.append):
+                gc.collect(2)
+        innerD, outerD = self.messages
+        self.assertIsNone(innerD['gcTime'])
+        self.assertEqual(1, outerD['collections'][2])
+        self.assertTrue(outerD['gcTime'] > 0)
+        self.assertTrue(gc.isenabled())
+
+    def test_inferCollections(self):
+        thresholds = (700, 10, 10)
+        self.assertEqual([3, 0, 0], gcMonitor.inferCollections((5, 2, 4), (9, 5, 4), thresholds))
+        self.assertEqual([11, 1, 0], gcMonitor.inferCollections((5, 2, 4), (9, 2, 5), thresholds))
+        self.assertEqual([1, 9, 1], gcMonitor.inferCollections((5, 2, 4), (9, 1, 2), thresholds))
+
+    def test_treeOfAtlasItems_expectObjectsCollected(self):
+        from testdata.product.model import tree
+        p = profilers.GcProfiler.create(messenger=self.messages.append, timed=True)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            items = [tree.AtlasItem() for i in range(1000)]
+            # a ring, only reclaimed by the collector
+            for i, item in enumerate(items):
+                item.fakeProperties.logger = items[i - 1]
+            del items, item
+            gc.collect()
+
+        SUP()
+        self.assertTrue(self.messages[0]['collected'] >= 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+
+import random
+import time
+import unittest
+
+import frep
+from frep import histogram
+from frep import profilers
+
+
+class TestHistogram(unittest.TestCase):
+
+    def setUp(self):
+        self.h = histogram.Histogram()
+
+    def test_smallValues_expectExactCounts(self):
+        for v in xrange(10):
+            self.h.record(v)
+        self.assertEqual(4, self.h.percentile(50))
+        self.assertEqual(9, self.h.percentile(100))
+
+    def test_expectBucketRangesContiguous(self):
+        upper = -1
+        for i in xrange(self.h.indexOf(10 ** 12)):
+            low, high = self.h.rangeOf(i)
+            self.assertEqual(upper + 1, low)
+            upper = high
+
+    def test_expectValueWithinItsBucket(self):
+        for v in (0, 255, 256, 1000, 123456789, 3600 * 10 ** 9):
+            low, high = self.h.rangeOf(self.h.indexOf(v))
+            self.assertTrue(low <= v <= high)
+
+    def test_expectPercentilesWithinRelativeError(self):
+        values = sorted(random.randint(1000, 10 ** 9) for i in xrange(10000))
+        for v in values:
+            self.h.record(v)
+        for q in (50, 90, 99, 99.9):
+            expected = values[int(q / 100.0 * len(values)) - 1]
+            self.assertTrue(abs(self.h.percentile(q) - expected) <= expected / 100.0)
+
+    def test_expectStatistics(self):
+        for v in (100, 200, 300):
+            self.h.record(v)
+        self.assertEqual(3, self.h.count)
+        self.assertEqual(100, self.h.min)
+        self.assertEqual(300, self.h.max)
+        self.assertAlmostEqual(200.0, self.h.mean())
+
+    def test_merge(self):
+        other = histogram.Histogram()
+        self.h.record(10)
+        other.record(10 ** 6)
+        self.h.merge(other)
+        self.assertEqual(2, self.h.count)
+        self.assertEqual(10 ** 6, self.h.max)
+
+    def test_empty_expectZero(self):
+        self.assertEqual(0, self.h.percentile(99))
+
+
+class TestHistogramTimerProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.summaries = list()
+
+    def createSUP(self, p):
+        @frep.deco(profiler=p)
+        def SUP(duration):
+            time.sleep(duration)
+        return SUP
+
+    def test_expectNoMessagePerCall(self):
+        p = profilers.HistogramTimerProfiler(messenger=self.summaries.append)
+        SUP = self.createSUP(p)
+        for i in xrange(10):
+            SUP(0)
+        self.assertFalse(self.summaries)
+        self.assertEqual(10, p.snapshot()['count'])
+
+    def test_intervalElapsed_expectSummary(self):
+        p = profilers.HistogramTimerProfiler(name='SUP', interval=0.01, messenger=self.summaries.append)
+        SUP = self.createSUP(p)
+        SUP(0.02)
+        summary = self.summaries[0]
+        self.assertEqual('SUP', summary['name'])
+        self.assertEqual(1, summary['count'])
+        self.assertTrue(0.02 <= summary['p99'] < 1)
+        self.assertEqual(0, p.snapshot()['count'])
+
+    def test_flush_expectSummaryOfTheWindow(self):
+        p = profilers.HistogramTimerProfiler(messenger=self.summaries.append)
+        SUP = self.createSUP(p)
+        SUP(0)
+        p.flush()
+        p.flush()
+        self.assertEqual(1, len(self.summaries))
+
+    def test_failingSUP_expectErrorCounted(self):
+        p = profilers.HistogramTimerProfiler()
+
+        @frep.deco(profiler=p)
+        def canNotFail():
+            return 1 / 0
+
+        self.assertRaises(ZeroDivisionError, canNotFail)
+        self.assertEqual(1, p.snapshot()['numErrors'])
+
+    def test_reset(self):
+        p = profilers.HistogramTimerProfiler()
+        self.createSUP(p)(0)
+        p.reset()
+        self.assertEqual(0, p.snapshot()['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
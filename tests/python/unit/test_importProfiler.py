@@ -0,0 +1,150 @@
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+import frep
+from frep import augmentation
+from frep import exporters
+from frep import importTracker
+from frep import profilers
+
+
+class TestImportTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.reserved = sys.modules.keys()
+        self.tracker = importTracker.ImportTracker()
+
+    def tearDown(self):
+        self.tracker.uninstall()
+        for k in sys.modules.keys():
+            if k not in self.reserved:
+                sys.modules.pop(k)
+
+    def importHeavy(self):
+        self.tracker.install()
+        from testdata.imports import heavy
+        self.tracker.uninstall()
+        return dict((d['name'], d) for d in self.tracker.records)
+
+    def test_expectTree(self):
+        records = self.importHeavy()
+        heavy = records['testdata.imports.heavy']
+        light = records['testdata.imports.light']
+        self.assertEqual(self.tracker.records.index(heavy), light['parent'])
+        self.assertEqual(heavy['depth'] + 1, light['depth'])
+
+    def test_expectSelfTimeExcludesChildren(self):
+        records = self.importHeavy()
+        heavy = records['testdata.imports.heavy']
+        light = records['testdata.imports.light']
+        self.assertTrue(light['cumulative'] >= 0.01)
+        self.assertTrue(heavy['cumulative'] >= 0.03)
+        self.assertAlmostEqual(heavy['cumulative'] - light['cumulative'], heavy['self'], places=6)
+        self.assertTrue(0.02 <= heavy['self'] < heavy['cumulative'])
+
+    def test_expectRssGrowth(self):
+        self.tracker.install()
+        from testdata.imports import fat
+        self.tracker.uninstall()
+        records = dict((d['name'], d) for d in self.tracker.records)
+        self.assertTrue(records['testdata.imports.fat']['selfRss'] >= 32 * 1024)
+
+    def test_failedImport_expectRecordedAndRaised(self):
+        self.tracker.install()
+        with self.assertRaises(RuntimeError):
+            from testdata.imports import broken
+        self.tracker.uninstall()
+        records = dict((d['name'], d) for d in self.tracker.records)
+        self.assertTrue(records['testdata.imports.broken']['failed'])
+        self.assertFalse('testdata.imports.broken' in sys.modules)
+
+    def test_zipImport_expectTracked(self):
+        dirPath = tempfile.mkdtemp()
+        zipPath = os.path.join(dirPath, 'modules.zip')
+        with zipfile.ZipFile(zipPath, 'w') as z:
+            z.writestr('zipped__.py', 'VALUE = 1\n')
+        sys.path.insert(0, zipPath)
+        try:
+            self.tracker.install()
+            import zipped__
+            self.tracker.uninstall()
+        finally:
+            sys.path.remove(zipPath)
+            sys.path_importer_cache.pop(zipPath, None)
+            shutil.rmtree(dirPath)
+        self.assertEqual(1, zipped__.VALUE)
+        self.assertEqual(['zipped__'], [d['name'] for d in self.tracker.records])
+        self.assertFalse(self.tracker.records[0]['failed'])
+
+    def test_notFound_expectNotClaimed(self):
+        self.tracker.install()
+        with self.assertRaises(ImportError):
+            import nosuchmodule__
+        self.tracker.uninstall()
+        self.assertEqual([], self.tracker.records)
+
+    def test_folded_expectPathPerModule(self):
+        self.importHeavy()
+        stacks = [l.rsplit(' ', 1)[0] for l in self.tracker.folded()]
+        self.assertTrue(any(s.endswith('testdata.imports.heavy;testdata.imports.light') for s in stacks))
+
+
+class TestImportProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.reserved = sys.modules.keys()
+
+    def tearDown(self):
+        for k in sys.modules.keys():
+            if k not in self.reserved:
+                sys.modules.pop(k)
+
+    def test_expectMessageSent(self):
+        messages = list()
+        with profilers.ImportProfiler.create(messenger=messages.append):
+            from testdata.imports import heavy
+        self.assertEqual(1, len(messages))
+        names = [d['name'] for d in messages[0]['modules']]
+        self.assertTrue('testdata.imports.heavy' in names)
+        self.assertTrue(messages[0]['time'] >= 0.03)
+        self.assertFalse(messages[0]['error'])
+
+    def test_lazyPatch_expectAppliedToTrackedImport(self):
+        messages = list()
+        calls = list()
+        frep.patch('testdata.imports.light', freeFuncs=['touch'], lazy=True,
+                   profiler=profilers.SimpleTimerProfiler.create(messenger=calls.append))
+        try:
+            with profilers.ImportProfiler.create(messenger=messages.append):
+                from testdata.imports import heavy
+            from testdata.imports import light
+            self.assertEqual('light', light.touch())
+        finally:
+            frep.unpatchAll()
+        self.assertEqual(1, len(calls))
+        self.assertFalse([f for f in sys.meta_path if isinstance(f, augmentation._LazyPatchFinder)])
+        self.assertTrue('testdata.imports.light' in [d['name'] for d in messages[0]['modules']])
+
+    def test_chromeTrace_expectCompleteEventPerImport(self):
+        fd, filePath = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            w = exporters.ChromeTraceWriter(filePath)
+            with profilers.ImportProfiler.create(messenger=w):
+                from testdata.imports import heavy
+            w.close()
+            with open(filePath, 'r') as fp:
+                events = json.load(fp)
+        finally:
+            os.remove(filePath)
+        self.assertTrue('import testdata.imports.light' in [e['name'] for e in events])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+
+import sys
+
+import unittest
+
+import frep
+from frep.augmentation import LazyMonkey
+
+
+class P(object):
+
+    def __init__(self, o_dict):
+        self.d = o_dict
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.d['called'] = self.d.get('called', 0) + 1
+
+
+class TestLazyMonkey(unittest.TestCase):
+
+    def setUp(self):
+        self.reserved = sys.modules.keys()
+        self.d = dict()
+
+    def tearDown(self):
+        frep.unpatchAll()
+        for k in sys.modules.keys():
+            if k not in self.reserved:
+                sys.modules.pop(k)
+
+    def test_patch_expectModuleNotImported(self):
+        lm = LazyMonkey('testdata.product.model.tree', 'AtlasItem.getItemType', profiler=P(self.d))
+        lm.patch()
+        self.assertFalse('testdata.product.model.tree' in sys.modules)
+        lm.unpatch()
+
+    def test_import_expectPatchInEffect(self):
+        lm = LazyMonkey('testdata.product.model.tree', 'AtlasItem.getItemType', profiler=P(self.d))
+        lm.patch()
+        from testdata.product.model import tree
+        item = tree.AtlasItem()
+        self.assertEqual('', item.getItemType())
+        self.assertEqual(1, self.d['called'])
+        lm.unpatch()
+        item.getItemType()
+        self.assertEqual(1, self.d['called'])
+
+    def test_unpatchBeforeImport_expectNoPatchNorHook(self):
+        lm = LazyMonkey('testdata.product.model.tree', 'AtlasItem.getItemType', profiler=P(self.d))
+        lm.patch()
+        lm.unpatch()
+        from testdata.product.model import tree
+        tree.AtlasItem().getItemType()
+        self.assertFalse(self.d)
+        self.assertFalse([f for f in sys.meta_path if isinstance(f, type(frep.augmentation._finder))])
+
+    def test_moduleAlreadyImported_expectPatchedImmediately(self):
+        from testdata.product.model import tree
+        lm = LazyMonkey('testdata.product.model.tree', 'AtlasItem.getItemType', profiler=P(self.d))
+        lm.patch()
+        tree.AtlasItem().getItemType()
+        self.assertEqual(1, self.d['called'])
+
+
+class TestLazyPatch(unittest.TestCase):
+
+    def setUp(self):
+        # imported by the other test cases
+        sys.modules.pop('sut__', None)
+        self.reserved = sys.modules.keys()
+        self.d = dict()
+
+    def tearDown(self):
+        frep.unpatchAll()
+        for k in sys.modules.keys():
+            if k not in self.reserved:
+                sys.modules.pop(k)
+
+    def test_lazy_expectFreeFunctionAndMethodPatchedUponImport(self):
+        frep.patch('sut__', freeFuncs=['sut'], methods=['SUT.meth'], profiler=P(self.d), lazy=True)
+        self.assertFalse('sut__' in sys.modules)
+        import sut__
+        sut__.sut(1)
+        sut__.SUT().meth(1)
+        self.assertEqual(2, self.d['called'])
+
+    def test_unpatchAll_expectLazyPatchesReverted(self):
+        frep.patch('sut__', freeFuncs=['sut'], methods=['SUT.meth'], profiler=P(self.d), lazy=True)
+        import sut__
+        frep.unpatchAll()
+        sut__.sut(1)
+        sut__.SUT().meth(1)
+        self.assertFalse(self.d)
+        self.assertFalse(hasattr(sut__, 'sut__orig__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+
+import threading
+import time
+import unittest
+
+import frep
+from frep import messengers
+from frep import profilers
+
+
+class Sink(object):
+
+    def __init__(self, blocker=None):
+        self.messages = list()
+        self.threads = set()
+        self.blocker = blocker
+
+    def __call__(self, d):
+        if self.blocker is not None:
+            self.blocker.wait()
+        self.threads.add(threading.current_thread().name)
+        self.messages.append(d)
+
+
+class TestAsyncMessenger(unittest.TestCase):
+
+    def test_expectAllMessagesDelivered(self):
+        sink = Sink()
+        m = messengers.AsyncMessenger(sink, numWorkers=2)
+        for i in xrange(1000):
+            m(dict(i=i))
+        m.close()
+        self.assertEqual(range(1000), sorted(d['i'] for d in sink.messages))
+        self.assertEqual(1000, m.numDelivered)
+
+    def test_expectDeliveryOffTheCallerThread(self):
+        sink = Sink()
+        m = messengers.AsyncMessenger(sink)
+        m(dict())
+        m.flush()
+        self.assertFalse(threading.current_thread().name in sink.threads)
+        m.close()
+
+    def test_batched_expectListOfMessages(self):
+        batches = list()
+        m = messengers.AsyncMessenger(batches.append, batchSize=10, batched=True)
+        blocker = threading.Event()
+        m.defer(blocker.wait)
+        for i in xrange(20):
+            m(dict(i=i))
+        blocker.set()
+        m.close()
+        self.assertEqual(21, sum(len(b) for b in batches))
+        self.assertTrue(all(len(b) <= 10 for b in batches))
+
+    def test_queueFull_expectDroppedMessagesCounted(self):
+        blocker = threading.Event()
+        sink = Sink(blocker=blocker)
+        m = messengers.AsyncMessenger(sink, maxSize=2, batchSize=1)
+        for i in xrange(10):
+            m(dict(i=i))
+        blocker.set()
+        m.close()
+        self.assertTrue(m.numDropped > 0)
+        self.assertEqual(10, m.numDropped + m.numDelivered)
+
+    def test_queueFull_expectDroppedParserRunOnTheCaller(self):
+        busy = threading.Event()
+        blocker = threading.Event()
+        sink = Sink()
+        m = messengers.AsyncMessenger(sink, maxSize=1, batchSize=1)
+        m.defer(lambda: busy.set() or blocker.wait())
+        busy.wait()
+        m(dict())
+        calls = list()
+        m.defer(lambda: calls.append(threading.current_thread().name) or dict())
+        self.assertEqual([threading.current_thread().name], calls)
+        blocker.set()
+        m.close()
+        self.assertEqual(1, m.numDropped)
+        self.assertEqual(2, m.numDelivered)
+
+    def test_defer_expectParserResultDelivered(self):
+        sink = Sink()
+        m = messengers.AsyncMessenger(sink)
+        m.defer(dict, a=1)
+        m.close()
+        self.assertEqual([dict(a=1)], sink.messages)
+
+    def test_failingMessenger_expectFailureCounted(self):
+        def fail(d):
+            raise RuntimeError()
+        m = messengers.AsyncMessenger(fail)
+        m(dict())
+        m.close()
+        self.assertEqual(1, m.numFailed)
+
+    def test_close_expectLaterMessagesDropped(self):
+        m = messengers.AsyncMessenger(Sink())
+        m.close()
+        m(dict())
+        self.assertEqual(1, m.numDropped)
+
+
+class TestAsyncMessengerWithProfiler(unittest.TestCase):
+
+    def test_expectParsingOffTheCallerThread(self):
+        sink = Sink()
+        m = messengers.AsyncMessenger(sink)
+        parsedBy = list()
+
+        def parser(samples, ed=None):
+            parsedBy.append(threading.current_thread().name)
+            return dict(samples=samples)
+
+        p = profilers.ProcSamplerProfiler(interval=0.01, parser=parser, messenger=m)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            time.sleep(0.02)
+
+        SUP()
+        m.close()
+        self.assertEqual(1, len(sink.messages))
+        self.assertNotEqual(threading.current_thread().name, parsedBy[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+
+import re
+import unittest
+
+import frep
+from frep import callTree
+
+import sutBulk__
+
+
+class P(object):
+
+    def __init__(self):
+        self.count = 0
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.count += 1
+
+
+class TestPatchMatching(unittest.TestCase):
+
+    def setUp(self):
+        self.p = P()
+
+    def tearDown(self):
+        frep.unpatchAll()
+
+    def test_glob_expectMatchingMethodsPatched(self):
+        patches = frep.patchMatching('sutBulk__', ['Graph.add*'], profiler=self.p)
+        self.assertEqual(['sutBulk__.Graph.addEdge', 'sutBulk__.Graph.addNode'], sorted(patches.names()))
+        g = sutBulk__.Graph()
+        g.addNode(1)
+        g.addEdge(1, 2)
+        g.removeNode(1)
+        self.assertEqual(2, self.p.count)
+
+    def test_regex_expectMatchingFunctionsPatched(self):
+        patches = frep.patchMatching('sutBulk__', [re.compile(r'publish')], profiler=self.p)
+        self.assertEqual(['sutBulk__.publish', 'sutBulk__.publish_all'], sorted(patches.names()))
+        sutBulk__.publish_all([1, 2])
+        self.assertEqual(3, self.p.count)
+
+    def test_all_expectDundersPropertiesAndBuiltinsSkipped(self):
+        frep.patchMatching('sutBulk__', ['*'], profiler=self.p)
+        g = sutBulk__.Graph.create()
+        self.assertEqual(0, len(g))
+        self.assertEqual(0, g.size)
+        self.assertTrue(sutBulk__.Graph.getcwd())
+        self.assertFalse(hasattr(sutBulk__, 'join__orig__'))
+        self.assertEqual(1, self.p.count)
+
+    def test_staticAndClassMethods_expectKindPreserved(self):
+        frep.patchMatching('sutBulk__', ['Graph.create*'], profiler=self.p)
+        self.assertTrue(isinstance(sutBulk__.Graph.create(), sutBulk__.Graph))
+        self.assertTrue(isinstance(sutBulk__.Graph().create(), sutBulk__.Graph))
+        self.assertEqual(2, len(sutBulk__.Graph.createFrom([1, 2])))
+        self.assertTrue(isinstance(vars(sutBulk__.Graph)['create'], staticmethod))
+        self.assertTrue(isinstance(vars(sutBulk__.Graph)['createFrom'], classmethod))
+        self.assertEqual(3, self.p.count)
+
+    def test_nestedAndOldStyleClasses_expectPatched(self):
+        patches = frep.patchMatching('sutBulk__', ['Graph.Node.*', 'OldStyle.*'], profiler=self.p)
+        self.assertEqual(['sutBulk__.Graph.Node.connect', 'sutBulk__.OldStyle.run'], sorted(patches.names()))
+        sutBulk__.Graph.Node().connect(None)
+        self.assertEqual('run', sutBulk__.OldStyle().run())
+        self.assertEqual(2, self.p.count)
+
+    def test_expectQualifiedSpanNames(self):
+        frep.patchMatching('sutBulk__', ['Graph.Node.connect'], profiler=self.p)
+        with callTree.CallTree() as tree:
+            sutBulk__.Graph.Node().connect(None)
+        self.assertTrue(tree.find(['sutBulk__.Graph.Node.connect']))
+
+    def test_restore_expectOriginalsBack(self):
+        originals = dict(vars(sutBulk__.Graph))
+        patches = frep.patchMatching('sutBulk__', ['*'], profiler=self.p)
+        patches.restore()
+        self.assertEqual(originals, dict(vars(sutBulk__.Graph)))
+        self.assertFalse(hasattr(sutBulk__, 'publish__orig__'))
+        self.assertFalse(frep._patchedFuncs)
+        self.assertFalse(frep._patchedMethods)
+
+    def test_unpatchAll_expectOriginalsBack(self):
+        originals = dict(vars(sutBulk__.Graph))
+        frep.patchMatching('sutBulk__', ['*'], profiler=self.p)
+        frep.unpatchAll()
+        self.assertEqual(originals, dict(vars(sutBulk__.Graph)))
+
+    def test_patchTwice_expectPatchedOnce(self):
+        frep.patchMatching('sutBulk__', ['publish'], profiler=self.p)
+        self.assertEqual(0, len(frep.patchMatching('sutBulk__', ['publish'], profiler=self.p)))
+        sutBulk__.publish(1)
+        self.assertEqual(1, self.p.count)
+
+
+class TestPatchNestedMethod(unittest.TestCase):
+
+    def tearDown(self):
+        frep.unpatchAll()
+
+    def test_nestedClassMethod_expectPatchInEffect(self):
+        p = P()
+        frep.patch('sutBulk__', methods=['Graph.Node.connect'], profiler=p)
+        sutBulk__.Graph.Node().connect(None)
+        self.assertEqual(1, p.count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+
+import unittest
+
+import frep
+from frep import perfEvent
+from frep import profilers
+
+
+def _available():
+    return bool(perfEvent.CounterGroup(hardware=False).names)
+
+
+@unittest.skipUnless(_available(), 'perf_event_open is not available')
+class TestCounterGroup(unittest.TestCase):
+
+    def test_softwareOnly_expectNoHardwareCounters(self):
+        group = perfEvent.CounterGroup(hardware=False)
+        self.assertTrue('task-clock (msec)' in group.names)
+        self.assertFalse('cycles' in group.names)
+
+    def test_expectOneValuePerCounter(self):
+        group = perfEvent.CounterGroup()
+        self.assertEqual(len(group.names), len(group.read()))
+
+    def test_expectMonotonicTaskClock(self):
+        group = perfEvent.CounterGroup(hardware=False)
+        begin = group.read()
+        sum(xrange(100000))
+        end = group.read()
+        counts = perfEvent.toCounts(group.names, begin, end)
+        self.assertTrue(counts['task-clock (msec)'] > 0)
+
+
+@unittest.skipUnless(_available(), 'perf_event_open is not available')
+class TestPerfEventProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.d = None
+        p = profilers.PerfEventProfiler(messenger=self.sendMessage)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            return sum(xrange(100000))
+
+        self.SUP = SUP
+
+    def sendMessage(self, d):
+        self.d = d
+
+    def test_runSUP_expectProfilingData(self):
+        self.SUP()
+        self.assertTrue('CPU-Utilization' in self.d)
+        self.assertTrue(self.d['task-clock (msec)'] > 0)
+        self.assertTrue(self.d['time-elapsed'] > 0)
+
+    def test_failingSUP_expectError(self):
+        p = profilers.PerfEventProfiler(messenger=self.sendMessage)
+
+        @frep.deco(profiler=p)
+        def canNotFail():
+            return 1 / 0
+
+        self.assertRaises(ZeroDivisionError, canNotFail)
+        self.assertTrue(self.d['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
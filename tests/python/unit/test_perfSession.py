@@ -0,0 +1,178 @@
+
+import StringIO
+import os
+import sys
+import time
+import unittest
+
+from frep import perfSession
+
+import testdata
+
+
+class FakeProcess(object):
+
+    def __init__(self, stderr):
+        self.stderr = stderr
+
+    def poll(self):
+        return None
+
+
+class ControlledStream(object):
+    """
+    Calls onLine(n) before returning the n-th line
+    """
+
+    def __init__(self, fp, onLine):
+        self.fp = fp
+        self.onLine = onLine
+        self.numLines = 0
+
+    def readline(self):
+        self.onLine(self.numLines)
+        self.numLines += 1
+        return self.fp.readline()
+
+
+class TestPerfSession(unittest.TestCase):
+
+    def setUp(self):
+        self.session = perfSession.PerfSession(0)
+        with open(testdata.filePath('blender_perfstat_interval_dump.txt'), 'r') as fp:
+            self.session.p = FakeProcess(fp)
+            self.session._run()
+
+    def test_expectGroupSizeLearned(self):
+        self.assertEqual(4, self.session._groupSize)
+
+    def test_expectEveryIntervalCompleted(self):
+        self.assertEqual(4, self.session._ticks)
+
+    def test_expectAccumulatedCounters(self):
+        self.assertAlmostEqual(5.459286, self.session._totals['task-clock (msec)'])
+        self.assertAlmostEqual(22, self.session._totals['context-switches'])
+        self.assertAlmostEqual(1229458, self.session._totals['instructions'])
+
+
+class TestPerfSessionEnd(unittest.TestCase):
+
+    def setUp(self):
+        self.session = perfSession.PerfSession(0)
+        # no perf process: the control fifo is not exercised here
+        self.session._command = lambda cmd: None
+        self.results = list()
+
+    def run_(self, onLine):
+        with open(testdata.filePath('blender_perfstat_interval_dump.txt'), 'r') as fp:
+            self.session.p = FakeProcess(ControlledStream(fp, onLine))
+            self.session._run()
+
+    def test_callEndsWhileIntervalIsPrinted_expectNextIntervalAttributed(self):
+        token = self.session.begin()
+
+        def onLine(n):
+            # the header, the first interval and the first line of the second one have been read
+            if n == 6:
+                self.session.end(token, lambda counts, elapsed: self.results.append((n, counts)))
+
+        self.run_(onLine)
+        self.assertEqual(1, len(self.results))
+        counts = self.results[0][1]
+        self.assertAlmostEqual(3.947284 + 1.512002, counts['task-clock (msec)'])
+        self.assertAlmostEqual(1229458, counts['instructions'])
+
+    def test_end_expectNotWaitingForTheInterval(self):
+        def onLine(n):
+            if n == 0:
+                self.session.end(self.session.begin(), lambda counts, elapsed: self.results.append(counts))
+                # returned before any interval is printed
+                self.assertEqual([], self.results)
+
+        self.run_(onLine)
+        self.assertEqual(1, len(self.results))
+
+    def test_perfGone_expectPendingCallsAndLaterCallsDelivered(self):
+        def onLine(n):
+            if n == 16:
+                self.session.end(self.session.begin(), lambda counts, elapsed: self.results.append(counts))
+
+        self.run_(onLine)
+        self.assertEqual(1, len(self.results))
+        self.session.end(self.session.begin(), lambda counts, elapsed: self.results.append(counts))
+        self.assertEqual(2, len(self.results))
+
+    def test_callbackRaises_expectReaderKeepsGoing(self):
+        def onLine(n):
+            if n == 0:
+                self.session.end(self.session.begin(), lambda counts, elapsed: 1 / 0)
+
+        stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            self.run_(onLine)
+        finally:
+            sys.stderr, printed = stderr, sys.stderr.getvalue()
+        self.assertEqual(4, self.session._ticks)
+        self.assertIn('ZeroDivisionError', printed)
+
+
+class ExitedProcess(object):
+    """
+    A perf that has rejected its arguments, e.g. --control before perf 5.10
+    """
+
+    returncode = 129
+
+    def __init__(self, *args, **kwargs):
+        self.stderr = StringIO.StringIO('unknown option `control\'\n')
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self):
+        return self.returncode
+
+
+class TestPerfSessionStart(unittest.TestCase):
+
+    def setUp(self):
+        self.popen = perfSession.subprocess.Popen
+        self.mkdtemp = perfSession.tempfile.mkdtemp
+        self.dirPaths = list()
+
+        def mkdtemp(*args, **kwargs):
+            self.dirPaths.append(self.mkdtemp(*args, **kwargs))
+            return self.dirPaths[-1]
+
+        perfSession.tempfile.mkdtemp = mkdtemp
+
+    def tearDown(self):
+        perfSession.subprocess.Popen = self.popen
+        perfSession.tempfile.mkdtemp = self.mkdtemp
+        perfSession.PerfSession.stopAll()
+
+    def test_popenRaises_expectFifosRemoved(self):
+        def popen(*args, **kwargs):
+            raise OSError(2, 'No such file or directory')
+
+        perfSession.subprocess.Popen = popen
+        self.assertRaises(OSError, perfSession.PerfSession.get, os.getpid())
+        self.assertFalse(os.path.exists(self.dirPaths[0]))
+        self.assertEqual(dict(), perfSession.PerfSession._registry)
+
+    def test_perfExited_expectSessionDiscardedWithoutWaiting(self):
+        perfSession.subprocess.Popen = ExitedProcess
+        session = perfSession.PerfSession.get(os.getpid())
+        t = time.time()
+        self.assertRaises(RuntimeError, session.begin)
+        self.assertTrue(time.time() - t < perfSession.PerfSession.TIMEOUT)
+        self.assertFalse(os.path.exists(self.dirPaths[0]))
+        self.assertEqual(dict(), perfSession.PerfSession._registry)
+        self.assertRaises(RuntimeError, session.begin)
+        # the next call tries a new session
+        self.assertIsNot(session, perfSession.PerfSession.get(os.getpid()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -60,5 +60,39 @@ class TestPerfStatParser(unittest.TestCase):
         self.assertRaises(ValueError, perfStat.parse, text)
 
 
+class TestPerfStatIntervalParser(unittest.TestCase):
+
+    def setUp(self):
+        self.filePath = testdata.filePath('blender_perfstat_interval_dump.txt')
+        with open(self.filePath, 'r') as fp:
+            self.lines = fp.readlines()
+
+    def test_commentLine_expectNone(self):
+        self.assertEqual(None, perfStat.parseIntervalLine(self.lines[0]))
+
+    def test_notCountedLine_expectNoneValue(self):
+        ts, k, v = perfStat.parseIntervalLine(self.lines[1])
+        self.assertEqual('task-clock (msec)', k)
+        self.assertEqual(None, v)
+
+    def test_expectCounterWithUnit(self):
+        ts, k, v = perfStat.parseIntervalLine(self.lines[5])
+        self.assertAlmostEqual(0.020251875, ts)
+        self.assertEqual('task-clock (msec)', k)
+        self.assertAlmostEqual(3.947284, v)
+
+    def test_expectCounterWithoutUnit(self):
+        ts, k, v = perfStat.parseIntervalLine(self.lines[8])
+        self.assertEqual('instructions', k)
+        self.assertAlmostEqual(817127, v)
+
+    def test_fromCounts_expectCpuUtilization(self):
+        d = perfStat.fromCounts({'task-clock (msec)': 5.0, 'instructions': 10.0}, 0.01)
+        self.assertAlmostEqual(0.5, d['CPU-Utilization'])
+        self.assertAlmostEqual(5.0, d['CPU-Instructions-executed'])
+        self.assertAlmostEqual(0.01, d['time-elapsed'])
+        self.assertEqual('', d['error'])
+
+
 if __name__ == '__main__':
     unittest.main()
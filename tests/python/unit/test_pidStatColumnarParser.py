@@ -0,0 +1,98 @@
+
+import unittest
+
+from frep import profilers
+from frep.parsers import pidStat
+
+import testdata
+
+
+HEADER = '#      Time   UID      TGID   %MEM  Command\n'
+ROW = ' 1515811161  1000     16367  {}  {}\n'
+
+class TestPidStatColumnarParser(unittest.TestCase):
+
+    def setUp(self):
+        self.filePath = testdata.filePath('blender_pidstat_dump.txt')
+
+    def test_expectParsedStruct(self):
+        parsed = pidStat.parse(self.filePath)
+        self.assertTrue(parsed)
+        self.assertTrue('error' in parsed)
+
+    def test_expectNumOfSamples(self):
+        table = pidStat.parse(self.filePath)['table']
+        self.assertEqual(13, len(table.sampleOffsets))
+
+    def test_expectColumnValues(self):
+        table = pidStat.parse(self.filePath)['table']
+        self.assertEqual(1000, table.column('UID')[0])
+        self.assertAlmostEqual(0.52, table.column('%MEM')[0])
+        self.assertEqual('|__blender', table.column('Command')[1])
+
+    def test_selectByTid(self):
+        table = pidStat.parse(self.filePath)['table']
+        rows = table.select(tid=16368)
+        self.assertEqual(13, len(rows))
+        self.assertEqual(16368, table.record(rows[5])['TID'])
+
+    def test_selectByTime(self):
+        table = pidStat.parse(self.filePath)['table']
+        rows = table.select(tid=0, begin=1515811162, end=1515811163)
+        self.assertEqual(2, len(rows))
+
+    def test_expectSameSamplesAsPidStatParser(self):
+        expected = profilers.PidStatParser(self.filePath).parse()['samples']
+        samples = pidStat.parse(self.filePath)['table'].toSamples()
+        self.assertEqual(expected, samples)
+
+    def test_commandWithWhiteSpaces_expectWholeCommand(self):
+        table = pidStat.PidStatColumnarParser.parseText(HEADER + ROW.format('0.52', 'Web Content'))
+        self.assertEqual('Web Content', table.column('Command')[0])
+        self.assertEqual(16367, table.column('TGID')[0])
+
+    def test_decimalsVary_expectSameValues(self):
+        table = pidStat.PidStatColumnarParser.parseText(
+            HEADER + ROW.format('0.52', 'blender') + ROW.format('0.5', 'blender') + ROW.format('12', 'blender'))
+        self.assertEqual([0.52, 0.5, 12.0], list(table.column('%MEM')))
+        self.assertEqual([1000] * 3, list(table.column('UID')))
+
+    def test_valueNotANumber_expectParseError(self):
+        text = HEADER + ROW.format('0.52', 'blender') + ROW.format('0.5x', 'blender')
+        with self.assertRaises(ValueError) as e:
+            pidStat.PidStatColumnarParser.parseText(text)
+        self.assertIn('row 1, k %MEM, v 0.5x', str(e.exception))
+
+    def test_missingColumn_expectParseError(self):
+        text = HEADER + ROW.format('0.52', 'blender') + ' 1515811161  1000     16367\n'
+        with self.assertRaises(ValueError) as e:
+            pidStat.PidStatColumnarParser.parseText(text)
+        self.assertIn('row 1, expect 5 columns', str(e.exception))
+
+    def test_missingBegin_expectFailed(self):
+        f = testdata.filePath('blender_pidstat_dump_missing_begin.txt')
+        self.assertFalse(pidStat.parse(f))
+
+    def test_missingEnd_expectFailed(self):
+        f = testdata.filePath('blender_pidstat_dump_missing_end.txt')
+        self.assertFalse(pidStat.parse(f))
+
+
+class TestPidStatColumnarParserWithoutNumpy(TestPidStatColumnarParser):
+
+    def setUp(self):
+        super(TestPidStatColumnarParserWithoutNumpy, self).setUp()
+        self.numpy = pidStat.numpy
+        pidStat.numpy = None
+
+    def tearDown(self):
+        pidStat.numpy = self.numpy
+
+    def test_expectArrayPerColumn(self):
+        table = pidStat.parse(self.filePath)['table']
+        self.assertEqual('l', table.column('RSS').typecode)
+        self.assertEqual('d', table.column('kB_rd/s').typecode)
+
+
+if __name__ == '__main__':
+    unittest.main()
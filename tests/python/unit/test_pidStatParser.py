@@ -1,4 +1,8 @@
 
+import os
+import tempfile
+import threading
+import time
 import unittest
 
 from frep import profilers
@@ -100,5 +104,82 @@ class PidStatParser(unittest.TestCase):
         self.assertFalse(parsed)
 
 
+class TestPidStatParserIterSamples(unittest.TestCase):
+
+    def setUp(self):
+        with open(testdata.filePath('blender_pidstat_dump.txt'), 'r') as fp:
+            self.lines = fp.readlines()
+        fd, self.filePath = tempfile.mkstemp()
+        os.close(fd)
+        self.written = threading.Event()
+
+    def tearDown(self):
+        os.remove(self.filePath)
+
+    def write(self):
+        with open(self.filePath, 'w') as fp:
+            for i, line in enumerate(self.lines):
+                fp.write(line)
+                fp.flush()
+                if i == 50:
+                    time.sleep(0.2)
+        self.written.set()
+
+    def test_completeDump_expectSameSamplesAsParse(self):
+        f = testdata.filePath('blender_pidstat_dump.txt')
+        parser = profilers.PidStatParser(f)
+        self.assertEqual(parser.parse()['samples'], list(parser.iterSamples()))
+        self.assertTrue(parser.complete)
+
+    def test_missingEnd_expectIncomplete(self):
+        f = testdata.filePath('blender_pidstat_dump_missing_end.txt')
+        parser = profilers.PidStatParser(f)
+        self.assertEqual(1, len(list(parser.iterSamples())))
+        self.assertFalse(parser.complete)
+
+    def test_liveDump_expectSamplesBeforeWriterCompletes(self):
+        writer = threading.Thread(target=self.write)
+        writer.start()
+        parser = profilers.PidStatParser(self.filePath)
+        it = parser.iterSamples(follow=writer.is_alive, pollInterval=0.01)
+        first = it.next()
+        self.assertFalse(self.written.is_set())
+        self.assertEqual(16367, first[1]['TGID'])
+        self.assertEqual(12, len(list(it)))
+        self.assertTrue(parser.complete)
+        writer.join()
+
+
+class TestPidStatReducer(unittest.TestCase):
+
+    def test_expectRunningStatistics(self):
+        columns = ['Time', 'TID', 'RSS', 'Command']
+        reducer = profilers.PidStatReducer()
+        for t, rss in ((1, 10), (2, 30), (3, 20)):
+            reducer.add([columns, dict(Time=t, TID=0, RSS=rss, Command='blender')])
+        stats = reducer.result()[0]['RSS']
+        self.assertEqual(10, stats['min'])
+        self.assertEqual(30, stats['max'])
+        self.assertAlmostEqual(20.0, stats['mean'])
+        self.assertEqual(3, stats['count'])
+        self.assertEqual(3, reducer.numSamples)
+
+    def test_expectKeyColumnsSkipped(self):
+        reducer = profilers.PidStatReducer()
+        reducer.add([['Time', 'TID', 'Command'], dict(Time=1, TID=0, Command='blender')])
+        self.assertEqual(dict(), reducer.result()[0])
+
+    def test_reduceDump_expectPerThreadStatistics(self):
+        f = testdata.filePath('blender_pidstat_dump.txt')
+        reduced = profilers.PidStatParser.createReduced(f)
+        self.assertEqual(13, reduced['numSamples'])
+        self.assertEqual(169412, reduced['reduced'][0]['RSS']['max'])
+        self.assertEqual(13, reduced['reduced'][16368]['RSS']['count'])
+
+    def test_reduceIncompleteDump_expectFailed(self):
+        f = testdata.filePath('blender_pidstat_dump_missing_end.txt')
+        self.assertFalse(profilers.PidStatParser.createReduced(f))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+import unittest
+
+import frep
+from frep import messengers
+from frep import profilers
+
+from testdata.fakePidStat import FakePidStat
+
+
+def waitForSample(filePath):
+    end = time.time() + 5
+    while time.time() < end:
+        with open(filePath, 'r') as fp:
+            if 'python' in fp.read():
+                return
+        time.sleep(0.01)
+
+
+class TestPidStatProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.pidstat = FakePidStat()
+        self.messages = list()
+
+    def tearDown(self):
+        self.pidstat.remove()
+
+    def test_callEntersWhileDumpIsParsed_expectDumpUntouched(self):
+        p = profilers.PidStatProfiler.create(messenger=self.messages.append)
+        parse = p.parser
+
+        def SUP():
+            waitForSample(p.filePath)
+
+        def _parser(filePath, ed=None):
+            if filePath == p.filePath and not self.messages:
+                # another call enters (and completes) while the first dump is being parsed
+                t = threading.Thread(target=frep.deco(profiler=p)(lambda: time.sleep(0.05)))
+                t.start()
+                t.join()
+            return parse(filePath, ed=ed)
+
+        p.parser = _parser
+        frep.deco(profiler=p)(SUP)()
+        self.assertEqual(2, len(self.messages))
+        # the second call's dump is parsed first
+        first = self.messages[1]
+        self.assertEqual(1, len(first['samples']))
+        self.assertEqual(169412, first['samples'][0][1]['RSS'])
+        self.assertFalse(os.path.exists(p.filePath))
+
+    def test_overlappingCalls_expectNoLeakedFds(self):
+        p = profilers.PidStatProfiler.create(messenger=self.messages.append)
+        numFds = len(os.listdir('/proc/self/fd'))
+        with p:
+            for i in xrange(5):
+                with p:
+                    pass
+        self.assertEqual(6, len(self.messages))
+        self.assertEqual(numFds, len(os.listdir('/proc/self/fd')))
+
+    def test_reduced_expectStatisticsOfTheSamples(self):
+        p = profilers.PidStatProfiler.createReduced(messenger=self.messages.append)
+        with p:
+            waitForSample(p.filePath)
+        d = self.messages[0]
+        self.assertEqual(1, d['numSamples'])
+        self.assertEqual(169412, d['reduced'][0]['RSS']['max'])
+        self.assertNotIn('samples', d)
+        self.assertFalse(os.path.exists(p.filePath))
+
+    def test_reducedAsyncMessenger_expectDumpReducedByTheWorker(self):
+        am = messengers.AsyncMessenger(self.messages.append)
+        p = profilers.PidStatProfiler.createReduced(messenger=am)
+        for i in xrange(3):
+            with p:
+                waitForSample(p.filePath)
+        am.close()
+        self.assertEqual([1, 1, 1], [d['numSamples'] for d in self.messages])
+        self.assertDumpsRemoved(p)
+
+    def assertDumpsRemoved(self, p):
+        self.assertFalse([f for f in os.listdir(os.path.dirname(p.filePath)) if f.startswith(
+            os.path.basename(p.filePath))])
+
+    def test_queueFull_expectDroppedDumpsRemoved(self):
+        am = messengers.AsyncMessenger(self.messages.append, maxSize=1, batchSize=1)
+        busy = threading.Event()
+        blocker = threading.Event()
+        am.defer(lambda: busy.set() or blocker.wait())
+        busy.wait()
+        # the worker is busy and the queue is full
+        am(dict())
+        for create in (profilers.PidStatProfiler.create, profilers.PidStatProfiler.createReduced):
+            p = create(messenger=am)
+            for i in xrange(3):
+                with p:
+                    waitForSample(p.filePath)
+            self.assertDumpsRemoved(p)
+        blocker.set()
+        am.close()
+        self.assertEqual(6, am.numDropped)
+        self.assertEqual(2, am.numDelivered)
+        self.assertFalse([t for t in threading.enumerate() if t.name == 'frep-pidStatTail'])
+
+
+if __name__ == '__main__':
+    unittest.main()
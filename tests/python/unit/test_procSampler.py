@@ -0,0 +1,68 @@
+
+import os
+import time
+import unittest
+
+import frep
+from frep import procSampler
+from frep import profilers
+
+
+class TestProcSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.sampler = procSampler.ProcSampler(interval=0.01)
+        self.sampler.start()
+        time.sleep(0.05)
+        self.sampler.stop()
+
+    def test_expectSamples(self):
+        self.assertTrue(len(self.sampler.samples) >= 2)
+
+    def test_expectColumnsAsTheFirstElement(self):
+        sample = self.sampler.samples[0]
+        self.assertEqual(list(procSampler.COLUMNS), sample[0])
+
+    def test_expectProcessRecordDetails(self):
+        pRecord = self.sampler.samples[-1][1]
+        self.assertEqual(os.getpid(), pRecord['TGID'])
+        self.assertEqual(0, pRecord['TID'])
+        self.assertEqual(os.getuid(), pRecord['UID'])
+        self.assertTrue(pRecord['RSS'] > 0)
+        self.assertTrue(pRecord['VSZ'] >= pRecord['RSS'])
+
+    def test_expectThreadRecords(self):
+        tids = [r['TID'] for r in self.sampler.samples[-1][2:]]
+        self.assertTrue(os.getpid() in tids)
+
+    def test_intervalTooSmall_expectError(self):
+        self.assertRaises(ValueError, procSampler.ProcSampler, interval=0.001)
+
+
+class TestProcSamplerProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.d = None
+        p = profilers.ProcSamplerProfiler.create(messenger=self.sendMessage, interval=0.01)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            time.sleep(0.03)
+
+        self.SUP = SUP
+
+    def sendMessage(self, d):
+        self.d = d
+
+    def test_runShortSUP_expectSamples(self):
+        self.SUP()
+        self.assertTrue(self.d['samples'])
+        self.assertEqual('', self.d['error'])
+
+    def test_expectProcessRecordType(self):
+        self.SUP()
+        self.assertTrue(isinstance(self.d['samples'][0][1], profilers.ProcessRecord))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+import frep
+from frep import callTree
+from frep import processTree
+from frep import profilers
+
+
+# by the CPU clock of the child, it may be preempted
+SPIN = 'import time\nend = time.clock() + {}\nwhile time.clock() < end: pass\n'
+ALLOCATE = 'import time\nx = " " * (32 * 1024 * 1024)\ntime.sleep({})\n'
+
+
+def spin(duration):
+    end = time.time() + duration
+    while time.time() < end:
+        pass
+
+
+class TestProcessTree(unittest.TestCase):
+
+    def test_descendants_expectGrandChild(self):
+        p = subprocess.Popen(['/bin/sh', '-c', 'sleep 1 & wait'])
+        try:
+            time.sleep(0.1)
+            pids = processTree.descendants(os.getpid())
+            self.assertTrue(p.pid in pids)
+            self.assertTrue(len(pids) >= 2)
+        finally:
+            p.kill()
+            p.wait()
+
+
+class TestProcessTreeProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = list()
+
+    def tearDown(self):
+        while processTree._numTagging[0]:
+            processTree.untagPopen()
+
+    def test_subprocess_expectChildCpuAndRss(self):
+        p = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            subprocess.check_call([sys.executable, '-c', SPIN.format(0.2)])
+            subprocess.check_call([sys.executable, '-c', ALLOCATE.format(0.2)])
+
+        SUP()
+        d = self.messages[0]
+        self.assertEqual(2, d['total']['numChildren'])
+        self.assertTrue(d['total']['cpu'] >= 0.1)
+        self.assertTrue(d['total']['reapedCpu'] >= 0.2)
+        self.assertTrue(d['total']['peakRss'] >= 32 * 1024)
+        self.assertTrue(all(r['exited'] for r in d['children']))
+        self.assertTrue(max(r['maxRss'] for r in d['children']) >= 32 * 1024)
+
+    def test_existingChild_expectIgnored(self):
+        existing = subprocess.Popen(['sleep', '1'])
+        p = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02)
+        try:
+            with p:
+                time.sleep(0.05)
+        finally:
+            existing.kill()
+            existing.wait()
+        self.assertEqual(0, self.messages[0]['total']['numChildren'])
+
+    def test_multiprocessing_expectForkedChildSeen(self):
+        p = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            child = multiprocessing.Process(target=spin, args=(0.2, ))
+            child.start()
+            child.join()
+
+        SUP()
+        d = self.messages[0]
+        self.assertEqual(1, d['total']['numChildren'])
+        self.assertTrue(d['children'][0]['cpu'] >= 0.1)
+
+    def test_tagPopen_expectChildTaggedWithSpan(self):
+        p = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02, tagPopen=True)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            subprocess.check_call(['/bin/sh', '-c', 'sleep 0.1; sleep 0.1'])
+
+        with callTree.CallTree():
+            SUP()
+        tags = set(r['tag'] for r in self.messages[0]['children'])
+        self.assertEqual(set(['{}.SUP'.format(__name__)]), tags)
+        # sh and the two sleeps
+        self.assertEqual(3, len(self.messages[0]['children']))
+        self.assertFalse('__init__' in vars(subprocess.Popen) and processTree._originalInit[0] is not None)
+
+    def test_tagPopen_noSpan_expectCallingFunction(self):
+        p = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02, tagPopen=True)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            subprocess.check_call(['sleep', '0.1'])
+
+        SUP()
+        self.assertTrue(self.messages[0]['children'][0]['tag'].startswith('SUP ('))
+
+    def test_tagPopen_overlappingProfilers_expectTaggedUntilTheLastExits(self):
+        inner = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02, tagPopen=True)
+        outer = profilers.ProcessTreeProfiler.create(messenger=self.messages.append, interval=0.02, tagPopen=True)
+
+        @frep.deco(profiler=inner)
+        def child():
+            subprocess.check_call(['sleep', '0.1'])
+
+        @frep.deco(profiler=outer)
+        def SUP():
+            child()
+            # inner has exited, outer is still active
+            subprocess.check_call(['sleep', '0.1'])
+
+        SUP()
+        innerD, outerD = self.messages
+        self.assertEqual(2, len(outerD['children']))
+        self.assertTrue(all(r['tag'] for r in outerD['children']))
+        self.assertEqual(None, processTree._originalInit[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
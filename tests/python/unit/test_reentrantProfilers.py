@@ -0,0 +1,77 @@
+
+import threading
+import time
+import unittest
+
+import frep
+from frep import profilers
+
+
+class TestCallStack(unittest.TestCase):
+
+    def test_expectStatesOfEachThreadSeparated(self):
+        calls = profilers.CallStack()
+        calls.push('main')
+        popped = list()
+
+        def worker():
+            calls.push('worker')
+            popped.append(calls.pop())
+            popped.append(len(calls))
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        self.assertEqual(['worker', 0], popped)
+        self.assertEqual('main', calls.pop())
+
+
+class TestReentrantSimpleTimer(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = list()
+        self.lock = threading.Lock()
+
+    def messenger(self, d):
+        with self.lock:
+            self.messages.append(d)
+
+    def test_recursiveCalls_expectEachCallTimed(self):
+        p = profilers.SimpleTimerProfiler(messenger=self.messenger)
+
+        @frep.deco(profiler=p)
+        def SUP(depth):
+            time.sleep(0.01)
+            if depth:
+                SUP(depth - 1)
+
+        SUP(2)
+        times = [d['time'] for d in self.messages]
+        # the innermost call returns first
+        self.assertEqual(sorted(times), times)
+        self.assertTrue(times[0] >= 0.01)
+        self.assertTrue(times[-1] >= 0.03)
+
+    def test_concurrentCalls_expectEachCallTimed(self):
+        p = profilers.SimpleTimerProfiler(messenger=self.messenger)
+        barrier = threading.Event()
+
+        @frep.deco(profiler=p)
+        def SUP(duration):
+            barrier.wait()
+            time.sleep(duration)
+
+        threads = [threading.Thread(target=SUP, args=(0.01 * (i + 1), )) for i in xrange(8)]
+        for t in threads:
+            t.start()
+        barrier.set()
+        for t in threads:
+            t.join()
+        times = sorted(d['time'] for d in self.messages)
+        self.assertEqual(8, len(times))
+        for i, t in enumerate(times):
+            self.assertTrue(0.01 * (i + 1) <= t < 0.01 * (i + 1) + 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
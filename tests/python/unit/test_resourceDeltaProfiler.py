@@ -0,0 +1,102 @@
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import frep
+from frep import clocks
+from frep import profilers
+from frep import resourceUsage
+
+
+class TestResourceDeltaProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = list()
+        self.p = profilers.ResourceDeltaProfiler.create(messenger=self.messages.append)
+
+    def test_sleep_expectOffCpu(self):
+        @frep.deco(profiler=self.p)
+        def SUP():
+            time.sleep(0.05)
+
+        SUP()
+        d = self.messages[0]
+        self.assertTrue(d['time'] >= 0.05)
+        self.assertTrue(d['cpu'] < 0.02)
+        self.assertTrue(d['offCpu'] >= 0.04)
+        self.assertTrue(d['voluntarySwitches'] >= 1)
+
+    def test_spin_expectOnCpu(self):
+        @frep.deco(profiler=self.p)
+        def SUP():
+            # by the CPU clock, the thread may be preempted
+            end = clocks.threadTime() + 0.05
+            while clocks.threadTime() < end:
+                pass
+
+        SUP()
+        d = self.messages[0]
+        self.assertTrue(d['cpu'] >= 0.03)
+        self.assertTrue(d['user'] + d['sys'] >= 0.02)
+
+    def test_write_expectWrittenChars(self):
+        fd, filePath = tempfile.mkstemp()
+
+        @frep.deco(profiler=self.p)
+        def SUP():
+            os.write(fd, ' ' * 100000)
+
+        try:
+            SUP()
+        finally:
+            os.close(fd)
+            os.remove(filePath)
+        self.assertTrue(self.messages[0]['wchar'] >= 100000)
+
+    def test_emptyCall_expectNoCharsRead(self):
+        with self.p:
+            pass
+        self.assertEqual(0, self.messages[0]['rchar'])
+
+    def test_read_expectReadCharsOnly(self):
+        @frep.deco(profiler=self.p)
+        def SUP():
+            return os.read(fd, 100000)
+
+        fd = os.open('/dev/zero', os.O_RDONLY)
+        try:
+            SUP()
+        finally:
+            os.close(fd)
+        self.assertEqual(100000, self.messages[0]['rchar'])
+
+    def test_allocate_expectMinorFaults(self):
+        @frep.deco(profiler=self.p)
+        def SUP():
+            return ' ' * (16 * 1024 * 1024)
+
+        SUP()
+        self.assertTrue(self.messages[0]['minorFaults'] > 100)
+
+    def test_otherThread_expectOwnCountersOnly(self):
+        @frep.deco(profiler=self.p)
+        def SUP():
+            t = threading.Thread(target=lambda: ' ' * (16 * 1024 * 1024))
+            t.start()
+            t.join()
+
+        SUP()
+        self.assertTrue(self.messages[0]['minorFaults'] < 1000)
+
+
+class TestResourceUsage(unittest.TestCase):
+
+    def test_gettid_expectTaskOfProcess(self):
+        self.assertTrue(os.path.exists('/proc/self/task/{}'.format(resourceUsage.gettid())))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from frep import __main__
+from frep import compare
+from frep import profilers
+from frep import runner
+
+
+SRC_DIR = os.path.abspath(os.path.dirname(os.path.dirname(profilers.__file__)))
+PROG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata', 'runner', 'prog.py')
+
+
+class RecordingProfiler(object):
+
+    def __init__(self, name, log, failOnEnter=False):
+        self.name = name
+        self.log = log
+        self.failOnEnter = failOnEnter
+
+    def __enter__(self):
+        if self.failOnEnter:
+            raise RuntimeError(self.name)
+        self.log.append(('enter', self.name))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.log.append(('exit', self.name, exc_type))
+
+
+class TestCompositeProfiler(unittest.TestCase):
+
+    def test_enterExit_expectNestedOrder(self):
+        log = list()
+        p = profilers.CompositeProfiler([RecordingProfiler('a', log), RecordingProfiler('b', log)])
+        with self.assertRaises(ValueError):
+            with p:
+                raise ValueError()
+        self.assertEqual([('enter', 'a'), ('enter', 'b'), ('exit', 'b', ValueError), ('exit', 'a', ValueError)], log)
+
+    def test_enterFails_expectEnteredOnesExited(self):
+        log = list()
+        p = profilers.CompositeProfiler([RecordingProfiler('a', log), RecordingProfiler('b', log, failOnEnter=True)])
+        with self.assertRaises(RuntimeError):
+            with p:
+                pass
+        self.assertEqual([('enter', 'a'), ('exit', 'a', RuntimeError)], log)
+
+
+class TestRunner(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.outputPath = tempfile.mkstemp()
+        os.close(fd)
+        fd, self.reportPath = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.outputPath)
+        os.remove(self.reportPath)
+
+    def test_parsePatch_expectFreeFuncsAndMethods(self):
+        self.assertEqual(('corelib.publish', ['publish'], ['Graph.addNode']),
+                         runner.parsePatch('corelib.publish:publish,Graph.addNode'))
+        self.assertRaises(ValueError, runner.parsePatch, 'corelib.publish')
+
+    def test_unknownProfiler_expectValueError(self):
+        self.assertRaises(ValueError, runner.Runner, ['m:f'], ['nosuchprofiler'])
+
+    def test_executableNotInstalled_expectValueError(self):
+        path = os.environ.get('PATH', '')
+        os.environ['PATH'] = ''
+        try:
+            self.assertRaises(ValueError, runner.Runner, ['m:f'], ['timer', 'pidstat'])
+            self.assertRaises(ValueError, runner.Runner, ['m:f'], ['perfstat'])
+        finally:
+            os.environ['PATH'] = path
+
+    def test_main_unknownProfiler_expectExitBeforeRunning(self):
+        with self.assertRaises(SystemExit) as cm:
+            __main__.main(['run', '--patch', 'm:f', '--profiler', 'timer,nosuchprofiler', '--', PROG_PATH])
+        self.assertIn('nosuchprofiler', str(cm.exception.code))
+
+    def test_runScript_expectReportAndRunFile(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = SRC_DIR
+        p = subprocess.Popen(
+            [sys.executable, '-m', 'frep', 'run', '--patch', 'runnerSut__:work,fail,Worker.run',
+             '--profiler', 'timer,resource', '--output', self.outputPath, '--report', self.reportPath,
+             '--', PROG_PATH, '2', '3'],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        out, err = p.communicate()
+        self.assertEqual(3, p.returncode, err)
+        with open(self.reportPath, 'r') as fp:
+            report = fp.read()
+        # runnerSut__ is imported by the program, after the lazy patches are installed
+        self.assertIn('runnerSut__.work calls: 5, errors: 0', report)
+        self.assertIn('runnerSut__.Worker.run calls: 2, errors: 0', report)
+        self.assertIn('runnerSut__.fail calls: 1, errors: 1', report)
+        run = compare.load(self.outputPath)
+        # the metrics of each profiler are kept apart
+        self.assertEqual(5, len(run['runnerSut__.work']['timer.time']))
+        self.assertEqual(5, len(run['runnerSut__.work']['resource.time']))
+        self.assertEqual(5, len(run['runnerSut__.work']['resource.cpu']))
+        self.assertEqual(2, len(run['runnerSut__.Worker.run']['timer.time']))
+        self.assertEqual(2, run['runnerSut__.fail']['numErrors'])
+
+
+if __name__ == '__main__':
+    unittest.main()
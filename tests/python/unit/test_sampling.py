@@ -0,0 +1,100 @@
+
+import os
+import time
+import unittest
+
+import frep
+from frep import sampling
+
+
+class CountingProfiler(object):
+
+    def __init__(self, delay=0):
+        self.numCalls = 0
+        self.delay = delay
+
+    def __enter__(self):
+        self.numCalls += 1
+        if self.delay:
+            time.sleep(self.delay)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class TestSamplingPolicies(unittest.TestCase):
+
+    def test_everyN(self):
+        policy = sampling.EveryN(3)
+        self.assertEqual([True, False, False, True], [policy.accept() for i in xrange(4)])
+
+    def test_everyN_invalid_expectError(self):
+        self.assertRaises(ValueError, sampling.EveryN, 0)
+
+    def test_probabilistic(self):
+        self.assertFalse(any(sampling.Probabilistic(0).accept() for i in xrange(100)))
+        self.assertTrue(all(sampling.Probabilistic(1).accept() for i in xrange(100)))
+
+    def test_probabilistic_invalid_expectError(self):
+        self.assertRaises(ValueError, sampling.Probabilistic, 2)
+
+    def test_timeBased(self):
+        policy = sampling.TimeBased(3600)
+        self.assertEqual([True, False, False], [policy.accept() for i in xrange(3)])
+
+    def test_adaptive_expectOverheadWithinBudget(self):
+        policy = sampling.Adaptive(targetPercent=10)
+        p = CountingProfiler(delay=0.002)
+
+        @frep.deco(profiler=p, sampler=policy)
+        def SUP():
+            time.sleep(0.001)
+
+        for i in xrange(100):
+            SUP()
+        # without sampling the profiler would take 2/3 of the wall time
+        self.assertTrue(0 < p.numCalls < 30)
+
+
+class TestSampledDecorator(unittest.TestCase):
+
+    def test_expectOneInNCallsProfiled(self):
+        p = CountingProfiler()
+
+        @frep.deco(profiler=p, sampler=sampling.EveryN(10))
+        def sut(arg1):
+            return arg1
+
+        self.assertEqual([i for i in xrange(100)], [sut(i) for i in xrange(100)])
+        self.assertEqual(10, p.numCalls)
+
+    def test_sampledCallRaises_expectOverheadRecorded(self):
+        recorded = list()
+
+        class Policy(sampling.SamplingPolicy):
+            def record(self, overhead):
+                recorded.append(overhead)
+
+        @frep.deco(profiler=CountingProfiler(), sampler=Policy())
+        def canNotFail():
+            return 1 / 0
+
+        self.assertRaises(ZeroDivisionError, canNotFail)
+        self.assertEqual(1, len(recorded))
+
+
+class TestSampledPatch(unittest.TestCase):
+
+    def tearDown(self):
+        frep.unpatchAll()
+
+    def test_expectOneInNCallsProfiled(self):
+        p = CountingProfiler()
+        frep.patch('os.path', freeFuncs=['exists'], profiler=p, sampler=sampling.EveryN(5))
+        for i in xrange(10):
+            self.assertFalse(os.path.exists('/doom'))
+        self.assertEqual(2, p.numCalls)
+
+
+if __name__ == '__main__':
+    unittest.main()
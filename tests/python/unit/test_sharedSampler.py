@@ -0,0 +1,135 @@
+
+import os
+import threading
+import time
+import unittest
+
+import frep
+from frep import profilers
+from frep import sharedSampler
+
+import testdata
+from testdata.fakePidStat import FakePidStat
+
+
+class TestSharedSamplerProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = dict()
+
+    def tearDown(self):
+        sharedSampler.SharedSampler.stopAll()
+
+    def createSUP(self, name, duration):
+        def sendMessage(d):
+            self.messages[name] = d
+
+        p = profilers.SharedSamplerProfiler.create(messenger=sendMessage, interval=0.01)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            time.sleep(duration)
+
+        return SUP
+
+    def numSamplerThreads(self):
+        return len([t for t in threading.enumerate() if t.name.startswith('frep-procSampler')])
+
+    def test_overlappingCalls_expectOneSampler(self):
+        threads = [threading.Thread(target=self.createSUP(str(i), 0.05)) for i in xrange(10)]
+        for t in threads:
+            t.start()
+        time.sleep(0.02)
+        self.assertEqual(1, self.numSamplerThreads())
+        for t in threads:
+            t.join()
+        self.assertEqual(10, len(self.messages))
+        for d in self.messages.values():
+            self.assertTrue(d['samples'])
+
+    def test_expectSamplesWithinTheCallWindow(self):
+        self.createSUP('first', 0.05)()
+        begin = time.time()
+        self.createSUP('second', 0.05)()
+        end = time.time()
+        for sample in self.messages['second']['samples']:
+            self.assertTrue(begin <= sample[1]['Time'] <= end)
+
+    def test_shortCall_expectOneSample(self):
+        self.createSUP('short', 0)()
+        self.assertEqual(1, len(self.messages['short']['samples']))
+
+    def test_unknownBackend_expectError(self):
+        self.assertRaises(ValueError, profilers.SharedSamplerProfiler, backend='top')
+
+    def test_noSubscriberForIdleTimeout_expectSamplerStopped(self):
+        self.createSUP('first', 0.02)()
+        sampler = sharedSampler.SharedSampler.get(('proc', os.getpid()), None)
+        sampler.idleTimeout = 0
+        for i in xrange(100):
+            if not self.numSamplerThreads():
+                break
+            time.sleep(0.01)
+        self.assertEqual(0, self.numSamplerThreads())
+        self.createSUP('second', 0.02)()
+        self.assertTrue(self.messages['second']['samples'])
+
+
+class TestSharedSamplerProfilerPidStat(unittest.TestCase):
+
+    def setUp(self):
+        self.fake = FakePidStat()
+        self.messages = list()
+
+    def tearDown(self):
+        sharedSampler.SharedSampler.stopAll()
+        self.fake.remove()
+
+    def test_subSecondCalls_expectOneSampleEach(self):
+        p = profilers.SharedSamplerProfiler.create(messenger=self.messages.append, backend='pidstat', interval='1')
+
+        @frep.deco(profiler=p)
+        def SUP():
+            pass
+
+        for i in xrange(3):
+            SUP()
+        self.assertEqual([1, 1, 1], [len(d['samples']) for d in self.messages])
+
+
+class FakeProcess(object):
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+
+
+class TestPidStatStream(unittest.TestCase):
+
+    def test_expectSamplesFromPidStatOutput(self):
+        samples = list()
+        stream = profilers.PidStatStream(onSample=samples.append)
+        with open(testdata.filePath('blender_pidstat_dump.txt'), 'r') as fp:
+            stream.p = FakeProcess(fp)
+            stream._run()
+        self.assertEqual(13, len(samples))
+        self.assertEqual(16368, samples[5][3]['TID'])
+
+    def test_sample_expectOneSample(self):
+        fake = FakePidStat()
+        try:
+            sample = profilers.PidStatStream().sample()
+        finally:
+            fake.remove()
+        self.assertEqual(169412, sample[1]['RSS'])
+
+    def test_sample_pidStatNotInstalled_expectNone(self):
+        path = os.environ.get('PATH', '')
+        os.environ['PATH'] = ''
+        try:
+            self.assertIsNone(profilers.PidStatStream().sample())
+        finally:
+            os.environ['PATH'] = path
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+import frep
+from frep import profilers
+from frep import sharedStats
+
+
+def work(n):
+    SUP(n)
+    return os.getpid()
+
+
+def SUP(n):
+    time.sleep(0.001 * n)
+
+
+class TestSharedStats(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filePath = tempfile.mkstemp()
+        os.close(fd)
+        self.stats = sharedStats.SharedStats.create(self.filePath, numSlots=8, maxFunctions=4, nameSize=48)
+
+    def tearDown(self):
+        self.stats.detach()
+        self.stats.close()
+        os.remove(self.filePath)
+
+    def test_record_expectStats(self):
+        self.stats.record('a', 0.001)
+        self.stats.record('a', 0.003)
+        d = self.stats.read()['a']
+        self.assertEqual(2, d['count'])
+        self.assertAlmostEqual(0.004, d['total'])
+        self.assertAlmostEqual(0.001, d['min'])
+        self.assertAlmostEqual(0.003, d['max'])
+        self.assertAlmostEqual(0.002, d['mean'])
+        self.assertEqual(1, d['numProcesses'])
+        self.assertEqual(2, sum(d['buckets']))
+
+    def test_percentile_expectWithinFactorOfTwo(self):
+        for i in xrange(100):
+            self.stats.record('a', 0.001 * (i + 1))
+        p50 = sharedStats.percentile(self.stats.read()['a'], 50)
+        self.assertTrue(0.05 <= p50 <= 0.1)
+
+    def test_forkedChildren_expectMergedStats(self):
+        pids = list()
+        for i in xrange(3):
+            pid = os.fork()
+            if not pid:
+                try:
+                    for j in xrange(10):
+                        self.stats.record('child', 0.001)
+                finally:
+                    os._exit(0)
+            pids.append(pid)
+        for pid in pids:
+            os.waitpid(pid, 0)
+        self.stats.record('parent', 0.001)
+        merged = self.stats.read()
+        self.assertEqual(30, merged['child']['count'])
+        self.assertEqual(3, merged['child']['numProcesses'])
+        self.assertEqual(1, merged['parent']['count'])
+        self.assertEqual(4, len(self.stats.processes()))
+
+    def test_pool_expectSpansOfAllWorkers(self):
+        frep.patch(__name__, freeFuncs=['SUP'])
+        self.stats.attach()
+        try:
+            pool = multiprocessing.Pool(4)
+            pids = pool.map(work, [1] * 40)
+            pool.close()
+            pool.join()
+        finally:
+            frep.unpatchAll()
+        d = self.stats.read()['{}.SUP'.format(__name__)]
+        self.assertEqual(40, d['count'])
+        self.assertEqual(len(set(pids)), d['numProcesses'])
+
+    def test_open_expectSameStatsFromAnotherMapping(self):
+        self.stats.record('a', 0.001)
+        reader = sharedStats.SharedStats.open(self.filePath)
+        try:
+            self.assertEqual(1, reader.read()['a']['count'])
+        finally:
+            reader.close()
+
+    def test_full_expectDropped(self):
+        for name in 'abcde':
+            self.stats.record(name, 0.001)
+        self.assertEqual(4, len(self.stats.read()))
+        self.assertEqual(1, self.stats.numDropped)
+        self.assertEqual(1, self.stats.processes()[0][2])
+
+    def test_profiler_expectRecordUnderName(self):
+        p = profilers.SharedStatsProfiler(self.stats, 'render')
+
+        @frep.deco(profiler=p)
+        def render():
+            pass
+
+        render()
+        render()
+        self.assertEqual(2, self.stats.read()['render']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
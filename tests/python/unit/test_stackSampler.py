@@ -0,0 +1,90 @@
+
+import threading
+import time
+import unittest
+
+import frep
+from frep import profilers
+from frep import stackSampler
+
+
+def spin(duration):
+    end = time.time() + duration
+    while time.time() < end:
+        pass
+
+
+def hot():
+    spin(0.15)
+
+
+def cold():
+    spin(0.03)
+
+
+class TestStackSamplerProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = list()
+
+    def createSUP(self, useSignal=False):
+        p = profilers.StackSamplerProfiler.create(messenger=self.messages.append, interval=0.005, useSignal=useSignal)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            hot()
+            cold()
+
+        return SUP
+
+    def samplesOf(self, name):
+        n = 0
+        for line in self.messages[0]['stacks']:
+            stack, count = line.rsplit(' ', 1)
+            if name in stack:
+                n += int(count)
+        return n
+
+    def test_expectStacksCutAtSUP(self):
+        self.createSUP()()
+        d = self.messages[0]
+        self.assertTrue(d['numSamples'] > 10)
+        for line in d['stacks']:
+            self.assertTrue(line.startswith('SUP (') or line.startswith('<entry>'), line)
+
+    def test_expectHotFunctionDominates(self):
+        self.createSUP()()
+        self.assertTrue(self.samplesOf('hot (') > 2 * self.samplesOf('cold ('))
+
+    def test_signal_expectSamplesOfMainThread(self):
+        self.createSUP(useSignal=True)()
+        self.assertTrue(self.messages[0]['numSamples'] > 10)
+        self.assertTrue(self.samplesOf('hot (') > self.samplesOf('cold ('))
+
+    def test_signalOffMainThread_expectWatcherThread(self):
+        samplers = list()
+
+        def worker():
+            s = stackSampler.StackSampler(useSignal=True)
+            s.start()
+            s.stop()
+            samplers.append(s)
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+        self.assertFalse(samplers[0].useSignal)
+
+    def test_threads_expectEachCallSampled(self):
+        SUP = self.createSUP()
+        threads = [threading.Thread(target=SUP) for i in xrange(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(2, len(self.messages))
+        self.assertTrue(all(d['numSamples'] for d in self.messages))
+
+
+if __name__ == '__main__':
+    unittest.main()
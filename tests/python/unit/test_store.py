@@ -0,0 +1,169 @@
+import StringIO
+import calendar
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import frep
+from frep import __main__
+from frep import profilers
+from frep import runner
+from frep import store
+from frep.parsers import perfStat
+
+
+def fixturePath(fileName):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata', fileName)
+
+
+# 2018-01-13 00:00:00 UTC
+DAY = calendar.timegm((2018, 1, 13, 0, 0, 0))
+
+
+class TestStore(unittest.TestCase):
+
+    def setUp(self):
+        self.dirPath = tempfile.mkdtemp()
+        self.dbPath = os.path.join(self.dirPath, 'frep.db')
+        self.store = store.Store(self.dbPath, host='render01')
+
+    def tearDown(self):
+        self.store.detach()
+        self.store.close()
+        shutil.rmtree(self.dirPath)
+
+    def test_walMode(self):
+        self.assertEqual([('wal', )], self.store.query('PRAGMA journal_mode'))
+
+    def test_percentilePerDay_expectNearestRankPerDay(self):
+        for i in xrange(100):
+            self.store.add('m.publish', dict(time=0.001 * (i + 1), error=''), t=DAY + i)
+        for i in xrange(10):
+            self.store.add('m.publish', dict(time=1.0 + i, error=''), t=DAY + 86400 + i)
+        self.store.add('m.publish', dict(time=1000.0, error='ValueError'), t=DAY + 86400)
+        self.store.add('m.publish', dict(time=1000.0, error=''), t=DAY - 60 * 86400)
+        rows = self.store.percentilePerDay('m.publish', 99, days=30, now=DAY + 2 * 86400)
+        self.assertEqual(2, len(rows))
+        self.assertEqual(('2018-01-13', 100), rows[0][:2])
+        self.assertAlmostEqual(0.099, rows[0][2])
+        self.assertEqual(('2018-01-14', 10, 10.0), rows[1])
+
+    def test_pidStat_expectMaxRssPerFunction(self):
+        d = profilers.PidStatParser.create(fixturePath('blender_pidstat_dump.txt'))
+        self.store.messenger('m.render', source='pidstat')(d)
+        self.store.messenger('m.publish')(dict(time=0.1, error=''))
+        rows = self.store.maxPerFunction('rss')
+        expected = max(s[1]['RSS'] for s in d['samples'])
+        self.assertEqual([('m.render', expected, len(d['samples']))], rows)
+        self.assertEqual(['m.publish', 'm.render'], self.store.functions())
+        self.assertRaises(ValueError, self.store.maxPerFunction, 'nosuchcolumn')
+
+    def test_perfStat_expectCountersAsMetrics(self):
+        with open(fixturePath('blender_perfstat_dump.txt'), 'r') as fp:
+            d = perfStat.parse(fp.read())
+        self.store.messenger('m.render', source='perfstat')(d)
+        rows = dict(self.store.query('SELECT name, value FROM metrics'))
+        self.assertEqual(d['instructions'], rows['instructions'])
+        self.assertEqual([(d['time-elapsed'], 'perfstat')], self.store.query('SELECT duration, source FROM calls'))
+
+    def test_histogramSummary_expectAggregate(self):
+        p = profilers.HistogramTimerProfiler(name='m.f', messenger=self.store.messenger('m.f'))
+        for i in xrange(10):
+            with p:
+                pass
+        p.flush()
+        rows = self.store.query('SELECT function, host, count FROM aggregates')
+        self.assertEqual([('m.f', 'render01', 10)], rows)
+        self.assertEqual([], self.store.query('SELECT * FROM calls'))
+
+    def test_batches_expectWrittenPerBatch(self):
+        s = store.Store(self.dbPath, batchSize=3)
+        try:
+            reader = sqlite3.connect(self.dbPath)
+            for i in xrange(2):
+                s.add('m.f', dict(time=0.1))
+            self.assertEqual(0, reader.execute('SELECT COUNT(*) FROM calls').fetchone()[0])
+            s.add('m.f', dict(time=0.1))
+            self.assertEqual(3, reader.execute('SELECT COUNT(*) FROM calls').fetchone()[0])
+            reader.close()
+        finally:
+            s.close()
+
+    def test_spans_expectCallPerSpan(self):
+        @frep.deco()
+        def SUP():
+            pass
+
+        self.store.attach()
+        SUP()
+        SUP()
+        rows = self.store.query('SELECT function, source FROM calls')
+        self.assertEqual(2, len(rows))
+        self.assertTrue(all(r[1] == 'span' and r[0].endswith('.SUP') for r in rows))
+
+    def test_ingest_expectDumpsLoadedInParallel(self):
+        dumpDir = os.path.join(self.dirPath, 'dumps')
+        os.mkdir(dumpDir)
+        for i in xrange(4):
+            shutil.copy(fixturePath('blender_pidstat_dump.txt'), os.path.join(dumpDir, 'render{}.txt'.format(i)))
+        shutil.copy(fixturePath('blender_pidstat_dump_missing_end.txt'), os.path.join(dumpDir, 'broken.txt'))
+        with open(os.path.join(dumpDir, 'malformed.txt'), 'w') as fp:
+            # without -t pidstat prints a PID column, which PidStatParser does not know
+            fp.write('<pidstat>\n\n#      Time   UID       PID    VSZ    RSS  Command\n'
+                     ' 1515811161  1000      1234  10553  16941  blender\n\n</pidstat>\n')
+        numLoaded, failed = self.store.ingest(dumpDir, pattern='*.txt', processes=2)
+        self.assertEqual(4, numLoaded)
+        self.assertEqual([os.path.join(dumpDir, 'broken.txt'), os.path.join(dumpDir, 'malformed.txt')], sorted(failed))
+        rows = self.store.maxPerFunction('rss')
+        self.assertEqual(['render0', 'render1', 'render2', 'render3'], sorted(r[0] for r in rows))
+        self.assertEqual(1, len(set((r[1], r[2]) for r in rows)))
+        self.assertEqual([(None, )], self.store.query('SELECT DISTINCT duration FROM calls'))
+
+    def test_insertDump_noTgid_expectCallRecorded(self):
+        filePath = fixturePath('blender_pidstat_dump.txt')
+        self.store._insertDump('render', filePath, [(None, None) + (None, ) * len(store.SAMPLE_COLUMNS)])
+        self.assertEqual([(0, os.path.getmtime(filePath))], self.store.query('SELECT pid, time FROM calls'))
+        self.assertEqual([(0, )], self.store.query('SELECT COUNT(*) FROM samples'))
+
+    def test_runnerProfilers_expectCallCountedOnce(self):
+        dbPath = os.path.join(self.dirPath, 'run.db')
+        r = runner.Runner(['m:f'], ['timer', 'resource'], storePath=dbPath,
+                          reportPath=os.path.join(self.dirPath, 'report.txt'))
+        for i in xrange(3):
+            r.receive('m.f', 'resource', dict(time=0.2, cpu=0.1, error=''))
+            r.receive('m.f', 'timer', dict(time=0.1, error=''))
+        r.close()
+        with store.Store(dbPath) as s:
+            self.assertEqual(3, s.percentilePerDay('m.f', 50)[0][1])
+            self.assertEqual(0.1, s.percentilePerDay('m.f', 100)[0][2])
+            self.assertEqual([(0.2, 3)], s.query("SELECT value, COUNT(*) FROM metrics WHERE name = 'time'"))
+
+    def test_percentilePerDay_source_expectThoseCallsOnly(self):
+        self.store.add('m.f', dict(time=1.0, error=''), source='span', t=DAY)
+        self.store.add('m.f', dict(time=2.0, error=''), source='timer', t=DAY)
+        self.assertEqual([('2018-01-13', 1, 1.0)], self.store.percentilePerDay('m.f', 99, now=DAY, source='span'))
+
+    def test_main_expectQueries(self):
+        self.store.add('m.publish', dict(time=0.1, error=''))
+        self.store.close()
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            self.assertEqual(0, __main__.main(['store', 'percentile', self.dbPath, 'm.publish']))
+            self.assertEqual(0, __main__.main(['store', 'functions', self.dbPath]))
+            self.assertEqual('m.publish', sys.stdout.getvalue().splitlines()[-1])
+        finally:
+            sys.stdout = stdout
+
+    def test_main_noSuchStore_expectExitWithoutCreatingIt(self):
+        dbPath = os.path.join(self.dirPath, 'nosuch.db')
+        for argv in (['percentile', dbPath, 'm.publish'], ['max', dbPath], ['functions', dbPath]):
+            self.assertRaises(SystemExit, __main__.main, ['store'] + argv)
+        self.assertFalse(os.path.exists(dbPath))
+
+
+if __name__ == '__main__':
+    unittest.main()
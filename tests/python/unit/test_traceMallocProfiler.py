@@ -0,0 +1,130 @@
+
+import unittest
+
+import frep
+from frep import profilers
+from frep import residentMemory
+
+
+requiresTracemalloc = unittest.skipUnless(profilers.tracemalloc is not None, 'tracemalloc is not available')
+
+MB = 1024 * 1024
+
+# without tracemalloc the RSS is measured: the blocks are larger than the highest mmap threshold of glibc (32 MiB), so
+# they are mapped and unmapped instead of being reused from the heap, and the tolerance covers the pages of the per-
+# thread RSS counters that the kernel has not synced yet
+KEPT = 34 * MB
+TEMPORARY = 40 * MB
+TOLERANCE = MB
+
+
+class TestTraceMallocProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.messages = list()
+        self.kept = list()
+
+    def test_expectNetAndPeak(self):
+        p = profilers.TraceMallocProfiler(topN=0, messenger=self.messages.append)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            self.kept.append(bytearray(KEPT))
+            temporary = bytearray(TEMPORARY)
+            del temporary
+
+        SUP()
+        d = self.messages[0]
+        self.assertTrue(abs(d['net'] - KEPT) < TOLERANCE, d)
+        self.assertTrue(abs(d['peak'] - KEPT - TEMPORARY) < TOLERANCE, d)
+        self.assertEqual([], d['sites'])
+
+    @requiresTracemalloc
+    def test_expectTopSites(self):
+        p = profilers.TraceMallocProfiler(topN=2, messenger=self.messages.append)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            self.kept.append(bytearray(1000000))
+
+        SUP()
+        sites = self.messages[0]['sites']
+        self.assertTrue(len(sites) <= 2)
+        self.assertTrue(sites[0]['size'] >= 1000000)
+        self.assertTrue(sites[0]['traceback'][0].startswith(__file__.replace('.pyc', '.py')))
+
+    def test_nested_expectOuterPeakIncludesInner(self):
+        p = profilers.TraceMallocProfiler(topN=0, messenger=self.messages.append)
+
+        @frep.deco(profiler=p)
+        def inner():
+            temporary = bytearray(TEMPORARY)
+            del temporary
+
+        @frep.deco(profiler=p)
+        def outer():
+            inner()
+
+        outer()
+        self.assertTrue(all(d['peak'] > TEMPORARY - TOLERANCE for d in self.messages), self.messages)
+
+    @requiresTracemalloc
+    def test_snapshotEvery_expectSitesOnEveryNthCall(self):
+        p = profilers.TraceMallocProfiler(snapshotEvery=3, messenger=self.messages.append)
+
+        @frep.deco(profiler=p)
+        def SUP():
+            self.kept.append(bytearray(100000))
+
+        for i in range(6):
+            SUP()
+        self.assertEqual([True, False, False, True, False, False], [bool(d['sites']) for d in self.messages])
+
+    @requiresTracemalloc
+    def test_expectTracingStoppedAfterwards(self):
+        import tracemalloc
+        with profilers.TraceMallocProfiler():
+            pass
+        self.assertFalse(tracemalloc.is_tracing())
+
+
+class TestTraceMallocProfilerRss(unittest.TestCase):
+    """
+    The resident set size fallback, whether or not tracemalloc is available
+    """
+
+    def setUp(self):
+        self.tracemalloc = profilers.tracemalloc
+        profilers.tracemalloc = None
+        self.messages = list()
+        self.p = profilers.TraceMallocProfiler(messenger=self.messages.append)
+
+    def tearDown(self):
+        profilers.tracemalloc = self.tracemalloc
+
+    def test_markRaised_expectNetAndPeak(self):
+        current, mark = residentMemory.read()
+        # above the highest RSS so far
+        temporarySize = mark - current + TEMPORARY
+        with self.p:
+            kept = bytearray(KEPT)
+            temporary = bytearray(temporarySize)
+            del temporary
+        d = self.messages[0]
+        self.assertTrue(abs(d['net'] - KEPT) < TOLERANCE, d)
+        self.assertTrue(abs(d['peak'] - KEPT - temporarySize) < TOLERANCE, d)
+        self.assertEqual([], d['sites'])
+        del kept
+
+    def test_markNotRaised_expectPeakUnknown(self):
+        temporary = bytearray(TEMPORARY)
+        del temporary
+        with self.p:
+            pass
+        d = self.messages[0]
+        self.assertIsNone(d['peak'])
+        self.assertTrue(abs(d['net']) < TOLERANCE, d)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+"""
+A fake pidstat executable put first on PATH, for the hosts that do not have sysstat installed
+
+Like pidstat -dtrsh -p <pid> [interval [count]], it prints the header then one process record (RSS 169412, Command
+python) per interval, stamped with the current time, until it is interrupted by SIGINT; without an interval it prints
+one record and exits. The interval may be fractional, unlike pidstat's.
+"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+
+
+SCRIPT = """#!{}
+import signal
+import sys
+import time
+
+signal.signal(signal.SIGINT, lambda *args: sys.exit(0))
+args = [a for a in sys.argv[1:] if not a.startswith('-')][1:]
+sys.stdout.write('\\nLinux 4.10.0-40-generic (gunship) \\t01/13/2018 \\t_x86_64_\\t(8 CPU)\\n\\n')
+while True:
+    sys.stdout.write('#      Time   UID      TGID       TID     VSZ     RSS  Command\\n')
+    sys.stdout.write(' {{}}  1000     16367         0 1055316  169412  python\\n\\n'.format(int(time.time())))
+    sys.stdout.flush()
+    if not args:
+        break
+    time.sleep(float(args[0]))
+"""
+
+
+class FakePidStat(object):
+
+    def __init__(self):
+        self.dirPath = tempfile.mkdtemp()
+        filePath = os.path.join(self.dirPath, 'pidstat')
+        with open(filePath, 'w') as fp:
+            fp.write(SCRIPT.format(sys.executable))
+        os.chmod(filePath, stat.S_IRWXU)
+        self.path = os.environ.get('PATH', '')
+        os.environ['PATH'] = '{}{}{}'.format(self.dirPath, os.pathsep, self.path)
+
+    def remove(self):
+        os.environ['PATH'] = self.path
+        shutil.rmtree(self.dirPath)
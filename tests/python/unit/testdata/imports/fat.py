@@ -0,0 +1,2 @@
+# above the largest mmap threshold of glibc, so the pages are always new to the process
+payload = ' ' * (40 * 1024 * 1024)
@@ -0,0 +1,5 @@
+import time
+
+from testdata.imports import light
+
+time.sleep(0.02)
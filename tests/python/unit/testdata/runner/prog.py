@@ -0,0 +1,14 @@
+import sys
+
+import runnerSut__
+
+
+if __name__ == '__main__':
+    w = runnerSut__.Worker()
+    for arg in sys.argv[1:]:
+        w.run(int(arg))
+    try:
+        runnerSut__.fail()
+    except ValueError:
+        pass
+    sys.exit(3)
@@ -0,0 +1,16 @@
+import time
+
+
+def work(n):
+    time.sleep(0.001 * n)
+    return n
+
+
+def fail():
+    raise ValueError('expected')
+
+
+class Worker(object):
+
+    def run(self, n):
+        return sum(work(i) for i in xrange(n))